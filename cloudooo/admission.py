@@ -0,0 +1,269 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, local
+from xmlrpc.client import Fault
+from cloudooo.util import logger
+
+# Fault code of the requests rejected because the server is overloaded, they
+# can be sent again later
+SERVER_BUSY_FAULT_CODE = 503
+
+# Priorities of the requests: interactive requests are high, bulk ones low
+HIGH_PRIORITY = 'high'
+LOW_PRIORITY = 'low'
+PRIORITY_LIST = (HIGH_PRIORITY, LOW_PRIORITY)
+
+# Requests of the thread already admitted by a controller
+_admitted = local()
+
+
+class ServerBusy(Fault):
+  """Raised when a request is not admitted, the client should retry later"""
+
+  def __init__(self, message):
+    Fault.__init__(self, SERVER_BUSY_FAULT_CODE, message)
+
+
+class AdmissionController(object):
+  """Limits the number of requests processed at the same time. The others
+  wait in a queue by priority, in their order of arrival, and are rejected
+  with ServerBusy when the queues are full or when they wait too long.
+
+  High priority requests are admitted first, except that low priority ones
+  keep low_priority_share of the capacity when they are waiting, so that
+  they are not starved.
+  """
+
+  def __init__(self, capacity=0, max_queue_size=0, max_queue_wait=0,
+               low_priority_share=0.25):
+    """Keyword arguments:
+    capacity -- number of requests processed at the same time
+    max_queue_size -- maximum number of waiting requests, 0 means no limit
+    max_queue_wait -- maximum seconds a request waits, 0 means no limit
+    low_priority_share -- part of the capacity reserved for low priority
+    """
+    self.capacity = capacity
+    self.max_queue_size = max_queue_size
+    self.max_queue_wait = max_queue_wait
+    self.low_priority_share = low_priority_share
+    self._condition = Condition()
+    self._queue_dict = {priority: deque() for priority in PRIORITY_LIST}
+    self._active_dict = dict.fromkeys(PRIORITY_LIST, 0)
+    self._admitted_count = 0
+    self._rejected_count = 0
+    # high priority requests admitted since the last low priority one
+    self._high_admitted_count = 0
+
+  def copy(self, capacity):
+    """Returns a new controller with the same settings and the given
+    capacity"""
+    return self.__class__(capacity, self.max_queue_size, self.max_queue_wait,
+                          self.low_priority_share)
+
+  def _reject(self, message):
+    self._rejected_count += 1
+    logger.warning("Request rejected: %s", message)
+    raise ServerBusy(message)
+
+  def _getActiveCount(self):
+    return sum(self._active_dict.values())
+
+  def _getQueueSize(self):
+    return sum(len(queue) for queue in self._queue_dict.values())
+
+  def _isLowPriorityReserved(self):
+    """Returns True if low priority requests are waiting and use less than
+    their share of the capacity, or, when the capacity is too small to be
+    shared, of the requests admitted while they wait"""
+    if not (self.low_priority_share and self._queue_dict[LOW_PRIORITY]):
+      return False
+    reserved_count = int(self.capacity * self.low_priority_share)
+    if reserved_count:
+      return self._active_dict[LOW_PRIORITY] < reserved_count
+    return (self._high_admitted_count + 1) * self.low_priority_share >= 1
+
+  def _canEnter(self, ticket, priority):
+    if self._queue_dict[priority][0] is not ticket or \
+        self._getActiveCount() >= self.capacity:
+      return False
+    if priority == HIGH_PRIORITY:
+      return not self._isLowPriorityReserved()
+    return not self._queue_dict[HIGH_PRIORITY] or \
+        self._isLowPriorityReserved()
+
+  def _admit(self, priority):
+    self._active_dict[priority] += 1
+    self._admitted_count += 1
+    if priority == LOW_PRIORITY:
+      self._high_admitted_count = 0
+    elif self._queue_dict[LOW_PRIORITY]:
+      self._high_admitted_count += 1
+
+  def acquire(self, priority=LOW_PRIORITY):
+    """Waits until the request can be processed"""
+    if priority not in PRIORITY_LIST:
+      raise ValueError("priority must be one of %r" % (PRIORITY_LIST,))
+    with self._condition:
+      queue = self._queue_dict[priority]
+      queue_size = self._getQueueSize()
+      if self._getActiveCount() < self.capacity and not queue_size:
+        self._admit(priority)
+        return
+      if self.max_queue_size and queue_size >= self.max_queue_size:
+        self._reject("queue is full (%s requests)" % queue_size)
+      ticket = object()
+      queue.append(ticket)
+      try:
+        if self.max_queue_wait:
+          if not self._condition.wait_for(
+              lambda: self._canEnter(ticket, priority), self.max_queue_wait):
+            self._reject("waited more than %ss in the queue"
+                         % self.max_queue_wait)
+        else:
+          self._condition.wait_for(lambda: self._canEnter(ticket, priority))
+        self._admit(priority)
+      finally:
+        queue.remove(ticket)
+        self._condition.notify_all()
+
+  def release(self, priority=LOW_PRIORITY):
+    with self._condition:
+      self._active_dict[priority] -= 1
+      self._condition.notify_all()
+
+  @contextmanager
+  def admit(self, priority=LOW_PRIORITY):
+    """Context manager processing the request once admitted. The requests
+    made by an admitted request are admitted immediately, even by another
+    controller."""
+    if getattr(_admitted, 'admitted', False):
+      yield
+      return
+    self.acquire(priority)
+    _admitted.admitted = True
+    try:
+      yield
+    finally:
+      _admitted.admitted = False
+      self.release(priority)
+
+  def getStatistics(self):
+    """Returns the counters of the controller"""
+    with self._condition:
+      statistic_dict = dict(capacity=self.capacity,
+                            active_count=self._getActiveCount(),
+                            queue_size=self._getQueueSize(),
+                            admitted_count=self._admitted_count,
+                            rejected_count=self._rejected_count)
+      for priority in PRIORITY_LIST:
+        statistic_dict[priority + '_active_count'] = \
+          self._active_dict[priority]
+        statistic_dict[priority + '_queue_size'] = \
+          len(self._queue_dict[priority])
+      return statistic_dict
+
+
+class ConcurrencyLimit(object):
+  """Limits the number of processes of a handler run at the same time, and
+  measures the time waited for them."""
+
+  def __init__(self, capacity):
+    self.capacity = capacity
+    self._condition = Condition()
+    self._active_count = 0
+    self._waiting_count = 0
+    self._acquired_count = 0
+    self._total_wait = 0.
+    self._max_wait = 0.
+
+  def __enter__(self):
+    start = time.time()
+    with self._condition:
+      self._waiting_count += 1
+      try:
+        self._condition.wait_for(
+          lambda: self._active_count < self.capacity)
+      finally:
+        self._waiting_count -= 1
+      self._active_count += 1
+      self._acquired_count += 1
+      wait = time.time() - start
+      self._total_wait += wait
+      self._max_wait = max(self._max_wait, wait)
+    return self
+
+  def __exit__(self, *exc_info):
+    with self._condition:
+      self._active_count -= 1
+      self._condition.notify()
+
+  def setCapacity(self, capacity):
+    with self._condition:
+      self.capacity = capacity
+      self._condition.notify_all()
+
+  def getStatistics(self):
+    """Returns the counters of the limit, the waits are in seconds"""
+    with self._condition:
+      return dict(capacity=self.capacity,
+                  active_count=self._active_count,
+                  waiting_count=self._waiting_count,
+                  acquired_count=self._acquired_count,
+                  total_wait=self._total_wait,
+                  max_wait=self._max_wait)
+
+
+# Concurrency limits of the handlers by name
+concurrency_limit_dict = {}
+
+
+def setConcurrencyLimit(name, capacity=0):
+  """Sets the number of processes the handler runs at the same time, 0
+  means the number of CPUs"""
+  capacity = capacity or os.cpu_count() or 1
+  limit = concurrency_limit_dict.get(name)
+  if limit is None:
+    concurrency_limit_dict.setdefault(name, ConcurrencyLimit(capacity))
+  else:
+    limit.setCapacity(capacity)
+
+
+def getConcurrencyLimit(name):
+  """Returns the concurrency limit of the handler"""
+  limit = concurrency_limit_dict.get(name)
+  if limit is None:
+    setConcurrencyLimit(name)
+    limit = concurrency_limit_dict[name]
+  return limit
@@ -0,0 +1,246 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import json
+import os
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from shutil import copyfile
+from tempfile import mktemp
+from threading import Lock
+from cloudooo.file import FileData
+from cloudooo.util import logger
+
+VERSION_FILENAME = '.version'
+
+
+def _linkFile(source_path, destination_path):
+  """Hard link the file, or copy it if the file system does not allow it"""
+  try:
+    os.link(source_path, destination_path)
+  except OSError:
+    if not os.path.exists(source_path):
+      raise
+    copyfile(source_path, destination_path)
+
+
+class ConversionCache(object):
+  """Keeps the results of the requests on disk, to answer the identical
+  requests without doing the conversion again.
+
+  Entries are removed when they are older than max_age seconds, and the
+  least recently used ones are removed when the total size exceeds max_size
+  bytes.
+  """
+
+  def __init__(self, path, max_size, max_age=0, version=None):
+    """Keyword arguments:
+    path -- folder where the entries are stored
+    max_size -- maximum size of all entries in bytes
+    max_age -- maximum age of an entry in seconds, 0 means no limit
+    version -- string identifying the converters, the entries kept by a
+      previous run are removed when it changes
+    """
+    self.path = path
+    self.max_size = max_size
+    self.max_age = max_age
+    self.hit_count = self.miss_count = self.eviction_count = 0
+    self._lock = Lock()
+    # key: (size, creation time), in least recently used order
+    self._entry_dict = OrderedDict()
+    self._size = 0
+    if not os.path.exists(path):
+      os.mkdir(path)
+    if version is not None:
+      self._checkVersion(version)
+    self._loadEntryDict()
+
+  def _checkVersion(self, version):
+    """Remove the entries if they were stored by another version"""
+    version_path = os.path.join(self.path, VERSION_FILENAME)
+    try:
+      with open(version_path) as f:
+        if f.read() == version:
+          return
+    except OSError:
+      pass
+    logger.info("ConversionCache: version changed, remove the entries")
+    for name in os.listdir(self.path):
+      os.remove(os.path.join(self.path, name))
+    with open(version_path, 'w') as f:
+      f.write(version)
+
+  def _loadEntryDict(self):
+    """Reload the entries kept by a previous run"""
+    entry_list = []
+    for name in os.listdir(self.path):
+      if name == VERSION_FILENAME:
+        continue
+      file_path = os.path.join(self.path, name)
+      if name.startswith('tmp'):
+        # unfinished write
+        os.remove(file_path)
+        continue
+      stat = os.stat(file_path)
+      entry_list.append((stat.st_atime, name, stat.st_size, stat.st_mtime))
+    for _, key, size, creation_time in sorted(entry_list):
+      self._entry_dict[key] = size, creation_time
+      self._size += size
+    with self._lock:
+      self._evict()
+
+  @staticmethod
+  def getKey(data, *args):
+    """Returns the key of the request on data (bytes or FileData) with the
+    given parameters, args must be serializable with json"""
+    if isinstance(data, FileData):
+      key = sha256()
+      for chunk in data.iterChunks():
+        key.update(chunk)
+    else:
+      key = sha256(data)
+    key.update(json.dumps(args, sort_keys=True, default=str).encode('utf-8'))
+    return key.hexdigest()
+
+  def _getFilePath(self, key):
+    return os.path.join(self.path, key)
+
+  def _isExpired(self, creation_time, now):
+    return self.max_age and now - creation_time > self.max_age
+
+  def _remove(self, key):
+    size, _ = self._entry_dict.pop(key)
+    self._size -= size
+    self.eviction_count += 1
+    try:
+      os.remove(self._getFilePath(key))
+    except OSError:
+      pass
+
+  def _evict(self):
+    """Remove the expired entries and the least recently used ones until the
+    total size fits, the lock must be held"""
+    now = time.time()
+    for key, (size, creation_time) in list(self._entry_dict.items()):
+      if self._isExpired(creation_time, now):
+        self._remove(key)
+    while self._size > self.max_size:
+      self._remove(next(iter(self._entry_dict)))
+
+  def _lookup(self, key):
+    """Returns the path of the entry of the key and marks it as used, or
+    None"""
+    with self._lock:
+      entry = self._entry_dict.get(key)
+      if entry is not None and self._isExpired(entry[1], time.time()):
+        self._remove(key)
+        entry = None
+      if entry is None:
+        self.miss_count += 1
+        return None
+      self._entry_dict.move_to_end(key)
+    # keep the order of use after a restart
+    file_path = self._getFilePath(key)
+    os.utime(file_path, (time.time(), entry[1]))
+    return file_path
+
+  def _discard(self, key):
+    """Remove the entry which can not be read"""
+    logger.warning("ConversionCache: can not read entry %s", key)
+    with self._lock:
+      if key in self._entry_dict:
+        self._remove(key)
+      self.miss_count += 1
+
+  def get(self, key):
+    """Returns the value stored for the key or None"""
+    try:
+      file_path = self._lookup(key)
+      if file_path is None:
+        return None
+      with open(file_path, 'rb') as f:
+        value = json.loads(f.read())
+    except (OSError, ValueError):
+      self._discard(key)
+      return None
+    with self._lock:
+      self.hit_count += 1
+    return value
+
+  def getData(self, key, dir_path):
+    """Returns the data stored for the key as FileData, whose file is
+    created in dir_path and must be removed by the caller, or None"""
+    try:
+      file_path = self._lookup(key)
+      if file_path is None:
+        return None
+      data_path = mktemp(dir=dir_path)
+      _linkFile(file_path, data_path)
+    except OSError:
+      self._discard(key)
+      return None
+    with self._lock:
+      self.hit_count += 1
+    return FileData(data_path)
+
+  def set(self, key, value):
+    """Store the value for the key, value must be serializable with json"""
+    self.setData(key, json.dumps(value).encode('utf-8'))
+
+  def setData(self, key, data):
+    """Store data, bytes or FileData, for the key. The file of a FileData
+    is kept, it is hard linked in the cache when possible."""
+    size = len(data)
+    if size > self.max_size:
+      return
+    tmp_path = mktemp(dir=self.path)
+    if isinstance(data, FileData):
+      _linkFile(data.path, tmp_path)
+    else:
+      with open(tmp_path, 'wb') as f:
+        f.write(data)
+    now = time.time()
+    with self._lock:
+      os.replace(tmp_path, self._getFilePath(key))
+      if key in self._entry_dict:
+        self._size -= self._entry_dict.pop(key)[0]
+      self._entry_dict[key] = size, now
+      self._size += size
+      self._evict()
+
+  def getStatistics(self):
+    """Returns a dictionary with the counters and the size of the cache"""
+    with self._lock:
+      return dict(hit_count=self.hit_count,
+                  miss_count=self.miss_count,
+                  eviction_count=self.eviction_count,
+                  entry_count=len(self._entry_dict),
+                  size=self._size)
@@ -30,13 +30,44 @@
 
 import mimetypes
 import tempfile
-from os.path import join, exists, curdir, abspath
-from os import listdir, remove, chdir
+from os.path import join, exists, curdir, abspath, getsize
+from os import listdir, remove, chdir, close, fdopen, replace
 from zope.interface import implementer
 from zipfile import ZipFile, is_zipfile
-from shutil import rmtree
+from shutil import rmtree, copyfile
 from cloudooo.interfaces.file import IFile
 
+# Documents larger than this are kept in files instead of memory
+FILE_THRESHOLD = 1 << 20
+
+
+class FileData:
+  """Content of a document stored in a file, used instead of bytes to not
+  keep large documents in memory.
+  """
+
+  def __init__(self, path:str):
+    self.path = path
+
+  def read(self, size=-1) -> bytes:
+    """Returns the content, or only its first size bytes"""
+    with open(self.path, 'rb') as f:
+      return f.read(size)
+
+  def iterChunks(self, chunk_size=1 << 16):
+    """Yields the content by chunks"""
+    with open(self.path, 'rb') as f:
+      for chunk in iter(lambda: f.read(chunk_size), b''):
+        yield chunk
+
+  def remove(self):
+    """Removes the file"""
+    if exists(self.path):
+      remove(self.path)
+
+  def __len__(self):
+    return getsize(self.path)
+
 
 @implementer(IFile)
 class File:
@@ -48,7 +79,7 @@ class File:
     """Create an file into file system and store the URL.
     Keyword arguments:
     base_folder_url -- Full path to create a temporary folder
-    data -- Content of the document
+    data -- Content of the document, as bytes or FileData
     source_format -- Document Extension
     """
     self.base_folder_url = base_folder_url
@@ -68,8 +99,11 @@ class File:
     file_path = tempfile.mktemp(suffix=".%s" % self.source_format,
                                 dir=self.directory_name)
     # stores the data in temporary file
-    with open(file_path, 'wb') as f:
-      f.write(self.original_data)
+    if isinstance(self.original_data, FileData):
+      copyfile(self.original_data.path, file_path)
+    else:
+      with open(file_path, 'wb') as f:
+        f.write(self.original_data)
     # If is a zipfile is need extract all files from whitin the compressed file
     if is_zipfile(file_path):
       zipfile = ZipFile(file_path)
@@ -116,6 +150,21 @@ class File:
       with open(self.url, 'rb') as f:
         return f.read()
 
+  def getContentFile(self, zip=False) -> FileData:
+    """Moves the document, or a zip archive of its folder if zip is True,
+    out of the temporary folder and returns it as FileData, so that it is
+    not read in memory. The caller must remove the file.
+    """
+    fd, path = tempfile.mkstemp(dir=self.base_folder_url)
+    if zip:
+      with fdopen(fd, 'wb') as f, ZipFile(f, 'w') as zipfile:
+        for file in listdir(self.directory_name):
+          zipfile.write(join(self.directory_name, file), file)
+    else:
+      close(fd)
+      replace(self.url, path)
+    return FileData(path)
+
   def getUrl(self) -> str:
     """Returns full path."""
     return self.url
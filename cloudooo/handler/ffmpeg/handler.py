@@ -32,8 +32,11 @@ from zope.interface import implementer
 from cloudooo.interfaces.handler import IHandler
 from cloudooo.file import File
 from cloudooo.util import logger
+from cloudooo.admission import getConcurrencyLimit, setConcurrencyLimit
 from subprocess import Popen, PIPE
 from tempfile import mktemp
+from os.path import exists, getsize
+import os
 
 @implementer(IHandler)
 class Handler:
@@ -51,8 +54,8 @@ class Handler:
     self.input = File(base_folder_url, data, source_format)
     self.environment = kw.get("env", {})
 
-  def convert(self, destination_format):
-    """ Convert the inputed file to output as format that were informed """
+  def _convert(self, destination_format):
+    """Converts the file and reloads it with the output"""
     # XXX This implementation could use ffmpeg -i pipe:0, but
     # XXX seems super unreliable currently and it generates currupted files in
     # the end
@@ -68,28 +71,43 @@ class Handler:
     if destination_format == "webm":
       command.insert(3, "32k")
       command.insert(3, "-ab")
-    try:
+    with getConcurrencyLimit('ffmpeg'):
       stdout, stderr = Popen(command,
                              stdout=PIPE,
                              stderr=PIPE,
                              close_fds=True,
                              env=self.environment).communicate()
-      self.input.reload(output_url)
-      if len(self.input.getContent()) == 0:
-        logger.error(stderr.split("\n")[-2])
+    self.input.reload(output_url)
+    if not exists(output_url) or getsize(output_url) == 0:
+      logger.error(stderr.split("\n")[-2])
+
+  def convert(self, destination_format):
+    """ Convert the inputed file to output as format that were informed """
+    try:
+      self._convert(destination_format)
       return self.input.getContent()
     finally:
       self.input.trash()
 
+  def convertToFile(self, destination_format):
+    """Like convert, but returns the output as FileData to not read it in
+    memory"""
+    try:
+      self._convert(destination_format)
+      return self.input.getContentFile()
+    finally:
+      self.input.trash()
+
   def getMetadata(self, base_document=False):
     """Returns a dictionary with all metadata of the file.
     Keywords Arguments:"""
     command = ["ffprobe",self.input.getUrl()]
-    stdout, stderr =  Popen(command,
-                           stdout=PIPE,
-                           stderr=PIPE,
-                           close_fds=True,
-                           env=self.environment).communicate()
+    with getConcurrencyLimit('ffmpeg'):
+      stdout, stderr =  Popen(command,
+                             stdout=PIPE,
+                             stderr=PIPE,
+                             close_fds=True,
+                             env=self.environment).communicate()
     metadata = stderr.split('Metadata:')[1].split('\n')
     metadata_dict = {}
     for data in metadata:
@@ -115,16 +133,22 @@ class Handler:
       command.insert(3, "%s=%s"%(metadata, metadata_dict[metadata]))
       command.insert(3, "-metadata")
     try:
-      stdout, stderr = Popen(command,
-                             stdout=PIPE,
-                             stderr=PIPE,
-                             close_fds=True,
-                             env=self.environment).communicate()
+      with getConcurrencyLimit('ffmpeg'):
+        stdout, stderr = Popen(command,
+                               stdout=PIPE,
+                               stderr=PIPE,
+                               close_fds=True,
+                               env=self.environment).communicate()
       self.input.reload(output_url)
       return self.input.getContent()
     finally:
       self.input.trash()
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return getConcurrencyLimit('ffmpeg').capacity
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype):
     """Returns a list content_type and their titles which are supported
@@ -137,3 +161,10 @@ class Handler:
     """
     # XXX NotImplemented
     return []
+
+
+def bootstrapHandler(configuration_dict):
+  # ffmpeg runs several threads by process
+  setConcurrencyLimit('ffmpeg',
+                      int(configuration_dict.get('ffmpeg_max_concurrency', 0))
+                      or max(1, (os.cpu_count() or 1) // 2))
@@ -33,6 +33,7 @@ from zope.interface import implementer
 from cloudooo.interfaces.handler import IHandler
 from cloudooo.file import File
 from cloudooo.util import logger
+from cloudooo.admission import getConcurrencyLimit, setConcurrencyLimit
 from subprocess import Popen, PIPE
 from tempfile import mktemp
 
@@ -47,34 +48,49 @@ class Handler:
     self.file = File(base_folder_url, data, source_format)
     self.environment = kw.get("env", {})
 
-  def convert(self, destination_format=None, **kw):
-    """Convert a image"""
+  def _convert(self, destination_format):
+    """Converts the image and reloads the file with the output"""
     logger.debug("ImageMagickConvert: %s > %s", self.file.source_format, destination_format)
     output_url = mktemp(suffix='.%s' % destination_format,
                         dir=self.base_folder_url)
     command = ["convert", self.file.getUrl(), output_url]
-    stdout, stderr = Popen(command,
-                          stdout=PIPE,
-                          stderr=PIPE,
-                          close_fds=True,
-                          env=self.environment).communicate()
+    with getConcurrencyLimit('imagemagick'):
+      stdout, stderr = Popen(command,
+                            stdout=PIPE,
+                            stderr=PIPE,
+                            close_fds=True,
+                            env=self.environment).communicate()
     self.file.reload(output_url)
+
+  def convert(self, destination_format=None, **kw):
+    """Convert a image"""
+    self._convert(destination_format)
     try:
       return self.file.getContent()
     finally:
       self.file.trash()
 
+  def convertToFile(self, destination_format=None, **kw):
+    """Like convert, but returns the image as FileData to not read it in
+    memory"""
+    self._convert(destination_format)
+    try:
+      return self.file.getContentFile()
+    finally:
+      self.file.trash()
+
   def getMetadata(self, base_document=False):
     """Returns a dictionary with all metadata of document.
     along with the metadata.
     """
     command = ["identify", "-verbose", self.file.getUrl()]
-    stdout, stderr = Popen(command,
-                          stdout=PIPE,
-                          stderr=PIPE,
-                          close_fds=True,
-                          text=True,
-                          env=self.environment).communicate()
+    with getConcurrencyLimit('imagemagick'):
+      stdout, stderr = Popen(command,
+                            stdout=PIPE,
+                            stderr=PIPE,
+                            close_fds=True,
+                            text=True,
+                            env=self.environment).communicate()
     self.file.trash()
     metadata_dict = {}
     for std in stdout.split("\n"):
@@ -94,6 +110,11 @@ class Handler:
     """
     raise NotImplementedError
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return getConcurrencyLimit('imagemagick').capacity
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype):
     """Returns a list content_type and their titles which are supported
@@ -106,3 +127,8 @@ class Handler:
     """
     # XXX NotImplemented
     return []
+
+
+def bootstrapHandler(configuration_dict):
+  setConcurrencyLimit('imagemagick',
+                      int(configuration_dict.get('imagemagick_max_concurrency', 0)))
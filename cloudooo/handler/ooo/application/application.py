@@ -28,11 +28,39 @@
 #
 ##############################################################################
 
+from threading import Lock
+from time import time
 from zope.interface import implementer
 from cloudooo.interfaces.application import IApplication
 from cloudooo.util import logger
-from cloudooo.handler.ooo.util import waitStopDaemon
-from psutil import pid_exists, Process, AccessDenied
+from cloudooo.handler.ooo.util import waitStopDaemon, probeSocket
+
+
+class HealthCheck:
+  """Tracks if the process spawned by an application is running and accepts
+  connections on its port. Only the exit status of the child and a
+  connection to its port are checked, and the result of the connection is
+  kept for ttl seconds."""
+
+  def __init__(self, ttl=0.5):
+    self.ttl = ttl
+    self._lock = Lock()
+    self._pid = None
+    self._status = False
+    self._checked_at = 0
+
+  def status(self, process, hostname, port):
+    """Returns True if the process is running and listening"""
+    if process is None or process.poll() is not None:
+      return False
+    now = time()
+    with self._lock:
+      if self._pid == process.pid and now - self._checked_at < self.ttl:
+        return self._status
+    status = probeSocket(hostname, port)
+    with self._lock:
+      self._pid, self._status, self._checked_at = process.pid, status, now
+    return status
 
 
 @implementer(IApplication)
@@ -52,15 +80,16 @@ class Application:
 
   def stop(self):
     """Stop the process"""
-    if hasattr(self, 'process') and self.status():
-      process_pid = self.process.pid
-      logger.debug("Stop Pid - %s", process_pid)
-      try:
-        self.process.terminate()
-        waitStopDaemon(self, self.timeout)
-      finally:
-        if pid_exists(process_pid) or self.status():
-          Process(process_pid).kill()
+    if hasattr(self, 'process'):
+      if self.process.poll() is None:
+        logger.debug("Stop Pid - %s", self.process.pid)
+        try:
+          self.process.terminate()
+          waitStopDaemon(self, self.timeout)
+        finally:
+          if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
       delattr(self, "process")
 
   def loadSettings(self, hostname, port, path_run_dir, **kwargs):
@@ -74,6 +103,7 @@ class Application:
     self.port = port
     self.path_run_dir = path_run_dir
     self.timeout = kwargs.get('start_timeout', 20)
+    self.health_check = HealthCheck(kwargs.get('status_ttl', 0.5))
 
   def restart(self):
     """Start and Stop the process"""
@@ -82,20 +112,8 @@ class Application:
 
   def status(self):
     """Check by socket if the openoffice work."""
-    pid = self.pid()
-    if pid is None or not pid_exists(pid):
-      return False
-
-    process = Process(pid)
-    try:
-      for connection in process.connections():
-        if connection.status == 'LISTEN' and \
-            connection.laddr[1] == self.port:
-          return True
-    except AccessDenied:
-      return False
-
-    return False
+    return self.health_check.status(getattr(self, 'process', None),
+                                    self.hostname, self.port)
 
   def getAddress(self):
     """Return port and hostname of OOo Instance."""
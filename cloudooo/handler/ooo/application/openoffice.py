@@ -32,15 +32,43 @@ import pkg_resources
 import psutil
 import subprocess
 from psutil import AccessDenied, NoSuchProcess
+from os import mkdir, rename
 from os.path import exists, join
-from threading import Lock
+from shutil import copytree
+from tempfile import mkdtemp
+from threading import Lock, Thread
 from zope.interface import implementer
 from .application import Application
+from .unoworker import UnoWorker
 from cloudooo.interfaces.lockable import ILockable
 from cloudooo.util import logger
 from cloudooo.handler.ooo.util import waitStartDaemon, \
                                       removeDirectory, waitStopDaemon, \
-                                      socketStatus
+                                      socketStatus, getOfficeVersion
+
+# Configuration added to the golden profile, to not spend time in features
+# useless for a conversion server
+REGISTRY_MODIFICATIONS = """<?xml version="1.0" encoding="UTF-8"?>
+<oor:items xmlns:oor="http://openoffice.org/2001/registry" \
+xmlns:xs="http://www.w3.org/2001/XMLSchema" \
+xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<item oor:path="/org.openoffice.Office.Recovery/AutoSave">\
+<prop oor:name="Enabled" oor:op="fuse"><value>false</value></prop></item>
+<item oor:path="/org.openoffice.Office.Recovery/RecoveryInfo">\
+<prop oor:name="Enabled" oor:op="fuse"><value>false</value></prop></item>
+<item oor:path="/org.openoffice.Office.Common/Save/Document">\
+<prop oor:name="AutoSave" oor:op="fuse"><value>false</value></prop></item>
+<item oor:path="/org.openoffice.Office.Common/Java">\
+<prop oor:name="Enable" oor:op="fuse"><value>false</value></prop></item>
+<item oor:path="/org.openoffice.Office.Jobs/Jobs/\
+org.openoffice.Office.Jobs:Job['UpdateCheck']/Arguments">\
+<prop oor:name="AutoCheckEnabled" oor:op="fuse"><value>false</value></prop>\
+</item>
+</oor:items>
+"""
+
+# Only one golden profile is created at a time
+golden_profile_lock = Lock()
 
 
 @implementer(ILockable)
@@ -56,6 +84,10 @@ class OpenOffice(Application):
     """
     self._bin_soffice = 'soffice.bin'
     self._lock = Lock()
+    self.uno_worker = UnoWorker(self)
+    self._standby = None
+    self._standby_thread = None
+    self._standby_started = False
     self._cleanRequest()
 
   def _testOpenOffice(self, host, port):
@@ -88,12 +120,19 @@ class OpenOffice(Application):
 
   def loadSettings(self, hostname, port, path_run_dir,
                    office_binary_path, uno_path, default_language,
-                   environment_dict=None, **kw):
+                   environment_dict=None, standby_port=None,
+                   golden_profile=False, registry_modifications=True, **kw):
     """Method to load the configuration to control one OpenOffice Instance
     Keyword arguments:
     office_path -- Full Path of the OOo executable.
       e.g office_binary_path='/opt/openoffice.org3/program'
     uno_path -- Full path of the Uno Library
+    standby_port -- Port of the standby instance which replaces this one
+      when it is recycled. None disables the standby instance.
+    golden_profile -- Start from a copy of a user installation created once
+      for the version of the office.
+    registry_modifications -- Disable AutoRecovery, AutoSave, Java and the
+      update checks in the golden profile.
     """
     if environment_dict is None:
       environment_dict = {}
@@ -102,12 +141,27 @@ class OpenOffice(Application):
     self.uno_path = uno_path
     self.default_language = default_language
     self.environment_dict = environment_dict
+    self.golden_profile = golden_profile
+    self.registry_modifications = registry_modifications
+    if standby_port is None:
+      self._standby = None
+    else:
+      if self._standby is None:
+        self._standby = OpenOffice()
+      self._standby.loadSettings(hostname, standby_port, path_run_dir,
+                                 office_binary_path, uno_path,
+                                 default_language, environment_dict,
+                                 golden_profile=golden_profile,
+                                 registry_modifications=registry_modifications)
 
   def _startProcess(self, command, env):
     """Start OpenOffice.org process"""
     for i in range(5):
       self.stop()
       waitStopDaemon(self, self.timeout)
+      if socketStatus(self.hostname, self.port):
+        # the port is used by a process we did not spawn
+        self._releaseOpenOfficePort()
       self.process = subprocess.Popen(command, close_fds=True, env=env)
       if not waitStartDaemon(self, self.timeout):
         continue
@@ -128,12 +182,77 @@ class OpenOffice(Application):
       except Exception:
         logger.error("Unexpected error releasing openoffice port", exc_info=True)
 
+  def _getProfileEnvironment(self, path_user_installation):
+    """Returns the environment to run soffice.bin with the profile"""
+    env = self.environment_dict.copy()
+    env.setdefault("LANG", "en_US.UTF-8")
+    env["HOME"] = path_user_installation
+    env["TMP"] = path_user_installation
+    env["TMPDIR"] = path_user_installation
+    return env
+
+  def _getGoldenProfile(self):
+    """Returns the path of the golden profile, creating it if needed.
+    Returns None if it can not be created."""
+    golden_path = join(self.path_run_dir, "cloudooo_profile_%s%s" % (
+      getOfficeVersion(self.office_binary_path),
+      self.registry_modifications and '_r' or ''))
+    with golden_profile_lock:
+      if exists(golden_path):
+        return golden_path
+      logger.debug("Create golden profile %s", golden_path)
+      # the profile is created aside and renamed when complete
+      path = mkdtemp(dir=self.path_run_dir)
+      if self.registry_modifications:
+        user_path = join(path, 'user')
+        mkdir(user_path)
+        with open(join(user_path, 'registrymodifications.xcu'), 'w') as f:
+          f.write(REGISTRY_MODIFICATIONS)
+      command = [join(self.office_binary_path, self._bin_soffice),
+                 '--headless',
+                 '--invisible',
+                 '--nocrashreport',
+                 '--nologo',
+                 '--nodefault',
+                 '--norestore',
+                 '--nofirststartwizard',
+                 '--terminate_after_init',
+                 '-env:UserInstallation=file://%s' % path,
+                 '--language=%s' % self.default_language,
+                 ]
+      try:
+        subprocess.run(command, close_fds=True, check=True,
+                       timeout=self.timeout * 5,
+                       env=self._getProfileEnvironment(path),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+      except (subprocess.SubprocessError, OSError):
+        logger.error("Can not create golden profile", exc_info=True)
+        removeDirectory(path)
+        return None
+      rename(path, golden_path)
+    return golden_path
+
+  def _copyProfile(self, golden_path, path_user_installation):
+    """Copy the golden profile, sharing the data on filesystems supporting
+    it"""
+    try:
+      subprocess.check_call(['cp', '-a', '--reflink=auto',
+                             golden_path, path_user_installation],
+                            close_fds=True, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, OSError):
+      removeDirectory(path_user_installation)
+      copytree(golden_path, path_user_installation, symlinks=True)
+
   def start(self, init=True):
     """Start Instance."""
     self.path_user_installation = join(self.path_run_dir, \
         "cloudooo_instance_%s" % self.port)
     if init and exists(self.path_user_installation):
       removeDirectory(self.path_user_installation)
+    if self.golden_profile and not exists(self.path_user_installation):
+      golden_path = self._getGoldenProfile()
+      if golden_path is not None:
+        self._copyProfile(golden_path, self.path_user_installation)
     # Create command with all parameters to start the instance
     self.command = [join(self.office_binary_path, self._bin_soffice),
          '--headless',
@@ -148,11 +267,7 @@ class OpenOffice(Application):
          '--language=%s' % self.default_language,
          ]
     # To run soffice.bin, several environment variables should be set.
-    env = self.environment_dict.copy()
-    env.setdefault("LANG", "en_US.UTF-8")
-    env["HOME"] = self.path_user_installation
-    env["TMP"] = self.path_user_installation
-    env["TMPDIR"] = self.path_user_installation
+    env = self._getProfileEnvironment(self.path_user_installation)
     self._startProcess(self.command, env)
     self._cleanRequest()
     super().start()
@@ -160,9 +275,65 @@ class OpenOffice(Application):
   def stop(self):
     """Stop the instance by pid. By the default
     the signal is 15."""
+    # the worker may be blocked in a call to the instance (e.g. when the
+    # instance is stopped because it does not respond), do not wait for it
+    self.uno_worker.kill()
     super().stop()
-    if socketStatus(self.hostname, self.port):
-      self._releaseOpenOfficePort()
+    self._cleanRequest()
+
+  def startStandby(self):
+    """Start the standby instance in background, if it is enabled and not
+    already started."""
+    if self._standby is None or self._standby_started or \
+        self._isStandbyBusy():
+      return
+    logger.debug("Start standby of OpenOffice %s, %s", *self.getAddress())
+    self._standby_started = True
+    self._runStandby(self._standby.start)
+
+  def _isStandbyBusy(self):
+    """Returns True while the standby instance is starting or stopping"""
+    return self._standby_thread is not None and self._standby_thread.is_alive()
+
+  def _runStandby(self, method):
+    self._standby_thread = Thread(target=method, daemon=True)
+    self._standby_thread.start()
+
+  def isStandbyReady(self):
+    """Returns True if the standby instance is started and works"""
+    return self._standby_started and not self._isStandbyBusy() and \
+           self._standby.status()
+
+  def stopStandby(self):
+    """Stop the standby instance"""
+    if self._standby is None:
+      return
+    if self._standby_thread is not None:
+      self._standby_thread.join()
+    self._standby.stop()
+    self._standby_started = False
+
+  def recycle(self):
+    """Replace the process by the standby one if it is ready, otherwise
+    restart it. The instance must be locked.
+    The previous process is stopped in background, and its port is used by
+    the next standby instance."""
+    if not self.isStandbyReady():
+      self.restart()
+      return
+    standby = self._standby
+    logger.debug("Swap OpenOffice %s with standby on port %s",
+                 self.port, standby.port)
+    for name in ('port', 'process', 'path_user_installation', 'command',
+                 'health_check'):
+      value = getattr(self, name, None)
+      setattr(self, name, getattr(standby, name))
+      setattr(standby, name, value)
+    self._standby_started = False
+    if standby.process is None:
+      del standby.process
+    else:
+      self._runStandby(standby.stop)
     self._cleanRequest()
 
   def isLocked(self):
@@ -179,4 +350,84 @@ class OpenOffice(Application):
     logger.debug("OpenOffice %s, %s unlocked", *self.getAddress())
     self._lock.release()
 
+
+
+class OpenOfficePool:
+  """Object to control several OOo Instances listening on consecutive ports.
+  Each request leases the least loaded instance and locks it while it is
+  being used, so requests are serialized per instance instead of per process.
+  """
+
+  def __init__(self, *instance_list):
+    """The pool always contains the given instances, other instances are
+    created when the settings are loaded."""
+    self._lock = Lock()
+    self._instance_list = list(instance_list)
+    self._lease_dict = {instance: 0 for instance in self._instance_list}
+
+  def loadSettings(self, hostname, port, pool_size, path_run_dir,
+                   office_binary_path, uno_path, default_language,
+                   environment_dict=None, enable_standby=False, **kw):
+    """Load the configuration of all instances of the pool
+    Keyword arguments:
+    port -- Port of the first instance, other instances use the next ports.
+    pool_size -- Number of instances to start.
+    enable_standby -- Each instance is recycled by swapping it with a
+      standby instance, listening on the ports following the ones of the
+      pool.
+    """
+    with self._lock:
+      while len(self._instance_list) < pool_size:
+        instance = OpenOffice()
+        self._instance_list.append(instance)
+        self._lease_dict[instance] = 0
+      instance_count = len(self._instance_list)
+      for offset, instance in enumerate(self._instance_list):
+        if enable_standby:
+          standby_port = port + instance_count + offset
+        else:
+          standby_port = None
+        instance.loadSettings(hostname, port + offset, path_run_dir,
+                              office_binary_path, uno_path, default_language,
+                              environment_dict=environment_dict,
+                              standby_port=standby_port, **kw)
+
+  def getInstanceList(self):
+    """Returns all instances of the pool"""
+    return list(self._instance_list)
+
+  def start(self, init=True):
+    """Start all instances"""
+    for instance in self._instance_list:
+      instance.start(init=init)
+
+  def stop(self):
+    """Stop all instances"""
+    for instance in self._instance_list:
+      instance.stop()
+      instance.stopStandby()
+
+  def acquire(self):
+    """Lease the least loaded instance and lock it.
+    Instances which are running are preferred over the stopped ones.
+    """
+    with self._lock:
+      instance = min(self._instance_list,
+                     key=lambda instance: (instance.hasExited(),
+                                           self._lease_dict[instance]))
+      self._lease_dict[instance] += 1
+    instance.acquire()
+    return instance
+
+  def release(self, instance):
+    """Unlock the instance and give back the lease."""
+    instance.release()
+    with self._lock:
+      self._lease_dict[instance] -= 1
+
+  def getLeaseCount(self, instance):
+    """Returns the number of requests using or waiting for the instance"""
+    return self._lease_dict[instance]
+
 openoffice = OpenOffice()
+openoffice_pool = OpenOfficePool(openoffice)
@@ -0,0 +1,130 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#                    Gabriel M. Monnerat <gabriel@tiolive.com>
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+import json
+import pkg_resources
+from os.path import exists, join
+from subprocess import Popen, PIPE, TimeoutExpired
+from threading import Lock
+from cloudooo.util import logger
+
+
+class UnoWorker:
+  """Resident python process keeping one UNO bridge opened to an OOo
+  instance. The jobs are the arguments of unoconverter.py, so the worker
+  avoids to start a python interpreter and to connect to the instance for
+  each request. The worker is restarted only when its bridge is dead.
+  """
+
+  def __init__(self, openoffice):
+    """Expects the OpenOffice object the worker connects to"""
+    self.openoffice = openoffice
+    self.process = None
+    # the watchdog may stop the worker while a request uses it
+    self._lock = Lock()
+
+  def _start(self):
+    """Start the worker process, the worker must be locked"""
+    hostname, port = self.openoffice.getAddress()
+    python = join(self.openoffice.office_binary_path, "python")
+    command = [exists(python) and python or "python3",
+               pkg_resources.resource_filename("cloudooo",
+                                   join('handler', 'ooo',
+                                        "helper", "unoworker.py")),
+               "--uno_path=%s" % self.openoffice.uno_path,
+               "--office_binary_path=%s" % self.openoffice.office_binary_path,
+               "--hostname=%s" % hostname,
+               "--port=%s" % port]
+    self.process = Popen(command, stdin=PIPE, stdout=PIPE, close_fds=True,
+                         env=self.openoffice.environment_dict.copy())
+    # the bridge is connected to this office process only
+    self.office_pid = self.openoffice.pid()
+    logger.debug("UnoWorker started for port %s. Pid %s", port,
+                 self.process.pid)
+
+  def _detach(self, process=None):
+    """Forget the worker process, if it is the given one, and returns it"""
+    with self._lock:
+      if process is None or process is self.process:
+        process, self.process = self.process, None
+        return process
+
+  def stop(self):
+    """Stop the worker process, and kill it if it does not exit"""
+    process = self._detach()
+    if process is not None and process.poll() is None:
+      logger.debug("Stop UnoWorker Pid - %s", process.pid)
+      try:
+        process.stdin.close()
+        process.wait(5)
+      except (OSError, TimeoutExpired):
+        process.kill()
+        process.wait()
+
+  def kill(self):
+    """Kill the worker process without waiting for the running job"""
+    process = self._detach()
+    if process is not None and process.poll() is None:
+      logger.debug("Kill UnoWorker Pid - %s", process.pid)
+      process.kill()
+      process.wait()
+
+  def status(self):
+    """Check if the worker is running"""
+    process = self.process
+    return process is not None and process.poll() is None
+
+  def call(self, argument_list):
+    """Run one job and returns stdout and stderr as bytes, like if
+    unoconverter.py was started with the given arguments."""
+    with self._lock:
+      process = self.process
+      if process is None or process.poll() is not None or \
+          self.office_pid != self.openoffice.pid():
+        if process is not None and process.poll() is None:
+          process.kill()
+          process.wait()
+        self._start()
+        process = self.process
+    try:
+      process.stdin.write(json.dumps(argument_list).encode() + b'\n')
+      process.stdin.flush()
+      answer = process.stdout.readline()
+    except (OSError, ValueError):
+      answer = b''
+    if not answer:
+      # the worker exited or was stopped, the next job restarts it
+      process = self._detach(process)
+      if process is not None:
+        process.kill()
+        process.wait()
+      return b'', b'UnoWorker exited while running the job'
+    answer = json.loads(answer)
+    return answer['stdout'].encode(), answer['stderr'].encode()
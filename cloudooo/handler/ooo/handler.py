@@ -32,16 +32,19 @@ import json
 import pkg_resources
 import mimetypes
 from base64 import decodebytes, encodebytes
-from os import environ, path
+from io import BytesIO
+from os import environ, path, listdir
 from subprocess import Popen, PIPE
-from cloudooo.handler.ooo.application.openoffice import openoffice
+from cloudooo.handler.ooo.application.openoffice import openoffice_pool
 from zope.interface import implementer
 from cloudooo.interfaces.handler import IHandler
 from cloudooo.handler.ooo.mimemapper import mimemapper
 from cloudooo.handler.ooo.document import FileSystemDocument
+from cloudooo.file import FileData
+from cloudooo.handler.ooo.util import scanUnsafeLink
 from cloudooo.handler.ooo.monitor.timeout import MonitorTimeout
-from cloudooo.handler.ooo.monitor import monitor_sleeping_time
-from cloudooo.util import logger, parseContentType, loadMimetypeList
+import cloudooo.handler.ooo.monitor as monitor
+from cloudooo.util import logger, parseContentType, loadMimetypeList, zipTree
 from psutil import pid_exists
 
 
@@ -54,6 +57,7 @@ class Handler:
   """
 
   enable_scripting = False
+  enable_uno_worker = False
 
   def __init__(self, base_folder_url, data, source_format, **kw):
     """Creates document in file system and loads it in OOo."""
@@ -63,6 +67,7 @@ class Handler:
     self.timeout = kw.get("timeout", 600)
     self.refresh = kw.get('refresh', False)
     self.source_format = source_format
+    self.base_folder_url = base_folder_url
     if not self.uno_path:
       self.uno_path = environ.get("uno_path")
     if not self.office_binary_path:
@@ -75,6 +80,8 @@ class Handler:
       # Cloudooo expect utf-8 encoded csv, but also tolerate latin9 for
       # backward compatibility.
       # The heuristic is "if it's not utf-8", let's assume it's iso-8859-15.
+      if isinstance(data, FileData):
+        data = data.read()
       try:
         data.decode('utf-8')
       except UnicodeDecodeError:
@@ -87,7 +94,7 @@ class Handler:
 
   def _getCommand(self, *args, **kw):
     """Transforms all parameters passed in a command"""
-    hostname, port = openoffice.getAddress()
+    hostname, port = self.openoffice.getAddress()
     kw['hostname'] = hostname
     kw['port'] = port
     python = path.join(self.office_binary_path, "python")
@@ -106,7 +113,7 @@ class Handler:
 
   def _startTimeout(self):
     """start the Monitor"""
-    self.monitor = MonitorTimeout(openoffice, self.timeout)
+    self.monitor = MonitorTimeout(self.openoffice, self.timeout)
     self.monitor.start()
     return
 
@@ -117,12 +124,11 @@ class Handler:
 
   def _subprocess(self, command_list):
     """Run one procedure"""
-    if monitor_sleeping_time is not None:
-      monitor_sleeping_time.touch()
+    monitor.touch(self.openoffice)
     try:
       self._startTimeout()
       process = Popen(command_list, stdout=PIPE, stderr=PIPE, close_fds=True,
-                      env=openoffice.environment_dict.copy())
+                      env=self.openoffice.environment_dict.copy())
       stdout, stderr = process.communicate()
     finally:
       self._stopTimeout()
@@ -130,20 +136,36 @@ class Handler:
         process.terminate()
     return stdout, stderr
 
+  def _callUnoWorker(self, command_list):
+    """Run one procedure in the resident UNO worker of the instance"""
+    monitor.touch(self.openoffice)
+    try:
+      self._startTimeout()
+      # the worker expects the arguments of unoconverter.py only
+      return self.openoffice.uno_worker.call(command_list[2:])
+    finally:
+      self._stopTimeout()
+
+  def _runCommand(self, command_list):
+    """Run one procedure in the UNO worker or in a new process"""
+    if self.enable_uno_worker:
+      return self._callUnoWorker(command_list)
+    return self._subprocess(command_list)
+
   def _callUnoConverter(self, *feature_list, **kw):
     """ """
-    if not openoffice.status():
-      openoffice.start()
+    if not self.openoffice.status():
+      self.openoffice.start()
     command_list = self._getCommand(*feature_list, **kw)
-    stdout, stderr = self._subprocess(command_list)
+    stdout, stderr = self._runCommand(command_list)
     if not stdout and stderr:
       first_error = stderr
       logger.error(stderr.decode())
       self.document.restoreOriginal()
-      openoffice.restart()
+      self.openoffice.restart()
       kw['document_url'] = self.document.getUrl()
       command = self._getCommand(*feature_list, **kw)
-      stdout, stderr = self._subprocess(command)
+      stdout, stderr = self._runCommand(command)
       if not stdout and stderr:
         second_error = b"\nerror of the second run: " + stderr
         logger.error(second_error.decode())
@@ -151,30 +173,43 @@ class Handler:
 
     return stdout, stderr
 
+  def _checkUnsafeLink(self):
+    """Reject the document if it contains unsafe links before using an
+    office instance. Returns the serialized link_check argument, telling to
+    unoconverter if it still has to check the document."""
+    return json.dumps(not scanUnsafeLink(self.document.getUrl()))
+
   def _serializeMimemapper(self,
                            source_extension=None,
                            destination_extension=None):
-    """Serialize parts of mimemapper"""
+    """Serialize the filters of mimemapper to use for the request.
+    destination_extension can be a list of extensions.
+    The parts of mimemapper common to all requests are in the file returned
+    by _getMimemapperPath"""
     if destination_extension is None:
-      return json.dumps(dict(mimetype_by_filter_type=mimemapper._mimetype_by_filter_type))
+      return json.dumps(dict(filter_list=[]))
 
+    if isinstance(destination_extension, str):
+      destination_extension_list = [destination_extension]
+    else:
+      destination_extension_list = destination_extension
     filter_list = []
     service_type_list = mimemapper._doc_type_list_by_extension.get(
       source_extension, mimemapper.document_service_list)
-    for service_type in service_type_list:
-      filter_list.append((destination_extension,
-                          service_type,
-                          mimemapper.getFilterName(destination_extension, service_type)))
+    for destination_extension in destination_extension_list:
+      for service_type in service_type_list:
+        filter_list.append((destination_extension,
+                            service_type,
+                            mimemapper.getFilterName(destination_extension, service_type)))
     logger.debug("Filter List: %r", filter_list)
-    return json.dumps(dict(doc_type_list_by_extension=mimemapper._doc_type_list_by_extension,
-                            filter_list=filter_list,
-                            mimetype_by_filter_type=mimemapper._mimetype_by_filter_type))
+    return json.dumps(dict(filter_list=filter_list))
 
-  def convert(self, destination_format=None, **kw):
-    """Convert a document to another format supported by the OpenOffice
-    Keyword Arguments:
-    destination_format -- extension of document as String
-    """
+  def _getMimemapperPath(self):
+    """Returns the file with the parts of mimemapper used by all requests"""
+    return mimemapper.getStaticCatalogPath(self.base_folder_url)
+
+  def _convert(self, destination_format=None, **kw):
+    """Converts the document and reloads it with the output"""
     if not self.enable_scripting and kw.get('script'):
       raise Exception("ooo: scripting is disabled")
     logger.debug("OooConvert: %s > %s", self.source_format, destination_format)
@@ -184,33 +219,117 @@ class Handler:
     kw['mimemapper'] = self._serializeMimemapper(self.source_format,
                                                  destination_format)
     kw['refresh'] = json.dumps(self.refresh)
-    openoffice.acquire()
+    kw['link_check'] = self._checkUnsafeLink()
+    self.openoffice = openoffice_pool.acquire()
     try:
       stdout, _ = self._callUnoConverter(*['convert'], **kw)
     finally:
-      openoffice.release()
+      openoffice_pool.release(self.openoffice)
     url = stdout.replace(b'\n', b'')
     self.document.reload(url)
+
+  def convert(self, destination_format=None, **kw):
+    """Convert a document to another format supported by the OpenOffice
+    Keyword Arguments:
+    destination_format -- extension of document as String
+    """
+    self._convert(destination_format, **kw)
     content = self.document.getContent(self.zip)
     self.document.trash()
     return content
 
+  def convertToFile(self, destination_format=None, **kw):
+    """Like convert, but returns the document as FileData to not read it
+    in memory"""
+    self._convert(destination_format, **kw)
+    try:
+      return self.document.getContentFile(self.zip)
+    finally:
+      self.document.trash()
+
+  def _getOutputContent(self, url):
+    """Returns the content of an output created in its own folder"""
+    if self.zip:
+      output_folder = path.dirname(url)
+      zip_file = zipTree(BytesIO(),
+                         *[(path.join(output_folder, name), '')
+                           for name in listdir(output_folder)])
+      return zip_file.getvalue()
+    with open(url, 'rb') as f:
+      return f.read()
+
+  def convertMulti(self, destination_format_list):
+    """Load the document once and convert it to each format.
+    Returns a dictionary with the content by format.
+    Keyword Arguments:
+    destination_format_list -- list of extensions as String
+    """
+    logger.debug("OooConvertMulti: %s > %s", self.source_format,
+                 destination_format_list)
+    kw = dict(source_format=self.source_format,
+              destination_format_list=json.dumps(destination_format_list),
+              mimemapper=self._serializeMimemapper(self.source_format,
+                                                   destination_format_list),
+              refresh=json.dumps(self.refresh),
+              link_check=self._checkUnsafeLink())
+    self.openoffice = openoffice_pool.acquire()
+    try:
+      stdout, _ = self._callUnoConverter(*['convert'], **kw)
+    finally:
+      openoffice_pool.release(self.openoffice)
+    url_dict = json.loads(decodebytes(stdout))
+    try:
+      return {destination_format: self._getOutputContent(url_dict[destination_format])
+              for destination_format in destination_format_list}
+    finally:
+      self.document.trash()
+
+  def convertAndGetMetadata(self, destination_format, **kw):
+    """Convert a document and returns a tuple with the converted content
+    and the metadata of the original document, the document is loaded only
+    once.
+    Keyword Arguments:
+    destination_format -- extension of document as String
+    """
+    if not self.enable_scripting and kw.get('script'):
+      raise Exception("ooo: scripting is disabled")
+    logger.debug("OooConvertAndGetMetadata: %s > %s", self.source_format,
+                 destination_format)
+    kw.update(source_format=self.source_format,
+              destination_format=destination_format,
+              mimemapper=self._serializeMimemapper(self.source_format,
+                                                   destination_format),
+              mimemapper_path=self._getMimemapperPath(),
+              refresh=json.dumps(self.refresh),
+              link_check=self._checkUnsafeLink())
+    self.openoffice = openoffice_pool.acquire()
+    try:
+      stdout, _ = self._callUnoConverter(*['getmetadata', 'convert'], **kw)
+    finally:
+      openoffice_pool.release(self.openoffice)
+    metadata = json.loads(decodebytes(stdout))
+    self.document.reload(metadata.pop('document_url'))
+    content = self.document.getContent(self.zip)
+    self.document.trash()
+    return content, metadata
+
   def getMetadata(self, base_document=False):
     """Returns a dictionary with all metadata of document.
     Keywords Arguments:
     base_document -- Boolean variable. if true, the document content (as bytes)
     is also returned along with the metadata."""
     logger.debug("getMetadata")
-    kw = dict(mimemapper=self._serializeMimemapper())
+    kw = dict(mimemapper_path=self._getMimemapperPath(),
+              link_check=self._checkUnsafeLink())
     if base_document:
       feature_list = ['getmetadata', 'convert']
     else:
       feature_list = ['getmetadata']
-    openoffice.acquire()
+    self.openoffice = openoffice_pool.acquire()
     try:
       stdout, _ = self._callUnoConverter(*feature_list, **kw)
     finally:
-      openoffice.release()
+      openoffice_pool.release(self.openoffice)
     metadata = json.loads(decodebytes(stdout))
     if 'document_url' in metadata:
       self.document.reload(metadata['document_url'])
@@ -225,16 +344,22 @@ class Handler:
     metadata -- expected an dictionary with metadata.
     """
     metadata_pickled = json.dumps(metadata).encode()
-    kw = dict(metadata=encodebytes(metadata_pickled).decode())
-    openoffice.acquire()
+    kw = dict(metadata=encodebytes(metadata_pickled).decode(),
+              link_check=self._checkUnsafeLink())
+    self.openoffice = openoffice_pool.acquire()
     try:
       self._callUnoConverter(*['setmetadata'], **kw)
     finally:
-      openoffice.release()
+      openoffice_pool.release(self.openoffice)
     doc_loaded = self.document.getContent()
     self.document.trash()
     return doc_loaded
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return len(openoffice_pool.getInstanceList())
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype):
     """Returns a list content_type and their titles which are supported
@@ -269,13 +394,14 @@ class Handler:
 def bootstrapHandler(configuration_dict):
   # Bootstrap handler
   from signal import signal, SIGINT, SIGQUIT, SIGHUP
+  from threading import Thread
   from cloudooo.handler.ooo.mimemapper import mimemapper
-  from cloudooo.handler.ooo.application.openoffice import openoffice
+  from cloudooo.handler.ooo.application.openoffice import openoffice_pool
   import cloudooo.handler.ooo.monitor as monitor
 
   def stopProcesses(signum, frame):
     monitor.stop()
-    openoffice.stop()
+    openoffice_pool.stop()
 
   # Signal to stop all processes
   signal(SIGINT, stopProcesses)
@@ -284,22 +410,36 @@ def bootstrapHandler(configuration_dict):
 
   Handler.enable_scripting = ('false', 'true').index(
     configuration_dict.pop("ooo_enable_scripting", 'false'))
+  Handler.enable_uno_worker = ('false', 'true').index(
+    configuration_dict.pop("ooo_enable_uno_worker", 'false'))
 
   working_path = configuration_dict.get('working_path')
   application_hostname = configuration_dict.get('application_hostname')
   openoffice_port = int(configuration_dict.get('openoffice_port'))
+  openoffice_pool_size = int(configuration_dict.get('openoffice_pool_size', 1))
   environment_dict = configuration_dict['env']
-  # Loading Configuration to start OOo Instance and control it
-  openoffice.loadSettings(application_hostname,
-                          openoffice_port,
-                          working_path,
-                          configuration_dict.get('office_binary_path'),
-                          configuration_dict.get('uno_path'),
-                          configuration_dict.get('openoffice_user_interface_language',
-                                                 'en'),
-                          environment_dict=environment_dict,
-                          )
-  openoffice.start()
+  # Loading Configuration to start OOo Instances and control them
+  openoffice_pool.loadSettings(application_hostname,
+                               openoffice_port,
+                               openoffice_pool_size,
+                               working_path,
+                               configuration_dict.get('office_binary_path'),
+                               configuration_dict.get('uno_path'),
+                               configuration_dict.get('openoffice_user_interface_language',
+                                                      'en'),
+                               environment_dict=environment_dict,
+                               enable_standby=('false', 'true').index(
+                                 configuration_dict.get(
+                                   'openoffice_enable_standby', 'false')),
+                               golden_profile=('false', 'true').index(
+                                 configuration_dict.get(
+                                   'openoffice_golden_profile', 'false')),
+                               registry_modifications=('false', 'true').index(
+                                 configuration_dict.get(
+                                   'openoffice_registry_modifications',
+                                   'true')),
+                               )
+  openoffice_pool.start()
   monitor.load(configuration_dict)
 
   timeout_response = int(configuration_dict.get('timeout_response'))
@@ -309,8 +449,33 @@ def bootstrapHandler(configuration_dict):
             ooo_disable_filter_list=configuration_dict.get('ooo_disable_filter_list'),
             ooo_disable_filter_name_list=configuration_dict.get('ooo_disable_filter_name_list'))
 
+  # the results of the conversion cache depend on the office and its filters
+  configuration_dict['ooo_version'] = mimemapper.getFilterKey(**kw)
+
   # Load all filters
-  openoffice.acquire()
-  mimemapper.loadFilterList(application_hostname,
-                            openoffice_port, **kw)
-  openoffice.release()
+  if ('false', 'true').index(configuration_dict.get('ooo_filter_cache',
+                                                    'true')):
+    filter_cache_path = mimemapper.getFilterCachePath(working_path, **kw)
+  else:
+    filter_cache_path = None
+  if filter_cache_path and mimemapper.loadFilterCache(filter_cache_path):
+    # check the cached filters without delaying the start
+    def checkFilterList():
+      openoffice = openoffice_pool.acquire()
+      try:
+        if mimemapper.checkFilterList(*openoffice.getAddress(), **kw):
+          logger.info("Filters changed, update %s", filter_cache_path)
+          mimemapper.saveFilterCache(filter_cache_path)
+      except Exception:
+        logger.error("Can not check the filters", exc_info=True)
+      finally:
+        openoffice_pool.release(openoffice)
+    Thread(target=checkFilterList, daemon=True).start()
+  else:
+    openoffice = openoffice_pool.acquire()
+    try:
+      mimemapper.loadFilterList(*openoffice.getAddress(), **kw)
+    finally:
+      openoffice_pool.release(openoffice)
+    if filter_cache_path:
+      mimemapper.saveFilterCache(filter_cache_path)
@@ -35,7 +35,7 @@ import codecs
 import helper_util
 from unohelper import systemPathToFileUrl
 from os.path import dirname, splitext
-from tempfile import mktemp
+from tempfile import mktemp, mkdtemp
 from base64 import b64encode, b64decode
 from functools import partial
 from getopt import getopt, GetoptError
@@ -68,10 +68,18 @@ Options:
                         Folter path were is the uno library
   --destination_format=STRING
                         extension to export the document
+  --destination_format_list=LIST_SERIALIZED
+                        extensions to export the document, the document is
+                        loaded once and exported in each format. The list
+                        is passed using json
   --mimemapper=OBJECT_SERIALIZED
                         Mimemapper serialized. The object is passed using
                         json. IF this option is None, the object is
                         created
+  --mimemapper_path=STRING_URL
+                        File with the parts of the mimemapper common to all
+                        requests, serialized using json. Its content is
+                        merged with --mimemapper
   --metadata=DICT_SERIALIZED
                         Dictionary with metadata
   --infilter=FILTER_NAME[:FILTER_OPTIONS]
@@ -79,6 +87,10 @@ Options:
   --script=PYTHON_TEXT
                         Script to execute on the loaded document,
                         in Python langage
+  --link_check=BOOLEAN_SERIALIZED
+                        Check the links of the document after loading it.
+                        Disable it only if the document was already
+                        checked. Default is true.
 """
 
 
@@ -101,11 +113,15 @@ class UnoDocument:
     self.document_url = document_url
     self.source_format = source_format
     self.destination_format = destination_format
-    self.filter_list = [(x[1], x[2])
+    self.filter_list = self._getFilterList(destination_format)
+    self._load(*args)
+
+  def _getFilterList(self, destination_format):
+    """Returns the (document type, filter name) which export to the format"""
+    return [(x[1], x[2])
       for x in mimemapper.get("filter_list", ())
       if destination_format == x[0] and x[2]
     ] if mimemapper else ()
-    self._load(*args)
 
   def _createProperty(self, name, value):
     """Create property"""
@@ -186,21 +202,10 @@ class UnoDocument:
 
     return args
 
-  def _load(self, infilter, refresh):
-    """Create one document with basic properties
-    refresh argument tells to uno environment to
-    replace dynamic properties of document before conversion
-    """
-    createInstance = self.service_manager.createInstance
-    self.desktop = createInstance("com.sun.star.frame.Desktop")
-    uno_url = systemPathToFileUrl(self.document_url)
-    self.document_loaded = uno_document = self.desktop.loadComponentFromURL(
-        uno_url,
-        "_blank",
-        0,
-        self._getPropertyToImport(infilter))
-    if not uno_document:
-      raise AttributeError("This document can not be loaded or is empty")
+  def _checkLink(self, uno_document):
+    """Export the loaded document to check that it does not load unsafe
+    links. cloudooo scans the documents it can read before sending them, so
+    it is only needed for the other formats."""
     def isSafeUrl(url):
       parsed_url = urlparse(url)
       if parsed_url.scheme == 'data':
@@ -231,6 +236,30 @@ class UnoDocument:
         parser = CustomHTMLParser()
         with open(temp_file.name, 'r') as f:
           parser.feed(f.read())
+
+  def _load(self, infilter, refresh, link_check=True):
+    """Create one document with basic properties
+    refresh argument tells to uno environment to
+    replace dynamic properties of document before conversion
+    link_check argument tells to export the document to check that it does
+    not contain unsafe links
+    """
+    createInstance = self.service_manager.createInstance
+    self.desktop = createInstance("com.sun.star.frame.Desktop")
+    uno_url = systemPathToFileUrl(self.document_url)
+    self.document_loaded = uno_document = self.desktop.loadComponentFromURL(
+        uno_url,
+        "_blank",
+        0,
+        self._getPropertyToImport(infilter))
+    if not uno_document:
+      raise AttributeError("This document can not be loaded or is empty")
+    if link_check:
+      try:
+        self._checkLink(uno_document)
+      except Exception:
+        uno_document.dispose()
+        raise
     if refresh:
       # Before converting to expected format, refresh dynamic
       # value inside document.
@@ -252,9 +281,10 @@ class UnoDocument:
       "Document": self.document_loaded,
     })
 
-  def convert(self):
-    """it converts a document to specific format"""
-    for document_type, filter_name in self.filter_list:
+  def export(self, destination_format, output_dir=None):
+    """it exports the loaded document to specific format, the document is
+    kept loaded"""
+    for document_type, filter_name in self._getFilterList(destination_format):
       if document_type == self.document_type:
         property_list = [
           self._createProperty("Overwrite", True),
@@ -266,17 +296,42 @@ class UnoDocument:
     else:
         property_list = ()
 
-    ext = self.destination_format
+    ext = destination_format
     if ext in ("html", "htm", "xhtml"):
       ext = "impr.html"
     output_url = mktemp(suffix='.' + ext if ext else '',
-                        dir=dirname(self.document_url))
+                        dir=output_dir or dirname(self.document_url))
+    self.document_loaded.storeToURL(systemPathToFileUrl(output_url),
+       property_list)
+    return output_url
+
+  def convert(self):
+    """it converts a document to specific format"""
     try:
-      self.document_loaded.storeToURL(systemPathToFileUrl(output_url),
-         property_list)
+      return self.export(self.destination_format)
+    finally:
+      self.document_loaded.dispose()
+
+  def convertMulti(self, destination_format_list):
+    """it converts a document to several formats and returns a dictionary
+    of output url by format. Each output is created in its own folder."""
+    try:
+      return {destination_format: self.export(destination_format,
+                                  mkdtemp(dir=dirname(self.document_url)))
+              for destination_format in destination_format_list}
+    finally:
+      self.document_loaded.dispose()
+
+  def convertAndGetMetadata(self):
+    """it reads the metadata of the loaded document and converts it to the
+    destination format. The url of the output is stored in the metadata as
+    document_url"""
+    try:
+      metadata = self.getMetadata()
+      metadata['document_url'] = self.export(self.destination_format)
+      return metadata
     finally:
       self.document_loaded.dispose()
-    return output_url
 
   def getMetadata(self):
     """Extract all metadata of the document"""
@@ -348,23 +403,39 @@ class UnoDocument:
     self.document_loaded.dispose()
 
 
+# mimemapper files already read by this process, by path
+mimemapper_file_dict = {}
+def loadMimemapperFile(path):
+  """Returns the content of a mimemapper file, which never changes"""
+  try:
+    return mimemapper_file_dict[path]
+  except KeyError:
+    import json
+    with open(path) as f:
+      value = mimemapper_file_dict[path] = json.load(f)
+    return value
+
+
 def help():
   sys.stderr.write(__doc__)
   sys.exit(1)
 
 
-def main():
+def run(argument_list, service_manager=None):
+  """Run the features given as command line arguments and returns the output.
+  If service_manager is None, a new connection to the office is opened.
+  """
   global mimemapper
 
   help_msg = "\nUse --help or -h\n"
   try:
-    opt_list, _ = getopt(sys.argv[1:], "h", ["help", "test",
+    opt_list, _ = getopt(argument_list, "h", ["help", "test",
       "convert", "getmetadata", "setmetadata",
       "uno_path=", "office_binary_path=",
       "hostname=", "port=", "source_format=",
-      "document_url=", "destination_format=",
-      "mimemapper=", "metadata=", "refresh=",
-      "unomimemapper_bin=", "infilter=", "script="])
+      "document_url=", "destination_format=", "destination_format_list=",
+      "mimemapper=", "mimemapper_path=", "metadata=", "refresh=",
+      "unomimemapper_bin=", "infilter=", "script=", "link_check="])
   except GetoptError as msg:
     msg = msg.msg + help_msg
     sys.stderr.write(msg)
@@ -374,9 +445,11 @@ def main():
 
   import json
 
-  metadata = mimemapper = script = None
+  metadata = mimemapper = mimemapper_path = script = None
   hostname = port = office_binary_path = uno_path = None
   document_url = destination_format = source_format = infilter = refresh = None
+  link_check = True
+  destination_format_list = None
   for opt, arg in iter(opt_list):
     if opt in ('-h', '--help'):
       help()
@@ -392,42 +465,67 @@ def main():
       uno_path = arg
     elif opt == '--destination_format':
       destination_format = arg
+    elif opt == '--destination_format_list':
+      destination_format_list = json.loads(arg)
     elif opt == '--source_format':
       source_format = arg
     elif opt == '--refresh':
       refresh = json.loads(arg)
+    elif opt == '--link_check':
+      link_check = json.loads(arg)
     elif opt == '--metadata':
       arg = b64decode(arg).decode('utf-8')
       metadata = json.loads(arg)
     elif opt == '--mimemapper':
       mimemapper = json.loads(arg)
+    elif opt == '--mimemapper_path':
+      mimemapper_path = arg
     elif opt == '--infilter':
       infilter = arg
     elif opt == '--script':
       script = arg
 
-  service_manager = helper_util.getServiceManager(
-    hostname, port, uno_path, office_binary_path)
+  if mimemapper_path:
+    mimemapper = dict(loadMimemapperFile(mimemapper_path), **(mimemapper or {}))
+  if destination_format is None and destination_format_list:
+    # the import filter may depend on the destination format
+    destination_format = destination_format_list[0]
+  if service_manager is None:
+    service_manager = helper_util.getServiceManager(
+      hostname, port, uno_path, office_binary_path)
   unodocument = UnoDocument(service_manager, document_url,
-    source_format, destination_format, infilter, refresh)
+    source_format, destination_format, infilter, refresh, link_check)
   if script:
     unodocument.runScript(script)
   if '--setmetadata' in param_list:
     unodocument.setMetadata(metadata)
     output = document_url
+  elif destination_format_list and '--convert' in param_list:
+    output_dict = unodocument.convertMulti(destination_format_list)
+    output = b64encode(json.dumps(output_dict).encode('utf-8')).decode()
+  elif destination_format and '--convert' in param_list and \
+      '--getmetadata' in param_list:
+    # metadata are read from the source document, which is exported in the
+    # same call
+    metadata_dict = unodocument.convertAndGetMetadata()
+    output = b64encode(json.dumps(metadata_dict).encode('utf-8')).decode()
   else:
     output = unodocument.convert() if "--convert" in param_list else None
     if '--getmetadata' in param_list:
       if output:
         # Instanciate new UnoDocument instance with new url
+        # the output comes from a document which was already checked
         unodocument = UnoDocument(service_manager, output,
-          destination_format or source_format, None, None, refresh)
+          destination_format or source_format, None, None, refresh, False)
       metadata_dict = unodocument.getMetadata()
       if output:
         metadata_dict['document_url'] = output
       output = b64encode(json.dumps(metadata_dict).encode('utf-8')).decode()
+  return output or ''
+
 
-  sys.stdout.write(output)
+def main():
+  sys.stdout.write(run(sys.argv[1:]))
 
 if "__main__" == __name__:
   main()
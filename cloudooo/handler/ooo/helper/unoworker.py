@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#                    Gabriel M. Monnerat <gabriel@tiolive.com>
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import sys
+import os
+import json
+import traceback
+import helper_util
+import unoconverter
+from getopt import getopt, GetoptError
+
+__doc__ = """
+
+usage: unoworker [options]
+
+Keeps one UNO bridge opened to the office and runs unoconverter jobs read
+from stdin. Each job is a json list of unoconverter arguments on one line,
+the answer is a json dictionary with 'stdout' and 'stderr' entries on one
+line. The worker exits when the bridge is dead.
+
+Options:
+  -h, --help            this help screen
+
+  --hostname=STRING     OpenOffice Instance address
+
+  --port=STRING         OpenOffice Instance port
+
+  --office_binary_path=STRING_URL
+                        Folder path were is the binary openoffice
+  --uno_path=STRING_URL
+                        Folter path were is the uno library
+"""
+
+
+def help():
+  sys.stderr.write(__doc__)
+  sys.exit(1)
+
+
+def isBridgeAlive(service_manager):
+  """Check if the office is still reachable through the bridge"""
+  try:
+    service_manager.createInstance("com.sun.star.frame.Desktop")
+  except Exception:
+    return False
+  return True
+
+
+def main():
+  try:
+    opt_list, _ = getopt(sys.argv[1:], "h", ["help",
+      "uno_path=", "office_binary_path=",
+      "hostname=", "port="])
+  except GetoptError as msg:
+    sys.stderr.write(msg.msg + "\nUse --help or -h\n")
+    sys.exit(2)
+
+  hostname = port = office_binary_path = uno_path = None
+  for opt, arg in opt_list:
+    if opt in ('-h', '--help'):
+      help()
+    elif opt == '--hostname':
+      hostname = arg
+    elif opt == '--port':
+      port = arg
+    elif opt == '--office_binary_path':
+      office_binary_path = arg
+    elif opt == '--uno_path':
+      uno_path = arg
+
+  service_manager = helper_util.getServiceManager(
+    hostname, port, uno_path, office_binary_path)
+
+  # Keep stdout for the answers, anything else printed goes to stderr
+  answer_file = os.fdopen(os.dup(1), 'w')
+  os.dup2(2, 1)
+  for line in sys.stdin:
+    argument_list = json.loads(line)
+    try:
+      answer = dict(stdout=unoconverter.run(argument_list, service_manager),
+                    stderr='')
+    except (Exception, SystemExit):
+      answer = dict(stdout='', stderr=traceback.format_exc())
+    answer_file.write(json.dumps(answer) + '\n')
+    answer_file.flush()
+    if answer['stderr'] and not isBridgeAlive(service_manager):
+      sys.exit(1)
+
+if "__main__" == __name__:
+  main()
@@ -34,10 +34,16 @@ from subprocess import Popen, PIPE
 from subprocess import STDOUT
 from zope.interface import implementer
 from .filter import Filter
-from os import environ, path
+from os import environ, path, replace
+from hashlib import md5
+from tempfile import NamedTemporaryFile
 from cloudooo.interfaces.mimemapper import IMimemapper
+from cloudooo.handler.ooo.util import getOfficeVersion
 import json
 
+# Version of the format of the filter cache files
+FILTER_CACHE_VERSION = 1
+
 
 @implementer(IMimemapper)
 class MimeMapper:
@@ -50,11 +56,15 @@ class MimeMapper:
     And lists to store the tags xml.
     """
     self._loaded = False
+    # incremented each time the catalog changes, to invalidate the results
+    # computed from it
+    self.version = 0
     self._filter_by_extension_dict = {}
     self._extension_list_by_type = {}
     self._doc_type_list_by_extension = {}
     self._mimetype_by_filter_type = {}
     self._document_type_dict = {}
+    self._buildIndexes()
 
   def _addFilter(self, filter):
     """Add filter in mimemapper catalog."""
@@ -63,9 +73,44 @@ class MimeMapper:
 
   def _typeToDocumentService(self, document_type):
     """Returns the document service according to document type."""
-    for k, v in self._document_type_dict.items():
-      if k.startswith(document_type):
-        return v
+    return self._document_service_by_prefix.get(document_type)
+
+  def _buildIndexes(self):
+    """Build the indexes used by the lookups from the loaded catalog"""
+    # the first document type starting with the prefix gives the service
+    document_service_by_prefix = {}
+    for document_type, document_service in self._document_type_dict.items():
+      for index in range(len(document_type) + 1):
+        document_service_by_prefix.setdefault(document_type[:index],
+                                              document_service)
+    filter_name_dict = {}
+    for extension, filter_list in self._filter_by_extension_dict.items():
+      for filter in filter_list:
+        key = extension, filter.getDocumentService()
+        if key not in filter_name_dict:
+          filter_name_dict[key] = self._selectFilterName(*key)
+    allowed_extension_list_by_service = {
+      document_service: tuple(extension_list)
+      for document_service, extension_list
+      in self._extension_list_by_type.items()}
+    allowed_extension_list_by_extension = {}
+    for extension, service_list in self._doc_type_list_by_extension.items():
+      # dict keeps the order and removes the duplicates
+      allowed_extension_dict = {}
+      for document_service in service_list:
+        for allowed_extension in allowed_extension_list_by_service.get(
+            document_service, ()):
+          allowed_extension_dict[allowed_extension] = None
+      allowed_extension_list_by_extension[extension] = \
+        tuple(allowed_extension_dict)
+    self._static_catalog_path = None
+    self._document_service_by_prefix = document_service_by_prefix
+    self._filter_name_dict = filter_name_dict
+    self._allowed_extension_list_by_service = \
+      allowed_extension_list_by_service
+    self._allowed_extension_list_by_extension = \
+      allowed_extension_list_by_extension
+    self.version += 1
 
   def isLoaded(self):
     """Verify if filters were loaded"""
@@ -218,8 +263,116 @@ class MimeMapper:
       'xls': ['com.sun.star.sheet.SpreadsheetDocument'],
       })
     self.document_service_list = list(self._extension_list_by_type.keys())
+    self._buildIndexes()
     self._loaded = True
 
+  def _getCatalog(self):
+    """Returns the loaded catalog as a dictionary serializable with json"""
+    filter_by_extension_dict = {}
+    for extension, filter_list in self._filter_by_extension_dict.items():
+      filter_by_extension_dict[extension] = [
+        (filter.getExtension(), filter.getName(), filter.getMimetype(),
+         filter.getDocumentService(), filter.isPreferred(),
+         filter.getSortIndex(), filter.getLabel())
+        for filter in filter_list]
+    return dict(version=FILTER_CACHE_VERSION,
+                filter_by_extension_dict=filter_by_extension_dict,
+                extension_list_by_type=self._extension_list_by_type,
+                doc_type_list_by_extension=self._doc_type_list_by_extension,
+                mimetype_by_filter_type=self._mimetype_by_filter_type,
+                document_type_dict=self._document_type_dict,
+                document_service_list=self.document_service_list)
+
+  def _setCatalog(self, catalog):
+    """Replace the catalog by one returned by _getCatalog"""
+    filter_by_extension_dict = {}
+    for extension, filter_list in catalog['filter_by_extension_dict'].items():
+      filter_by_extension_dict[extension] = [
+        Filter(ext, name, mimetype, document_service, preferred=preferred,
+               sort_index=sort_index, label=label)
+        for ext, name, mimetype, document_service, preferred, sort_index, label
+        in filter_list]
+    self._filter_by_extension_dict = filter_by_extension_dict
+    self._extension_list_by_type = {
+      document_service: [tuple(x) for x in extension_list]
+      for document_service, extension_list
+      in catalog['extension_list_by_type'].items()}
+    self._doc_type_list_by_extension = catalog['doc_type_list_by_extension']
+    self._mimetype_by_filter_type = catalog['mimetype_by_filter_type']
+    self._document_type_dict = catalog['document_type_dict']
+    self.document_service_list = catalog['document_service_list']
+    self._buildIndexes()
+    self._loaded = True
+
+  def getFilterKey(self, **kw):
+    """Returns a key which changes with the office binary path, its version
+    and the disabled filters.
+    **kw: same as loadFilterList
+    """
+    office_binary_path = kw.get("office_binary_path",
+                                environ.get('office_binary_path'))
+    key = json.dumps([office_binary_path,
+                      getOfficeVersion(office_binary_path),
+                      kw.get("ooo_disable_filter_list"),
+                      kw.get("ooo_disable_filter_name_list")])
+    return md5(key.encode('utf-8')).hexdigest()
+
+  def getFilterCachePath(self, working_path, **kw):
+    """Returns the path of the file caching the catalog, see getFilterKey.
+    **kw: same as loadFilterList
+    """
+    return path.join(working_path,
+                     "cloudooo_filter_%s.json" % self.getFilterKey(**kw))
+
+  def loadFilterCache(self, cache_path):
+    """Load the catalog from the cache file. Returns False if there is no
+    valid cache file."""
+    try:
+      with open(cache_path) as f:
+        catalog = json.load(f)
+    except (OSError, ValueError):
+      return False
+    if catalog.get('version') != FILTER_CACHE_VERSION:
+      return False
+    self._setCatalog(catalog)
+    return True
+
+  def saveFilterCache(self, cache_path):
+    """Write the loaded catalog in the cache file"""
+    with NamedTemporaryFile('w', dir=path.dirname(cache_path),
+                            delete=False) as f:
+      json.dump(self._getCatalog(), f)
+    replace(f.name, cache_path)
+
+  def getStaticCatalogPath(self, folder):
+    """Returns the path of a file with the parts of the catalog used by
+    unoconverter.py for all requests. The file is written in folder once for
+    each catalog."""
+    static_catalog_path = self._static_catalog_path
+    if static_catalog_path is None or not path.exists(static_catalog_path):
+      data = json.dumps(dict(
+        mimetype_by_filter_type=self._mimetype_by_filter_type)).encode('utf-8')
+      static_catalog_path = path.join(folder, "cloudooo_mimemapper_%s.json" %
+                                      md5(data).hexdigest())
+      if not path.exists(static_catalog_path):
+        with NamedTemporaryFile(dir=folder, delete=False) as f:
+          f.write(data)
+        replace(f.name, static_catalog_path)
+      self._static_catalog_path = static_catalog_path
+    return static_catalog_path
+
+  def checkFilterList(self, hostname, port, **kw):
+    """Load the filters from openoffice and replace the catalog if it is
+    different. Returns True if the catalog was replaced.
+    Arguments are the same as loadFilterList."""
+    live_mimemapper = MimeMapper()
+    live_mimemapper.loadFilterList(hostname, port, **kw)
+    catalog = json.loads(json.dumps(live_mimemapper._getCatalog()))
+    if catalog == json.loads(json.dumps(self._getCatalog())):
+      return False
+    self._setCatalog(catalog)
+    return True
+
   def getFilterName(self, extension, document_service):
     """Get filter name according to the parameters passed.
     Keyword arguments:
@@ -229,6 +382,11 @@ class MimeMapper:
     >>> mimemapper.getFilterName("sdw", "com.sun.star.text.TextDocument")
     'StarWriter 3.0'
     """
+    return self._filter_name_dict.get((extension, document_service), '')
+
+  def _selectFilterName(self, extension, document_service):
+    """Select the filter of the extension for the document service, among
+    all the loaded filters"""
     filter_list = [filter for filter in self.getFilterList(extension) \
         if filter.getDocumentService() == document_service]
     if len(filter_list) > 1:
@@ -269,21 +427,11 @@ class MimeMapper:
     ('htm', 'HTML Document'),)
     If both params are passed, document_type is discarded.
     """
-    allowed_extension_list = []
-    document_type_list = []
     if extension:
-      document_type_list.extend(self._doc_type_list_by_extension.get(extension, []))
+      return self._allowed_extension_list_by_extension.get(extension, ())
     elif document_type:
-      document_type = self._typeToDocumentService(document_type)
-      allowed_extension_list.extend(self._extension_list_by_type.get(document_type, []))
-    # gets list of extensions of each document type if document_type_list isn't
-    # empty.
-    for type in document_type_list:
-      # gets list of extensions with key document type
-      extension_list = self._extension_list_by_type.get(type)
-      for ext in extension_list:
-        if not ext in allowed_extension_list:
-          allowed_extension_list.append(ext)
-    return tuple(allowed_extension_list)
+      return self._allowed_extension_list_by_service.get(
+        self._typeToDocumentService(document_type), ())
+    return ()
 
 mimemapper = MimeMapper()
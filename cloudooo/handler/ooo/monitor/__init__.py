@@ -1,49 +1,68 @@
 from .request import MonitorRequest
 from .memory import MonitorMemory
 from .sleeping_time import MonitorSpleepingTime
-from cloudooo.handler.ooo.application.openoffice import openoffice
+from cloudooo.handler.ooo.application.openoffice import openoffice_pool
 from cloudooo.util import convertStringToBool
 
+# Monitors of the first instance of the pool (BBB)
 monitor_request = None
 monitor_memory = None
 monitor_sleeping_time = None
 
+# Monitors of every instance of the pool
+monitor_list = []
+monitor_sleeping_time_dict = {}
+
 
 def load(local_config):
-  """Start the monitors"""
+  """Start the monitors of each instance of the pool"""
+  global monitor_request, monitor_memory, monitor_sleeping_time
   monitor_interval = int(local_config.get('monitor_interval'))
-  global monitor_request
-  monitor_request = MonitorRequest(openoffice,
-                              monitor_interval,
-                              int(local_config.get('limit_number_request')))
-  monitor_request.start()
-
   # .lower() is for backward compatibility
-  if convertStringToBool(local_config.get(
-      'enable_memory_monitor', 'false').lower()):
-    global monitor_memory
-    monitor_memory = MonitorMemory(openoffice,
-                                  monitor_interval,
-                                  int(local_config.get('limit_memory_used')))
-    monitor_memory.start()
+  enable_memory_monitor = convertStringToBool(local_config.get(
+      'enable_memory_monitor', 'false').lower())
   time_before_sleep = int(local_config.get('max_sleeping_duration', 0))
-  if time_before_sleep:
-    global monitor_sleeping_time
-    monitor_sleeping_time = MonitorSpleepingTime(openoffice,
-                                                 monitor_interval,
-                                                 time_before_sleep)
-    monitor_sleeping_time.start()
+  for openoffice in openoffice_pool.getInstanceList():
+    request = MonitorRequest(openoffice,
+                             monitor_interval,
+                             int(local_config.get('limit_number_request')))
+    request.start()
+    monitor_list.append(request)
+    if monitor_request is None:
+      monitor_request = request
+
+    if enable_memory_monitor:
+      memory = MonitorMemory(openoffice,
+                             monitor_interval,
+                             int(local_config.get('limit_memory_used')))
+      memory.start()
+      monitor_list.append(memory)
+      if monitor_memory is None:
+        monitor_memory = memory
+
+    if time_before_sleep:
+      sleeping_time = MonitorSpleepingTime(openoffice,
+                                           monitor_interval,
+                                           time_before_sleep)
+      sleeping_time.start()
+      monitor_list.append(sleeping_time)
+      monitor_sleeping_time_dict[openoffice] = sleeping_time
+      if monitor_sleeping_time is None:
+        monitor_sleeping_time = sleeping_time
   return
 
 
+def touch(openoffice):
+  """Restart the sleeping countdown of the instance"""
+  sleeping_time = monitor_sleeping_time_dict.get(openoffice)
+  if sleeping_time is not None:
+    sleeping_time.touch()
+
+
 def stop():
   """Stop all monitors"""
-  if monitor_request:
-    monitor_request.terminate()
-  if monitor_memory:
-    monitor_memory.terminate()
-  if monitor_sleeping_time is not None:
-    monitor_sleeping_time.terminate()
+  for monitor in monitor_list:
+    monitor.terminate()
   clear()
 
 
@@ -52,3 +71,5 @@ def clear():
   monitor_request = None
   monitor_memory = None
   monitor_sleeping_time = None
+  del monitor_list[:]
+  monitor_sleeping_time_dict.clear()
@@ -44,6 +44,8 @@ class MonitorRequest(Monitor, Thread):
     Monitor.__init__(self, openoffice, interval)
     Thread.__init__(self)
     self.request_limit = request_limit
+    # the standby instance is started when this number of requests is reached
+    self.standby_request_limit = request_limit * 4 // 5
 
   def start(self):
     self.status_flag = True
@@ -57,7 +59,9 @@ class MonitorRequest(Monitor, Thread):
         self.openoffice.acquire()
         logger.debug("Openoffice: %s, %s will be restarted",
           *self.openoffice.getAddress())
-        self.openoffice.restart()
+        self.openoffice.recycle()
         self.openoffice.release()
+      elif self.openoffice.request > self.standby_request_limit:
+        self.openoffice.startStandby()
       sleep(self.interval)
     logger.debug("Stop MonitorRequest ")
@@ -29,32 +29,120 @@
 ##############################################################################
 
 from .monitor import Monitor
-from multiprocessing import Process
-from time import sleep
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Thread
+from time import time
 from cloudooo.util import logger
 
 
-class MonitorTimeout(Monitor, Process):
+class TimeoutWatchdog(Thread):
+  """Single thread expiring the MonitorTimeout instances whose deadline is
+  reached, instead of one process by monitor.
+
+  The deadlines are kept in a heap. A cancelled entry is only marked and
+  removed when it reaches the top, or when the cancelled entries are the
+  majority of the heap.
+  """
+
+  def __init__(self):
+    Thread.__init__(self, daemon=True)
+    self._condition = Condition()
+    # entries are [deadline, sequence, monitor]
+    self._entry_list = []
+    self._sequence = count()
+    self._cancelled_count = 0
+
+  def add(self, monitor, deadline):
+    """Expire the monitor at deadline. Returns the entry to cancel"""
+    entry = [deadline, next(self._sequence), monitor]
+    with self._condition:
+      if not self.is_alive():
+        self.start()
+      heappush(self._entry_list, entry)
+      if self._entry_list[0] is entry:
+        self._condition.notify()
+    return entry
+
+  def cancel(self, entry):
+    """Cancel an entry which is not expired"""
+    with self._condition:
+      if entry[-1] is None:
+        return
+      entry[-1] = None
+      self._cancelled_count += 1
+      if self._cancelled_count * 2 > len(self._entry_list):
+        self._entry_list[:] = [x for x in self._entry_list if x[-1] is not None]
+        heapify(self._entry_list)
+        self._cancelled_count = 0
+
+  def getPendingCount(self):
+    """Returns the number of deadlines not expired nor cancelled"""
+    with self._condition:
+      return len(self._entry_list) - self._cancelled_count
+
+  def run(self):
+    entry_list = self._entry_list
+    while True:
+      with self._condition:
+        if not entry_list:
+          self._condition.wait()
+          continue
+        entry = entry_list[0]
+        monitor = entry[-1]
+        if monitor is None:
+          heappop(entry_list)
+          self._cancelled_count -= 1
+          continue
+        delay = entry[0] - time()
+        if delay > 0:
+          self._condition.wait(delay)
+          continue
+        heappop(entry_list)
+        entry[-1] = None
+      # do not delay the next deadlines while the office is stopped
+      Thread(target=monitor.expire, daemon=True).start()
+
+
+watchdog = TimeoutWatchdog()
+
+
+class MonitorTimeout(Monitor):
   """Monitors and controls the time of use of an object"""
 
   def __init__(self, openoffice, interval):
     """Expects to receive an object that implements the interfaces IApplication
     and ILockable. And the interval to check the object."""
     Monitor.__init__(self, openoffice, interval)
-    Process.__init__(self)
+    self._entry = None
 
-  def run(self):
-    """Start the process"""
-    port = self.openoffice.getAddress()[-1]
-    pid = self.openoffice.pid()
-    logger.debug("Monitoring OpenOffice: port %s pid %s timeout: %s", port, pid, self.interval)
+  def start(self):
+    """Register the deadline in the watchdog"""
+    logger.debug("Monitoring OpenOffice: port %s timeout: %s",
+                 self.openoffice.getAddress()[-1], self.interval)
     self.status_flag = True
-    sleep(self.interval)
+    self._entry = watchdog.add(self, time() + self.interval)
+
+  def is_alive(self):
+    """Returns True until the deadline is reached or the monitor terminated"""
+    return self.status_flag
+
+  def run(self):
+    """Start monitoring"""
+    self.start()
+
+  def expire(self):
+    """Called by the watchdog when the deadline is reached"""
+    if not self.status_flag:
+      return
+    self.status_flag = False
     if self.openoffice.isLocked():
-      logger.debug("Stoping OpenOffice: port %s pid %s", port, pid)
+      logger.debug("Stoping OpenOffice: port %s pid %s",
+                   self.openoffice.getAddress()[-1], self.openoffice.pid())
       self.openoffice.stop()
 
   def terminate(self):
-    """Stop the process"""
+    """Cancel the deadline"""
     Monitor.terminate(self)
-    Process.terminate(self)
\ No newline at end of file
+    if self._entry is not None:
+      watchdog.cancel(self._entry)
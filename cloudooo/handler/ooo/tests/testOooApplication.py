@@ -29,6 +29,8 @@
 ##############################################################################
 
 import unittest
+from socket import socket
+from subprocess import Popen
 from cloudooo.handler.ooo.application.application import Application
 
 
@@ -60,4 +62,21 @@ class TestApplication(unittest.TestCase):
     """As the application do not have the pid() should return None"""
     self.assertEqual(self.application.pid(), None)
 
-
+  def testStatus(self):
+    """Test status checks the process and caches the socket probe"""
+    self.assertEqual(self.application.status(), False)
+    listening_socket = socket()
+    listening_socket.bind(('localhost', 0))
+    listening_socket.listen(1)
+    application = Application()
+    application.loadSettings('localhost', listening_socket.getsockname()[1],
+                             '/tmp/', status_ttl=60)
+    application.process = Popen(['sleep', '60'])
+    try:
+      self.assertTrue(application.status())
+      listening_socket.close()
+      # the result is kept during status_ttl while the process is running
+      self.assertTrue(application.status())
+    finally:
+      application.stop()
+    self.assertEqual(application.status(), False)
@@ -88,6 +88,17 @@ class TestHandler(HandlerTestCase):
     self._assert_document_output(doc_exported,
                           "application/vnd.oasis.opendocument.text")
 
+  def testConvertToFile(self):
+    """Test convert ODT to DOC in a file"""
+    with open("data/test.odt", "rb") as f:
+      data = f.read()
+    handler = Handler(self.tmp_url,
+                        data,
+                        'odt')
+    output = handler.convertToFile("doc")
+    self._file_path_list.append(output.path)
+    self._assert_document_output(output.read(), "application/msword")
+
   def testGetMetadata(self):
     """Test getMetadata"""
     with open("data/test.odt", "rb") as f:
@@ -28,6 +28,9 @@
 #
 ##############################################################################
 
+import json
+from os import remove
+from os.path import join
 from cloudooo.tests.handlerTestCase import HandlerTestCase
 from cloudooo.handler.ooo.application.openoffice import openoffice
 from cloudooo.handler.ooo.mimemapper import MimeMapper
@@ -279,4 +282,31 @@ class TestMimeMapper(HandlerTestCase):
                              'com.sun.star.presentation.PresentationDocument')
     self.assertEqual(filtername, "impress_html_Export")
 
+  def testFilterCache(self):
+    """Test if the catalog loaded from the cache file is the same"""
+    cache_path = join(self.working_path, 'cloudooo_filter_test.json')
+    self.mimemapper.saveFilterCache(cache_path)
+    try:
+      mimemapper = MimeMapper()
+      self.assertTrue(mimemapper.loadFilterCache(cache_path))
+    finally:
+      remove(cache_path)
+    self.assertTrue(mimemapper.isLoaded())
+    self.assertEqual(mimemapper.getAllowedExtensionList("doc"),
+                     self.mimemapper.getAllowedExtensionList("doc"))
+    self.assertEqual(mimemapper.getFilterName("pdf",
+                                              'com.sun.star.text.TextDocument'),
+                     "writer_pdf_Export")
+    self.assertFalse(MimeMapper().loadFilterCache(cache_path))
 
+  def testGetStaticCatalogPath(self):
+    """Test if the file used by unoconverter is written once"""
+    static_catalog_path = self.mimemapper.getStaticCatalogPath(self.tmp_url)
+    try:
+      self.assertEqual(self.mimemapper.getStaticCatalogPath(self.tmp_url),
+                       static_catalog_path)
+      with open(static_catalog_path) as f:
+        self.assertEqual(json.load(f)['mimetype_by_filter_type'],
+                         self.mimemapper._mimetype_by_filter_type)
+    finally:
+      remove(static_catalog_path)
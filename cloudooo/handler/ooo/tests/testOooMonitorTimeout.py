@@ -31,7 +31,7 @@
 import unittest
 from time import sleep
 from cloudooo.handler.ooo.application.openoffice import openoffice
-from cloudooo.handler.ooo.monitor.timeout import MonitorTimeout
+from cloudooo.handler.ooo.monitor.timeout import MonitorTimeout, watchdog
 
 OPENOFFICE = True
 
@@ -55,6 +55,18 @@ class TestMonitorTimeout(unittest.TestCase):
     self.assertEqual(monitor_timeout.is_alive(), False)
     monitor_timeout.terminate()
 
+  def testMonitorTimeoutCancel(self):
+    """Test the deadline is removed from the watchdog when terminated"""
+    pending_count = watchdog.getPendingCount()
+    monitor_timeout_list = [self._createMonitor(10) for _ in range(10)]
+    for monitor_timeout in monitor_timeout_list:
+      monitor_timeout.start()
+    self.assertEqual(watchdog.getPendingCount(), pending_count + 10)
+    for monitor_timeout in monitor_timeout_list:
+      monitor_timeout.terminate()
+      self.assertEqual(monitor_timeout.is_alive(), False)
+    self.assertEqual(watchdog.getPendingCount(), pending_count)
+
   def testStopOpenOffice(self):
     """Test if the openoffice stop by the monitor"""
     openoffice.acquire()
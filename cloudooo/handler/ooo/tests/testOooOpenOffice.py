@@ -28,6 +28,7 @@
 #
 ##############################################################################
 
+from os.path import exists, join
 from cloudooo.tests.handlerTestCase import HandlerTestCase
 from cloudooo.handler.ooo.application.openoffice import OpenOffice
 from cloudooo.handler.ooo.util import waitStopDaemon
@@ -89,6 +90,27 @@ class TestOpenOffice(HandlerTestCase):
     self.openoffice.release()
     self.assertEqual(self.openoffice.isLocked(), False)
 
+  def testGoldenProfile(self):
+    """Test if the instance starts from a copy of the golden profile"""
+    openoffice = OpenOffice()
+    openoffice.loadSettings("localhost", 4091,
+                            self.working_path,
+                            self.office_binary_path,
+                            self.uno_path,
+                            'en',
+                            self.environment_dict,
+                            golden_profile=True)
+    openoffice.start()
+    try:
+      self.assertTrue(openoffice.status())
+      golden_path = openoffice._getGoldenProfile()
+      self.assertTrue(exists(join(golden_path, 'user',
+                                  'registrymodifications.xcu')))
+      self.assertTrue(exists(join(openoffice.path_user_installation, 'user',
+                                  'registrymodifications.xcu')))
+    finally:
+      openoffice.stop()
+
   def testStartTwoOpenOfficeWithTheSameAddress(self):
     """Check if starting two openoffice using the same address, the second
     openoffice will terminate the first"""
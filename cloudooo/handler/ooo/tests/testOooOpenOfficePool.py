@@ -0,0 +1,80 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#                    Gabriel M. Monnerat <gabriel@tiolive.com>
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+import unittest
+from cloudooo.handler.ooo.application.openoffice import OpenOffice, \
+                                                       OpenOfficePool
+
+
+class TestOpenOfficePool(unittest.TestCase):
+  """Test the lease of the instances of an OpenOfficePool"""
+
+  def setUp(self):
+    """Instantiate one pool of three instances without starting them"""
+    self.first_openoffice = OpenOffice()
+    self.pool = OpenOfficePool(self.first_openoffice)
+    self.pool.loadSettings('localhost', 4090, 3, '/tmp/',
+                           '/opt/libreoffice/program',
+                           '/opt/libreoffice/program', 'en')
+
+  def testLoadSettings(self):
+    """Test if each instance uses its own port"""
+    instance_list = self.pool.getInstanceList()
+    self.assertEqual(len(instance_list), 3)
+    self.assertIs(instance_list[0], self.first_openoffice)
+    self.assertEqual([instance.getAddress()[-1] for instance in instance_list],
+                     [4090, 4091, 4092])
+
+  def testAcquireLeastLoaded(self):
+    """Test if requests are dispatched to the least loaded instance"""
+    leased_list = [self.pool.acquire() for _ in range(3)]
+    try:
+      self.assertEqual(set(leased_list), set(self.pool.getInstanceList()))
+      for instance in leased_list:
+        self.assertTrue(instance.isLocked())
+        self.assertEqual(self.pool.getLeaseCount(instance), 1)
+    finally:
+      for instance in leased_list:
+        self.pool.release(instance)
+    for instance in leased_list:
+      self.assertFalse(instance.isLocked())
+      self.assertEqual(self.pool.getLeaseCount(instance), 0)
+
+  def testStandbyPort(self):
+    """Test if each standby instance uses a port after the ones of the pool"""
+    self.pool.loadSettings('localhost', 4090, 3, '/tmp/',
+                           '/opt/libreoffice/program',
+                           '/opt/libreoffice/program', 'en',
+                           enable_standby=True)
+    self.assertEqual([instance._standby.getAddress()[-1]
+                      for instance in self.pool.getInstanceList()],
+                     [4093, 4094, 4095])
+    for instance in self.pool.getInstanceList():
+      self.assertFalse(instance.isStandbyReady())
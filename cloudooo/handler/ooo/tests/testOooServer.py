@@ -30,6 +30,8 @@
 
 from os.path import join, exists
 from os import remove
+from time import sleep
+from urllib.request import Request, urlopen
 from base64 import encodebytes, decodebytes
 from io import BytesIO
 from lxml import etree
@@ -156,6 +158,65 @@ class TestConversion(TestCase):
     """Test run_convert method"""
     self.runConvertScenarioList(self.ConvertScenarioList())
 
+  def testConvertFileMulti(self):
+    """Test conversion of one document to several formats at once"""
+    with open(join('data', 'test.odt'), 'rb') as f:
+      data = encodebytes(f.read()).decode()
+    output_dict = self.proxy.convertFileMulti(data, 'odt',
+                                              ['pdf', 'txt', 'doc'])
+    self.assertEqual(sorted(output_dict), ['doc', 'pdf', 'txt'])
+    self.assertEqual(self._getFileType(output_dict['pdf']), 'application/pdf')
+    self.assertEqual(self._getFileType(output_dict['txt']), 'text/plain')
+    self.assertEqual(self._getFileType(output_dict['doc']),
+                     'application/msword')
+
+  def testConvertFileList(self):
+    """Test conversion of several files in one request"""
+    with open(join('data', 'test.odt'), 'rb') as f:
+      odt_data = encodebytes(f.read()).decode()
+    with open(join('data', 'test.doc'), 'rb') as f:
+      doc_data = encodebytes(f.read()).decode()
+    result_list = self.proxy.convertFileList([
+      (odt_data, 'odt', 'pdf'),
+      (doc_data, 'doc', 'odt', {'zip': False}),
+      ('', 'odt', 'pdf'),
+    ])
+    self.assertEqual(len(result_list), 3)
+    self.assertEqual(self._getFileType(result_list[0]['data']),
+                     'application/pdf')
+    self.assertEqual(self._getFileType(result_list[1]['data']),
+                     'application/vnd.oasis.opendocument.text')
+    self.assertEqual(list(result_list[2]), ['error'])
+
+  def testConvertBinary(self):
+    """Test conversion with the raw document as body of the request"""
+    with open(join('data', 'test.odt'), 'rb') as f:
+      data = f.read()
+    request = Request("http://%s:%s/convert?from=odt&to=pdf" % (self.hostname,
+                                                                self.port),
+                      data=data)
+    with urlopen(request) as response:
+      self.assertEqual(response.headers['Content-Type'], 'application/pdf')
+      output_data = response.read()
+    self.assertEqual(magic.Magic(mime=True).from_buffer(output_data),
+                     'application/pdf')
+
+  def testSubmitConversion(self):
+    """Test asynchronous conversion"""
+    with open(join('data', 'test.odt'), 'rb') as f:
+      data = encodebytes(f.read()).decode()
+    job_id = self.proxy.submitConversion(data, 'odt', 'pdf')
+    for _ in range(60):
+      status_dict = self.proxy.getJobStatus(job_id)
+      if status_dict['status'] not in ('queued', 'running'):
+        break
+      sleep(1)
+    self.assertEqual(status_dict, {'status': 'done'})
+    output_data = self.proxy.fetchJobResult(job_id)
+    self.assertEqual(self._getFileType(output_data), 'application/pdf')
+    self.assertEqual(self.proxy.getJobStatus(job_id), {'status': 'unknown'})
+
+
 
 class TestGetMetadata(TestCase):
   def GetMetadataScenarioList(self):
@@ -183,6 +244,19 @@ class TestGetMetadata(TestCase):
             ('', ''),
             ]
 
+  def testConvertFileAndGetMetadataItemList(self):
+    """Test conversion returning the metadata of the original document"""
+    with open(join('data', 'testMetadata.odt'), 'rb') as f:
+      data = encodebytes(f.read()).decode()
+    response_dict = self.proxy.convertFileAndGetMetadataItemList(data, 'odt',
+                                                                 'pdf')
+    self.assertEqual(self._getFileType(response_dict['conversion']),
+                     'application/pdf')
+    metadata_dict = response_dict['metadata']
+    self.assertEqual(metadata_dict['Title'], 'cloudooo Test')
+    self.assertEqual(metadata_dict['MIMEType'],
+                     'application/vnd.oasis.opendocument.text')
+
   def testFaultGetMetadata(self):
     """Test getMetadata from invalid OOofiles"""
     self.runFaultGetMetadataList(self.FaultGetMetadataScenarioList())
@@ -420,6 +494,18 @@ class TestGetAllowedTargetItemList(TestCase):
                 if extension not in ('docy',)]),
         sorted(text_expected_tuple))
 
+  def testGetConversionMatrix(self):
+    """Test the matrix gives the same conversions as
+    getAllowedConversionFormatList, and only its version when unchanged"""
+    mimetype = 'application/vnd.oasis.opendocument.text'
+    conversion_matrix = self.proxy.getConversionMatrix()
+    self.assertEqual(
+      conversion_matrix['conversion_dict'][mimetype],
+      sorted(map(list, self.proxy.getAllowedConversionFormatList(mimetype))))
+    version = conversion_matrix['version']
+    self.assertEqual(self.proxy.getConversionMatrix(version),
+                     {'version': version})
+
 
 class TestGetTableItemList(TestCase):
   def testGetTableItemListFromOdt(self):
@@ -32,6 +32,7 @@ import json
 import magic
 import pkg_resources
 from subprocess import Popen, PIPE
+from threading import Thread
 from os.path import exists, join
 from cloudooo.tests.handlerTestCase import HandlerTestCase
 from cloudooo.handler.ooo.application.openoffice import openoffice
@@ -91,3 +92,54 @@ class TestUnoConverter(HandlerTestCase):
     self.assertEqual(exists(output_url), False)
 
 
+
+  def testUnoWorkerOdtToDoc(self):
+    """Test the resident worker running the unoconverter jobs"""
+    mimemapper = dict(filter_list=[('doc',
+                                    'com.sun.star.text.TextDocument',
+                                    'MS Word 97')],
+                     doc_type_list_by_extension=dict(doc=['com.sun.star.text.TextDocument']))
+    argument_list = ["--convert",
+                     "--document_url=%s" % self.document.getUrl(),
+                     "--destination_format=%s" % "doc",
+                     "--source_format=%s" % "odt",
+                     "--mimemapper=%s" % json.dumps(mimemapper)]
+    try:
+      stdout, stderr = openoffice.uno_worker.call(argument_list)
+      self.assertEqual(stderr, b'')
+      worker_pid = openoffice.uno_worker.process.pid
+      output_url = stdout.decode()
+      self.assertTrue(exists(output_url), stdout)
+      mime = magic.Magic(mime=True)
+      self.assertEqual(mime.from_file(output_url), 'application/msword')
+      # the same worker runs the next job
+      stdout, stderr = openoffice.uno_worker.call(argument_list)
+      self.assertEqual(stderr, b'')
+      self.assertEqual(openoffice.uno_worker.process.pid, worker_pid)
+    finally:
+      openoffice.uno_worker.stop()
+    self.document.trash()
+    self.assertEqual(exists(output_url), False)
+
+  def testUnoWorkerConcurrentStop(self):
+    """Test the worker can be stopped by several threads at the same time"""
+    worker = openoffice.uno_worker
+    argument_list = ["--getmetadata",
+                     "--document_url=%s" % self.document.getUrl(),
+                     "--source_format=%s" % "odt"]
+    stdout, stderr = worker.call(argument_list)
+    self.assertTrue(worker.status())
+    error_list = []
+    def stop():
+      try:
+        worker.stop()
+      except Exception as e:
+        error_list.append(e)
+    thread_list = [Thread(target=stop) for _ in range(2)]
+    for thread in thread_list:
+      thread.start()
+    worker.kill()
+    for thread in thread_list:
+      thread.join()
+    self.assertEqual(error_list, [])
+    self.assertFalse(worker.status())
@@ -30,7 +30,9 @@
 
 import unittest
 import logging
+from os import path
 from cloudooo import util
+from cloudooo.handler.ooo.util import scanUnsafeLink
 import mimetypes
 
 
@@ -54,4 +56,36 @@ class TestUtil(unittest.TestCase):
     self.assertEqual(mimetypes.types_map.get(".ogv"), "video/ogg")
     self.assertEqual(mimetypes.types_map.get(".3gp"), "video/3gpp")
 
+  def testReloadMimetypeList(self):
+    """Test the mimetypes are loaded once, and again only when reloaded"""
+    util.loadMimetypeList()
+    version = util.getMimetypeListVersion()
+    util.loadMimetypeList()
+    self.assertEqual(util.getMimetypeListVersion(), version)
+    util.reloadMimetypeList()
+    self.assertNotEqual(util.getMimetypeListVersion(), version)
+    self.assertEqual(mimetypes.types_map.get(".ogv"), "video/ogg")
 
+  def testScanUnsafeLink(self):
+    """Test if documents with unsafe links are rejected before the
+    conversion"""
+    for ext in ('odt', 'ods', 'odp', 'odg', 'html'):
+      self.assertRaisesRegex(RuntimeError,
+                             'This document contains unsafe links .*',
+                             scanUnsafeLink,
+                             path.abspath('data/with_link.%s' % ext))
+    # links loaded without xlink:actuate
+    self.assertRaisesRegex(RuntimeError,
+                           'This document contains unsafe links .*',
+                           scanUnsafeLink,
+                           path.abspath('data/with_image_link.odt'))
+    # fields of Office Open XML documents
+    self.assertRaisesRegex(RuntimeError,
+                           'This document contains unsafe links .*',
+                           scanUnsafeLink,
+                           path.abspath('data/with_link.docx'))
+    for ext in ('odt', 'html'):
+      self.assertTrue(scanUnsafeLink(path.abspath('data/test.%s' % ext)))
+    # the office has to check the formats which can not be fully scanned
+    for ext in ('doc', 'docx', 'pptx'):
+      self.assertFalse(scanUnsafeLink(path.abspath('data/test.%s' % ext)))
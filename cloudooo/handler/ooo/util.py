@@ -29,13 +29,42 @@
 ##############################################################################
 
 import contextlib
-from socket import socket, error
+import os.path
+import re
+from hashlib import md5
+from socket import socket, error, create_connection
 from errno import EADDRINUSE
 from time import sleep
 from os import remove
 from shutil import rmtree
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from xml.etree.ElementTree import iterparse, ParseError
+from zipfile import ZipFile, BadZipFile, is_zipfile
 from cloudooo.util import logger
 
+XLINK_NAMESPACE = '{http://www.w3.org/1999/xlink}'
+OFFICE_DOCUMENT_TAG = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}document'
+# elements whose xlink:href is only followed on request, every other link
+# (images, objects, plugins, section sources...) may be loaded by the office
+HYPERLINK_TAG_LIST = tuple(
+  '{urn:oasis:names:tc:opendocument:xmlns:%s}%s' % name for name in (
+    ('text:1.0', 'a'),
+    ('drawing:1.0', 'a'),
+    ('drawing:1.0', 'area-rectangle'),
+    ('drawing:1.0', 'area-circle'),
+    ('drawing:1.0', 'area-polygon'),
+    ('script:1.0', 'event-listener'),
+    ('presentation:1.0', 'event-listener'),
+  ))
+HTML_EXTENSION_LIST = ('.html', '.htm', '.xhtml')
+WORDPROCESSINGML_NAMESPACE = \
+  '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+# fields loading a file, e.g. INCLUDEPICTURE "http://example.com/a.png" \d
+INCLUDE_FIELD_MATCH = re.compile(
+  r'\s*(?:INCLUDEPICTURE|INCLUDETEXT)\s+(?:\\\S+\s+)*(?:"([^"]*)"|(\S+))',
+  re.IGNORECASE).match
+
 
 def removeDirectory(path):
   """Remove directory"""
@@ -58,6 +87,28 @@ def socketStatus(hostname, port):
       return True
 
 
+def getOfficeVersion(office_binary_path):
+  """Returns a key identifying the version of the office, from its version
+  file, or from the binary if there is none."""
+  for filename in ('versionrc', 'version.ini'):
+    version_path = os.path.join(office_binary_path, filename)
+    if os.path.exists(version_path):
+      with open(version_path, 'rb') as f:
+        return md5(f.read()).hexdigest()
+  binary_stat = os.stat(os.path.join(office_binary_path, 'soffice.bin'))
+  return md5(b'%d-%d' % (binary_stat.st_size,
+                         binary_stat.st_mtime_ns)).hexdigest()
+
+
+def probeSocket(hostname, port, timeout=1):
+  """Verify if a process accepts connections on the address."""
+  try:
+    with contextlib.closing(create_connection((hostname, port), timeout)):
+      return True
+  except error:
+    return False
+
+
 def waitStartDaemon(daemon, attempts):
   """Wait a certain time to start the daemon."""
   for num in range(attempts):
@@ -83,3 +134,121 @@ def remove_file(filepath):
     remove(filepath)
   except OSError as msg:
     print(msg.strerror)
+
+
+def isSafeUrl(url, document_url):
+  """Check if the url, linked from the document, can be loaded by the office.
+  Only data urls and relative paths inside the folder of the document are
+  safe."""
+  parsed_url = urlparse(url)
+  if parsed_url.scheme == 'data':
+    return True
+  elif parsed_url.scheme == '':
+    norm_path = os.path.normpath(parsed_url.path)
+    if norm_path[0] not in ('/', '.') or \
+        os.path.dirname(norm_path) == os.path.dirname(document_url):
+      return True
+  return False
+
+
+def _checkUrl(url, document_url):
+  if url and not isSafeUrl(url, document_url):
+    raise RuntimeError('This document contains unsafe links %s' % url)
+
+
+def _scanXml(xml_file, document_url):
+  """Check the links loaded with the document, the file is read by chunks.
+  xlink:actuate is not trusted, the office loads some links without it."""
+  for _, element in iterparse(xml_file):
+    if element.tag not in HYPERLINK_TAG_LIST:
+      _checkUrl(element.get(XLINK_NAMESPACE + 'href'), document_url)
+    element.clear()
+
+
+def _scanFieldInstruction(xml_file, document_url):
+  """Check the files included by the fields of a WordprocessingML part"""
+  for _, element in iterparse(xml_file):
+    if element.tag == WORDPROCESSINGML_NAMESPACE + 'instrText':
+      instruction = element.text
+    else:
+      instruction = element.get(WORDPROCESSINGML_NAMESPACE + 'instr')
+    if instruction:
+      match = INCLUDE_FIELD_MATCH(instruction)
+      if match:
+        _checkUrl(match.group(1) or match.group(2), document_url)
+    element.clear()
+
+
+class _LinkHTMLParser(HTMLParser):
+
+  def __init__(self, document_url):
+    HTMLParser.__init__(self)
+    self.document_url = document_url
+
+  def handle_starttag(self, tag, attrs):
+    for name, value in attrs:
+      if name == 'src':
+        _checkUrl(value, self.document_url)
+
+
+def scanUnsafeLink(document_url):
+  """Raises RuntimeError if the document contains links to external
+  resources loaded with the document, so that unsafe documents are rejected
+  before being loaded in an office instance.
+  Returns False if the document can not be fully scanned here, so that the
+  office checks it.
+  """
+  try:
+    return _scanUnsafeLink(document_url)
+  except (BadZipFile, ParseError):
+    # let the office decide if the document is broken
+    return False
+
+
+def _scanUnsafeLink(document_url, chunk_size=64 * 1024):
+  if is_zipfile(document_url):
+    with ZipFile(document_url) as zip_file:
+      name_list = zip_file.namelist()
+      if 'content.xml' in name_list:
+        # ODF package
+        for name in ('content.xml', 'styles.xml'):
+          if name in name_list:
+            with zip_file.open(name) as xml_file:
+              _scanXml(xml_file, document_url)
+        return True
+      elif '[Content_Types].xml' in name_list:
+        # Office Open XML package, external resources are relationships, or
+        # fields like INCLUDEPICTURE, which may also be split in several
+        # runs, so the office still has to check the loaded document
+        for name in name_list:
+          if name.endswith('.rels'):
+            with zip_file.open(name) as xml_file:
+              for _, element in iterparse(xml_file):
+                if element.get('TargetMode') == 'External' and \
+                    not element.get('Type', '').endswith('/hyperlink'):
+                  _checkUrl(element.get('Target'), document_url)
+                element.clear()
+          elif name.startswith('word/') and name.endswith('.xml'):
+            with zip_file.open(name) as xml_file:
+              _scanFieldInstruction(xml_file, document_url)
+        return False
+      return False
+  if os.path.splitext(document_url)[1].lower() in HTML_EXTENSION_LIST:
+    parser = _LinkHTMLParser(document_url)
+    with open(document_url, 'rb') as html_file:
+      for chunk in iter(lambda: html_file.read(chunk_size), b''):
+        # tags and attributes are ascii, whatever the encoding is
+        parser.feed(chunk.decode('latin-1'))
+    parser.close()
+    return True
+  # flat ODF documents
+  with open(document_url, 'rb') as xml_file:
+    try:
+      _, root = next(iterparse(xml_file, events=('start',)))
+    except (ParseError, StopIteration):
+      return False
+    if root.tag != OFFICE_DOCUMENT_TAG:
+      return False
+    xml_file.seek(0)
+    _scanXml(xml_file, document_url)
+  return True
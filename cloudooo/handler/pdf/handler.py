@@ -33,6 +33,7 @@ from zope.interface import implementer
 from cloudooo.interfaces.handler import IHandler
 from cloudooo.file import File
 from cloudooo.util import logger, parseContentType
+from cloudooo.admission import getConcurrencyLimit, setConcurrencyLimit
 from subprocess import Popen, PIPE
 from tempfile import mktemp
 
@@ -58,11 +59,12 @@ class Handler:
     output_url = mktemp(suffix=".%s" % destination_format,
                         dir=self.document.directory_name)
     command = ["pdftotext", self.document.getUrl(), output_url]
-    stdout, stderr = Popen(command,
-                           stdout=PIPE,
-                           stderr=PIPE,
-                           close_fds=True,
-                           env=self.environment).communicate()
+    with getConcurrencyLimit('pdf'):
+      stdout, stderr = Popen(command,
+                             stdout=PIPE,
+                             stderr=PIPE,
+                             close_fds=True,
+                             env=self.environment).communicate()
     self.document.reload(output_url)
     try:
       return self.document.getContent()
@@ -75,12 +77,13 @@ class Handler:
     """
     # TODO: use pyPdf and not use lower()
     command = ["pdfinfo", self.document.getUrl()]
-    stdout, stderr = Popen(command,
-                           stdout=PIPE,
-                           stderr=PIPE,
-                           close_fds=True,
-                           text=True,
-                           env=self.environment).communicate()
+    with getConcurrencyLimit('pdf'):
+      stdout, stderr = Popen(command,
+                             stdout=PIPE,
+                             stderr=PIPE,
+                             close_fds=True,
+                             text=True,
+                             env=self.environment).communicate()
     info_list = [_f for _f in stdout.split("\n") if _f]
     metadata = {}
     for info in iter(info_list):
@@ -118,6 +121,11 @@ class Handler:
     output_pdf.write(output_stream)
     return output_stream.getvalue()
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return getConcurrencyLimit('pdf').capacity
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype):
     """Returns a list content_type and their titles which are supported
@@ -131,3 +139,8 @@ class Handler:
     if source_mimetype in ("application/pdf", "pdf"):
       return [("text/plain", "Plain Text")]
     return []
+
+
+def bootstrapHandler(configuration_dict):
+  setConcurrencyLimit('pdf',
+                      int(configuration_dict.get('pdf_max_concurrency', 0)))
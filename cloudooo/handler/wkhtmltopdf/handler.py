@@ -31,6 +31,7 @@ from zope.interface import implementer
 from cloudooo.interfaces.handler import IHandler
 from cloudooo.file import File
 from cloudooo.util import logger, parseContentType
+from cloudooo.admission import getConcurrencyLimit, setConcurrencyLimit
 from subprocess import Popen, PIPE
 from tempfile import mktemp, mkdtemp
 from os.path import basename
@@ -73,14 +74,15 @@ class Handler:
       output_path,
       conversion_kw=kw,
     )
-    stdout, stderr = Popen(
-      command,
-      stdout=PIPE,
-      stderr=PIPE,
-      close_fds=True,
-      env=self.environment,
-      cwd=self.file.directory_name,
-    ).communicate()
+    with getConcurrencyLimit('wkhtmltopdf'):
+      stdout, stderr = Popen(
+        command,
+        stdout=PIPE,
+        stderr=PIPE,
+        close_fds=True,
+        env=self.environment,
+        cwd=self.file.directory_name,
+      ).communicate()
     self.file.reload(output_path)
     try:
       return self.file.getContent()
@@ -100,6 +102,11 @@ class Handler:
     """
     raise NotImplementedError
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return getConcurrencyLimit('wkhtmltopdf').capacity
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype):
     """Returns a list content_type and their titles which are supported
@@ -462,3 +469,8 @@ class Handler:
     command += args[-1:]  # output_path
 
     return command
+
+
+def bootstrapHandler(configuration_dict):
+  setConcurrencyLimit('wkhtmltopdf',
+                      int(configuration_dict.get('wkhtmltopdf_max_concurrency', 0)))
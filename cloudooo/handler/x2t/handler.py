@@ -31,13 +31,13 @@ from xml.etree import ElementTree
 from subprocess import Popen, PIPE
 import os
 import json
-import io
 from mimetypes import guess_type
 
 from zope.interface import implementer
 
 from cloudooo.interfaces.handler import IHandler
-from cloudooo.file import File
+from cloudooo.file import File, FileData
+from cloudooo.admission import getConcurrencyLimit, setConcurrencyLimit
 from cloudooo.util import logger, unzip, parseContentType, loadMimetypeList
 from cloudooo.handler.ooo.handler import Handler as OOoHandler
 
@@ -198,7 +198,7 @@ class Handler:
     output_data = None
 
     if source_format in yformat_tuple:
-      if self._data.startswith(b"PK\x03\x04"):
+      if self._isZip():
         os.mkdir(input_dir)
         unzip(self.file.getUrl(), input_dir)
         input_file_name = os.path.join(input_dir, "body.txt")
@@ -231,14 +231,15 @@ class Handler:
                                           default_namespace=None, method="xml")
 
     # run convertion binary
-    p = Popen(
-      ["x2t", config_file.name],
-      stdout=PIPE,
-      stderr=PIPE,
-      close_fds=True,
-      env=self.environment,
-    )
-    stdout, stderr = p.communicate()
+    with getConcurrencyLimit('x2t'):
+      p = Popen(
+        ["x2t", config_file.name],
+        stdout=PIPE,
+        stderr=PIPE,
+        close_fds=True,
+        env=self.environment,
+      )
+      stdout, stderr = p.communicate()
     if p.returncode != 0:
       raise RuntimeError("x2t: exit code %d != 0\n+ %s\n> stdout: %s\n> stderr: %s@ x2t xml:\n%s"
                          % (p.returncode, " ".join(["x2t", config_file.name]), stdout, stderr,
@@ -269,6 +270,14 @@ class Handler:
       self.file.trash()
     return output_data
 
+  def _isZip(self):
+    """Returns True if the document is a zip archive"""
+    if isinstance(self._data, FileData):
+      header = self._data.read(4)
+    else:
+      header = self._data[:4]
+    return header == b"PK\x03\x04"
+
   def _getContentType(self):
     mimetype_type = None
     if "/" not in self._source_format:
@@ -280,13 +289,13 @@ class Handler:
   def getMetadata(self, base_document=False):
     r"""Returns a dictionary with all metadata of document.
     """
-    if self._source_format in yformat_tuple and self._data.startswith(b"PK\x03\x04"):
+    if self._source_format in yformat_tuple and self._isZip():
       if base_document:
         openxml_format = yformat_map[self._source_format]
         data = self.convert(yformat_map[self._source_format])
         return OOoHandler(self.base_folder_url, data, openxml_format, **self._init_kw).getMetadata(base_document)
       else:
-        with io.BytesIO(self._data) as memfile, ZipFile(memfile) as zipfile:
+        with ZipFile(self.file.getUrl()) as zipfile:
           try:
             metadata = zipfile.read("metadata.json")
           except KeyError:
@@ -305,7 +314,7 @@ class Handler:
     """
     if metadata is None:
       metadata = {}
-    if self._source_format in yformat_tuple and self._data.startswith(b"PK\x03\x04"):
+    if self._source_format in yformat_tuple and self._isZip():
       root_dir = self.file.directory_name
       output_file_name = os.path.join(root_dir, "tmp")
       try:
@@ -329,6 +338,11 @@ class Handler:
     else:
       return OOoHandler(self.base_folder_url, self._data, self._source_format, **self._init_kw).setMetadata(metadata)
 
+  @staticmethod
+  def getCapacity():
+    """Returns the number of conversions which can run at the same time"""
+    return getConcurrencyLimit('x2t').capacity
+
   @staticmethod
   def getAllowedConversionFormatList(source_mimetype:str):
     """Returns a list content_type and their titles which are supported
@@ -369,3 +383,8 @@ class Handler:
         format_list_append(("application/x-asc-presentation", "OnlyOffice Presentation"))
         break
     return format_list
+
+
+def bootstrapHandler(configuration_dict):
+  setConcurrencyLimit('x2t',
+                      int(configuration_dict.get('x2t_max_concurrency', 0)))
@@ -31,6 +31,7 @@
 
 from zipfile import ZipFile
 from io import BytesIO
+from cloudooo.file import FileData
 from cloudooo.handler.x2t.handler import Handler
 from cloudooo.tests.handlerTestCase import HandlerTestCase
 
@@ -133,6 +134,15 @@ class TestHandler(HandlerTestCase):
     handler = Handler(self.tmp_url, new_mime_data, "xlsy", **self.kw)
     self.assertEqual(handler.getMetadata(), {'Keywords': 'test keywords', 'MIMEType': 'application/x-asc-spreadsheet', 'Title': 'test title', 'Subject': 'test subject'})
 
+  def testMetadataFileData(self):
+    """Test getMetadata and setMetadata for yformats stored in a file"""
+    handler = Handler(self.tmp_url, FileData("data/test_with_metadata.xlsy"),
+                      "xlsy", **self.kw)
+    self.assertEqual(handler.getMetadata()['Title'], 'kesha')
+    new_mime_data = handler.setMetadata({"Title": "test title"})
+    handler = Handler(self.tmp_url, new_mime_data, "xlsy", **self.kw)
+    self.assertEqual(handler.getMetadata(), {'MIMEType': 'application/x-asc-spreadsheet', 'Title': 'test title'})
+
   def testGetAllowedConversionFormatList(self):
     """Test all combination of mimetype
 
@@ -42,7 +42,7 @@ class IFile(Interface):
   directory_name = Attribute("String of directory name")
   source_format = Attribute("Document Extension")
   url = Attribute("Complete path of document in file system")
-  original_data = Attribute("Original data")
+  original_data = Attribute("Original data, as bytes or FileData")
 
   def load():
     """From the data creates one archive into file system using original data
@@ -55,6 +55,9 @@ class IFile(Interface):
   def getContent(zip):
     """Returns data of document"""
 
+  def getContentFile(zip):
+    """Returns the document as FileData, moved out of the temporary folder"""
+
   def getUrl():
     """Get the url of temporary file in file system"""
 
@@ -44,9 +44,43 @@ class IManager(Interface):
     source_mimetype : mimetype of given content
     destination_mimetype : expected output conversion mimetype
 
+    **kw holds specific parameters for the conversion, and the priority of
+    the request: 'high' for interactive requests, 'low' by default
+    """
+
+  def convertFileMulti(content, source_mimetype, destination_mimetype_list,
+                       **kw):
+    """Returns a dictionary with the content converted in each given format.
+    The document is loaded once by the handlers which support it.
+
+    content : binary data to convert
+    source_mimetype : mimetype of given content
+    destination_mimetype_list : list of expected output conversion mimetypes
+
     **kw holds specific parameters for the conversion
     """
 
+  def convertFileList(item_list):
+    """Converts several contents and returns the results in the same order.
+    Each item is (content, source_mimetype, destination_mimetype, options)
+    where options holds the keyword arguments of convertFile.
+    Each result is a dictionary with 'data' or 'error'.
+    """
+
+  def submitConversion(content, source_mimetype, destination_mimetype, **kw):
+    """Queue the conversion of the content and returns a job id.
+    signature of method is same as convertFile
+    """
+
+  def getJobStatus(job_id):
+    """Returns a dictionary with the status of the job: queued, running,
+    done, failed or unknown.
+    """
+
+  def fetchJobResult(job_id):
+    """Returns the converted content of a done job and forgets it.
+    """
+
   def convertBundle(content, filename, source_mimetype, destination_mimetype,
                     **kw):
     """The content must be a zip archive with multiples files.
@@ -63,13 +97,15 @@ class IManager(Interface):
     **kw holds specific parameters for the conversion
     """
 
-  def getFileMetadataItemList(content, source_mimetype):
+  def getFileMetadataItemList(content, source_mimetype, base_document=False,
+                              priority='low'):
     """Returns a list key, value pairs representing the
     metadata values for the document. The structure of this
     list is "unpredictable" and follows the convention of each file.
 
     content : binary data where to reads metadata
     source_mimetype : mimetype of given content
+    priority : 'high' for interactive requests, 'low' by default
     """
 
   def convertFileAndGetMetadataItemList(content, source_mimetype,
@@ -82,13 +118,31 @@ class IManager(Interface):
     'metadata' entries.
     """
 
-  def updateFileMetadata(content, source_mimetype, metadata_dict):
+  def updateFileMetadata(content, source_mimetype, metadata_dict,
+                         priority='low'):
     """Updates the content with provided metadata and
     return the new file.
 
     content : binary data to convert
     source_mimetype : mimetype of given content
     metadata_dict : Metadatas to include in content
+    priority : 'high' for interactive requests, 'low' by default
+    """
+
+  def getConversionCacheStatistics():
+    """Returns a dictionary with the hit, miss and eviction counters, the
+    number of entries and the size of the conversion cache.
+    """
+
+  def getAdmissionStatistics():
+    """Returns a dictionary with the capacity, the number of requests being
+    processed and waiting in the queue, and the admitted and rejected
+    counters of the admission control, by handler.
+    """
+
+  def getHandlerStatistics():
+    """Returns a dictionary with the capacity, the number of running and
+    waiting processes and the time waited, by handler.
     """
 
   def getAllowedConversionFormatList(source_mimetype):
@@ -101,6 +155,13 @@ class IManager(Interface):
     ]
     """
 
+  def getConversionMatrix(version=None):
+    """Returns a dictionary with the list of content_type and their titles
+    supported by enabled handlers (conversion_dict), for each source
+    mimetype, and its version. Only the version is returned if it did not
+    change since the version given.
+    """
+
   def getAllowedConversionFormatInfoList(source_mimetype):
     """Returns a list content_type and list of parameter which are supported
     by enabled handlers.
@@ -119,20 +180,20 @@ class IERP5Compatibility(Interface):
   XXX Unfinished Docstring.
   """
 
-  def run_convert(filename, data, meta, extension, orig_format):
+  def run_convert(filename, data, meta, extension, orig_format, priority):
     """Returns the metadata and the ODF in dictionary"""
     return (200 or 402, dict(), '')
 
-  def run_setmetadata(filename, data, meta, extension, orig_format):
+  def run_setmetadata(filename, data, meta, extension, orig_format, priority):
     """Adds metadata in ODF and returns a new ODF with metadata in
     dictionary"""
     return (200 or 402, dict(), '')
 
-  def run_getmetadata(filename, data, meta, extension, orig_format):
+  def run_getmetadata(filename, data, meta, extension, orig_format, priority):
     """Extracts metadata from ODF and returns in dictionary"""
     return (200 or 402, dict(), '')
 
-  def run_generate(filename, data, meta, extension, orig_format):
+  def run_generate(filename, data, meta, extension, orig_format, priority):
     """It exports a ODF to given format"""
     return (200 or 402, dict(), '')
 
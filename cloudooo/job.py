@@ -0,0 +1,196 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import json
+import os
+import time
+from queue import Queue, Full
+from shutil import move
+from tempfile import mkstemp
+from threading import Lock, Thread
+from uuid import uuid4
+from cloudooo.file import FileData
+from cloudooo.util import logger
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+UNKNOWN = 'unknown'
+
+
+class JobQueueFull(Exception):
+  """Raised when the job queue can not accept more jobs"""
+
+
+class JobQueue(object):
+  """Runs jobs in worker threads, and keeps their results on disk until
+  they are fetched or expired."""
+
+  def __init__(self, path, worker_count=1, max_size=100, max_age=3600):
+    """Keyword arguments:
+    path -- folder where the results are stored
+    worker_count -- number of threads running the jobs
+    max_size -- maximum number of jobs waiting in the queue
+    max_age -- seconds to keep a result which is not fetched
+    """
+    self.path = path
+    self.max_age = max_age
+    self._queue = Queue(max_size)
+    self._lock = Lock()
+    # job_id: [status, time of the last change, error message]
+    self._job_dict = {}
+    if not os.path.exists(path):
+      os.mkdir(path)
+    for name in os.listdir(path):
+      file_path = os.path.join(path, name)
+      if name.endswith('.json'):
+        # results of a previous run
+        self._job_dict[name[:-5]] = [DONE, os.stat(file_path).st_mtime, None]
+      else:
+        # unfinished writes and inputs of the jobs of a previous run
+        os.remove(file_path)
+    for _ in range(worker_count):
+      Thread(target=self._work, daemon=True).start()
+
+  def _getFilePath(self, job_id):
+    return os.path.join(self.path, job_id + '.json')
+
+  def _expire(self):
+    """Remove the results which were not fetched in time, the lock must be
+    held"""
+    now = time.time()
+    for job_id, (status, changed_at, _) in list(self._job_dict.items()):
+      if status in (DONE, FAILED) and now - changed_at > self.max_age:
+        self._remove(job_id)
+
+  def _remove(self, job_id):
+    """Remove the job and its result, the lock must be held"""
+    status = self._job_dict.pop(job_id)[0]
+    if status == DONE:
+      try:
+        os.remove(self._getFilePath(job_id))
+      except OSError:
+        pass
+
+  def _setStatus(self, job_id, status, error=None):
+    with self._lock:
+      self._job_dict[job_id] = [status, time.time(), error]
+
+  def _getInputPath(self, job_id):
+    return os.path.join(self.path, job_id + '.input')
+
+  def _work(self):
+    while True:
+      job_id, has_input, function, args, kw = self._queue.get()
+      self._setStatus(job_id, RUNNING)
+      if has_input:
+        input_data = FileData(self._getInputPath(job_id))
+        args = (input_data,) + args
+      try:
+        result = function(*args, **kw)
+        fd, tmp_path = mkstemp(dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+          json.dump(result, f)
+        os.replace(tmp_path, self._getFilePath(job_id))
+      except Exception as e:
+        logger.error("Job %s failed", job_id, exc_info=True)
+        self._setStatus(job_id, FAILED, str(e))
+      else:
+        self._setStatus(job_id, DONE)
+      finally:
+        if has_input:
+          input_data.remove()
+
+  def _submit(self, job_id, has_input, function, args, kw):
+    with self._lock:
+      self._expire()
+      self._job_dict[job_id] = [QUEUED, time.time(), None]
+    try:
+      self._queue.put_nowait((job_id, has_input, function, args, kw))
+    except Full:
+      with self._lock:
+        del self._job_dict[job_id]
+      raise JobQueueFull("Too many jobs are waiting, retry later")
+    return job_id
+
+  def submit(self, function, *args, **kw):
+    """Queue the call of function with the arguments, and returns the id of
+    the job. The result of function must be serializable with json.
+    Raises JobQueueFull if too many jobs are waiting."""
+    return self._submit(uuid4().hex, False, function, args, kw)
+
+  def submitData(self, function, data, *args, **kw):
+    """Same as submit, but data, bytes or FileData, is kept in the folder
+    of the jobs instead of memory until the job ends, and it is given to
+    function as FileData. The file of a FileData is moved."""
+    job_id = uuid4().hex
+    input_path = self._getInputPath(job_id)
+    if isinstance(data, FileData):
+      move(data.path, input_path)
+    else:
+      with open(input_path, 'wb') as f:
+        f.write(data)
+    try:
+      return self._submit(job_id, True, function, args, kw)
+    except JobQueueFull:
+      os.remove(input_path)
+      raise
+
+  def getStatus(self, job_id):
+    """Returns a dictionary with the status of the job, and the error
+    message of a failed job"""
+    with self._lock:
+      self._expire()
+      status, _, error = self._job_dict.get(job_id, (UNKNOWN, None, None))
+    status_dict = dict(status=status)
+    if error is not None:
+      status_dict['error'] = error
+    return status_dict
+
+  def fetch(self, job_id):
+    """Returns the result of the job and removes it.
+    Raises an exception if the job failed or is not finished."""
+    with self._lock:
+      self._expire()
+      status, _, error = self._job_dict.get(job_id, (UNKNOWN, None, None))
+      if status == FAILED:
+        self._remove(job_id)
+        raise Exception("Job %s failed: %s" % (job_id, error))
+      if status != DONE:
+        raise ValueError("Job %s is %s" % (job_id, status))
+      with open(self._getFilePath(job_id)) as f:
+        result = json.load(f)
+      self._remove(job_id)
+    return result
+
+  def getQueueSize(self):
+    """Returns the number of jobs waiting in the queue"""
+    return self._queue.qsize()
@@ -28,18 +28,28 @@
 #
 ##############################################################################
 
+import hashlib
+import json
 import mimetypes
+import os
+import re
 import xmlrpc
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from inspect import signature
 from mimetypes import guess_type, guess_extension
 from binascii import a2b_base64
 from base64 import encodebytes
 from zope.interface import implementer
 from .interfaces.manager import IManager, IERP5Compatibility
-from cloudooo.util import logger, parseContentType
+from cloudooo.util import logger, parseContentType, getMimetypeListVersion
 from cloudooo.interfaces.granulate import ITableGranulator
 from cloudooo.interfaces.granulate import IImageGranulator
 from cloudooo.interfaces.granulate import ITextGranulator
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
+from threading import Lock
+from cloudooo.file import FileData, FILE_THRESHOLD
+from cloudooo.admission import LOW_PRIORITY, concurrency_limit_dict
 
 #XXX Must be removed
 from cloudooo.handler.ooo.granulator import OOGranulator
@@ -63,6 +73,135 @@ def getHandlerClass(source_format, destination_format, mimetype_registry,
   raise HandlerNotFound('No Handler found for %r=>%r' % (source_format,
                                                          destination_format))
 
+class HandlerRegistry(object):
+  """mimetype_registry compiled to select the handlers.
+
+  The handlers selected for the formats and the conversions allowed from a
+  mimetype are memoized, until the catalog of the mimemapper changes.
+  """
+
+  def __init__(self, mimetype_registry, handler_dict, memo_size=1024):
+    self.mimetype_registry = mimetype_registry
+    self.handler_dict = handler_dict
+    self.entry_list = []
+    for line in mimetype_registry:
+      source_pattern, destination_pattern, handler = line.split()
+      self.entry_list.append((source_pattern,
+                              re.compile(translate(source_pattern)).match,
+                              destination_pattern,
+                              re.compile(translate(destination_pattern)).match,
+                              handler))
+    self._lock = Lock()
+    self._version = None
+    self._handler_class_memo = lru_cache(memo_size)(self._selectHandlerClass)
+    # bounded, the mimetypes are given by the clients
+    self._allowed_format_memo = lru_cache(memo_size)(
+      self._selectAllowedConversionFormatList)
+    self._conversion_matrix = None
+
+  def getVersion(self):
+    """Returns the version of the catalogs the memoized results depend on"""
+    return mimemapper.version, getMimetypeListVersion()
+
+  def _checkVersion(self):
+    """Forgets the memoized results computed from an older catalog"""
+    version = self.getVersion()
+    if version != self._version:
+      with self._lock:
+        if version != self._version:
+          self._handler_class_memo.cache_clear()
+          self._allowed_format_memo.cache_clear()
+          self._conversion_matrix = None
+          self._version = version
+    return version
+
+  def _selectHandlerClass(self, source_format, destination_format):
+    source_mimetype = mimetypes.types_map.get('.%s' % source_format, "*")
+    destination_mimetype = mimetypes.types_map.get('.%s' % destination_format,
+                                                   "*")
+    for _, source_match, _, destination_match, handler in self.entry_list:
+      if source_match(source_mimetype) and \
+          (destination_match(destination_mimetype) or
+           destination_format is None):
+        return self.handler_dict[handler]
+    raise HandlerNotFound('No Handler found for %r=>%r' % (source_format,
+                                                           destination_format))
+
+  def getHandlerClass(self, source_format, destination_format):
+    """Select handler according to source_format and destination_format"""
+    self._checkVersion()
+    return self._handler_class_memo(source_format, destination_format)
+
+  def _selectAllowedConversionFormatList(self, source_mimetype):
+    filter_list_dict = {}  # filter_list_dict["ooo"] = ["text/*", ...]
+    for _, source_match, destination_pattern, _, handler in self.entry_list:
+      if source_match(source_mimetype):
+        filter_list_dict.setdefault(handler, []).append(destination_pattern)
+    output_mimetype_set = set()
+    for handler, mimetype_filter_list in filter_list_dict.items():
+      for output_mimetype in self.handler_dict[handler]\
+          .getAllowedConversionFormatList(source_mimetype):
+        for mimetype_filter in mimetype_filter_list:
+          if fnmatch(output_mimetype[0], mimetype_filter):
+            output_mimetype_set.add(output_mimetype)
+            break
+    return tuple(output_mimetype_set)
+
+  def getAllowedConversionFormatList(self, source_mimetype):
+    """Returns the list of (content_type, title) the handlers allowed by the
+    registry for source_mimetype can produce"""
+    self._checkVersion()
+    return list(self._allowed_format_memo(source_mimetype))
+
+  def getConversionMatrix(self):
+    """Returns the conversions allowed from every known mimetype, as a
+    dictionary with the version of the matrix (a digest of its content) and
+    the conversion_dict giving the sorted (content_type, title) by source
+    mimetype. It is computed once for each catalog."""
+    version = self._checkVersion()
+    conversion_matrix = self._conversion_matrix
+    if conversion_matrix is None:
+      conversion_dict = {}
+      for source_mimetype in sorted(set(mimetypes.types_map.values())):
+        # not memoized, the matrix is kept as a whole
+        output_mimetype_list = self._selectAllowedConversionFormatList(
+          source_mimetype)
+        if output_mimetype_list:
+          conversion_dict[source_mimetype] = sorted(output_mimetype_list)
+      conversion_matrix = dict(
+        version=hashlib.sha1(json.dumps(conversion_dict, sort_keys=True)
+                             .encode()).hexdigest(),
+        conversion_dict=conversion_dict)
+      with self._lock:
+        if version == self._version:
+          self._conversion_matrix = conversion_matrix
+    return conversion_matrix
+
+def admitted(method):
+  """Runs the method once the request is admitted by the admission
+  controller of the handler processing it, selected from the source_format
+  and destination_format (or the first of destination_format_list)
+  arguments, with the priority argument of the method if it has one"""
+  method_signature = signature(method)
+  @wraps(method)
+  def wrapper(self, *args, **kw):
+    if self.admission_controller is None:
+      return method(self, *args, **kw)
+    bound_arguments = method_signature.bind(self, *args, **kw)
+    bound_arguments.apply_defaults()
+    arguments = bound_arguments.arguments
+    destination_format = arguments.get('destination_format')
+    if destination_format is None:
+      destination_format = (arguments.get('destination_format_list') or
+                            [None])[0]
+    handler_class = self._getConversionHandlerClass(
+      arguments['source_format'], destination_format,
+      arguments.get('conversion_kw') or {})
+    admission_controller = self._getAdmissionController(handler_class)
+    with admission_controller.admit(arguments.get('priority', LOW_PRIORITY)):
+      return method(self, *args, **kw)
+  return wrapper
+
 def BBB_guess_type(url):
   base = url.split("/")[-1].lstrip(".")
   # if base.endswith(".ms.docx"): return ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "Microsoft Word 2007-2013 XML")
@@ -108,13 +247,32 @@ class Manager(object):
     self.kw = kw
     self.mimetype_registry = kw.pop("mimetype_registry")
     self.handler_dict = kw.pop("handler_dict")
+    self.handler_registry = kw.pop("handler_registry", None)
+    if self.handler_registry is None:
+      self.handler_registry = HandlerRegistry(self.mimetype_registry,
+                                              self.handler_dict)
+    self.conversion_cache = kw.pop("conversion_cache", None)
+    self.job_queue = kw.pop("job_queue", None)
+    # settings of the admission controllers of the handlers, which admit
+    # the requests according to the capacity of each handler
+    self.admission_controller = kw.pop("admission_controller", None)
+    self._admission_controller_dict = {}
+    self._admission_lock = Lock()
 
   def _check_file_type(self, file):
     if isinstance(file, xmlrpc.client.Binary):
       raise TypeError('`file` must be provided as a string with the file content encoded as base64')
 
+  def _decodeFile(self, file):
+    """Returns the content of the file sent by the client. Large files are
+    already decoded on disk by the application and are given as FileData."""
+    self._check_file_type(file)
+    if isinstance(file, FileData):
+      return file
+    return a2b_base64(file)
+
   def convertFile(self, file:str, source_format:str, destination_format:str, zip=False,
-                  refresh=False, conversion_kw={}) -> str:
+                  refresh=False, conversion_kw={}, priority=LOW_PRIORITY) -> str:
     """Returns the converted file in the given format.
     Keywords arguments:
       file -- File as string in base64
@@ -122,11 +280,206 @@ class Manager(object):
       destination_format -- Target format as string
       zip -- Boolean Attribute. If true, returns the file in the form of a
       zip archive
+      priority -- 'high' for interactive requests, which are processed
+      before the 'low' ones
+    Large results are returned as FileData, which the application encodes
+    in base64 while sending them.
     """
-    self._check_file_type(file)
+    decode_data = self._convertData(self._decodeFile(file), source_format,
+                                    destination_format, zip, refresh,
+                                    conversion_kw, output_file=True,
+                                    priority=priority)
+    if isinstance(decode_data, FileData):
+      return decode_data
+    return encodebytes(decode_data).decode()
 
+  def _convertData(self, data, source_format:str, destination_format:str,
+                   zip=False, refresh=False, conversion_kw={},
+                   output_file=False, priority=None) -> bytes:
+    """Returns the converted data, like convertFile but without base64 so
+    that it can be used by the binary HTTP interface. data is bytes or
+    FileData.
+    If output_file is True, results larger than FILE_THRESHOLD are returned
+    as FileData. The caller must remove the file.
+    The results found in the cache are returned at once, the conversions
+    wait to be admitted with priority, unless it is None, as for the jobs
+    which are limited by their workers.
+    """
+    if self.conversion_cache is not None:
+      cache_key = self.conversion_cache.getKey(data, 'convertData',
+                                               source_format,
+                                               destination_format, zip,
+                                               refresh, conversion_kw)
+      output = self.conversion_cache.getData(cache_key, self._path_tmp_dir)
+      if output is not None:
+        return self._getOutput(output, output_file)
+
+    if priority is None:
+      output = self._runConversion(data, source_format, destination_format,
+                                   zip, refresh, conversion_kw, output_file)
+    else:
+      output = self._admittedRunConversion(data, source_format,
+                                           destination_format, zip, refresh,
+                                           conversion_kw, output_file,
+                                           priority)
+    if self.conversion_cache is not None:
+      # large results are hard linked in the cache, not read in memory
+      self.conversion_cache.setData(cache_key, output)
+    return self._getOutput(output, output_file)
+
+  def _runConversion(self, data, source_format:str, destination_format:str,
+                     zip, refresh, conversion_kw, output_file):
+    """Converts the data with its handler, returns bytes, or FileData if
+    output_file is True and the handler supports it"""
     kw = self.kw.copy()
     kw.update(zip=zip, refresh=refresh)
+    handler_class = self._getConversionHandlerClass(source_format,
+                                                    destination_format,
+                                                    conversion_kw)
+    handler = handler_class(self._path_tmp_dir,
+                            data,
+                            source_format,
+                            **kw)
+    if output_file and hasattr(handler, 'convertToFile'):
+      return handler.convertToFile(destination_format, **conversion_kw)
+    return handler.convert(destination_format, **conversion_kw)
+
+  @admitted
+  def _admittedRunConversion(self, data, source_format:str,
+                             destination_format:str, zip, refresh,
+                             conversion_kw, output_file,
+                             priority=LOW_PRIORITY):
+    """_runConversion once the request is admitted"""
+    return self._runConversion(data, source_format, destination_format, zip,
+                               refresh, conversion_kw, output_file)
+
+  def _getOutput(self, output, output_file):
+    """Returns the result of a conversion, bytes or FileData, as bytes, or
+    as FileData if it is larger than FILE_THRESHOLD and output_file is
+    True"""
+    if isinstance(output, FileData) and \
+        not (output_file and len(output) > FILE_THRESHOLD):
+      try:
+        return output.read()
+      finally:
+        output.remove()
+    return output
+
+  def _convertBody(self, data, source_format:str, destination_format:str,
+                   zip=False, refresh=False):
+    """Converts the body of a request of the binary HTTP interface"""
+    return self._convertData(data, source_format, destination_format, zip,
+                             refresh, output_file=True,
+                             priority=LOW_PRIORITY)
+
+  def _getHandlerCapacity(self, handler_class):
+    """Returns the number of conversions the handler can run at the same
+    time, the number of CPUs by default"""
+    getCapacity = getattr(handler_class, 'getCapacity', None)
+    if getCapacity is None:
+      return os.cpu_count() or 1
+    return getCapacity()
+
+  def _getAdmissionController(self, handler_class):
+    """Returns the admission controller of the handler, whose capacity is
+    the one of the handler unless it is configured"""
+    admission_controller = self._admission_controller_dict.get(handler_class)
+    if admission_controller is None:
+      with self._admission_lock:
+        admission_controller = self._admission_controller_dict.get(
+          handler_class)
+        if admission_controller is None:
+          admission_controller = self.admission_controller.copy(
+            self.admission_controller.capacity or
+            self._getHandlerCapacity(handler_class))
+          self._admission_controller_dict[handler_class] = \
+            admission_controller
+    return admission_controller
+
+  def convertFileList(self, item_list:list) -> list:
+    """Converts several files and returns the results in the same order.
+    Each item is a list (file, source_format, destination_format, options)
+    where options is an optional dictionary with the zip, refresh and
+    conversion_kw arguments of convertFile.
+    Each result is a dictionary with the converted file as 'data', or the
+    error message as 'error'.
+    The conversions run concurrently, up to the capacity of each handler.
+    """
+    future_list = []
+    executor_dict = {}
+    try:
+      for item in item_list:
+        file, source_format, destination_format = item[:3]
+        options = item[3] if len(item) > 3 else {}
+        try:
+          data = self._decodeFile(file)
+          handler_class = self._getConversionHandlerClass(
+            source_format, destination_format,
+            options.get('conversion_kw', {}))
+        except Exception as e:
+          future_list.append(e)
+          continue
+        executor = executor_dict.get(handler_class)
+        if executor is None:
+          executor = executor_dict[handler_class] = ThreadPoolExecutor(
+            self._getHandlerCapacity(handler_class))
+        future_list.append(executor.submit(self._convertFile, data,
+                                           source_format,
+                                           destination_format, **options))
+    finally:
+      for executor in executor_dict.values():
+        executor.shutdown(wait=False)
+    result_list = []
+    for future in future_list:
+      if isinstance(future, Exception):
+        result_list.append(dict(error=str(future)))
+        continue
+      try:
+        result_list.append(dict(data=future.result()))
+      except Exception as e:
+        logger.error("convertFileList: conversion failed", exc_info=True)
+        result_list.append(dict(error=str(e)))
+    return result_list
+
+  def submitConversion(self, file:str, source_format:str,
+                       destination_format:str, zip=False, refresh=False,
+                       conversion_kw={}) -> str:
+    """Queue the conversion of the file and returns the id of the job.
+    The arguments are the same as convertFile. The converted file is
+    returned by fetchJobResult once getJobStatus gives 'done'.
+    """
+    data = self._decodeFile(file)
+    if self.job_queue is None:
+      raise ValueError("Asynchronous jobs are disabled")
+    # the document waits in the folder of the jobs, not in memory
+    return self.job_queue.submitData(self._convertFile, data, source_format,
+                                     destination_format, zip, refresh,
+                                     conversion_kw, priority=None)
+
+  def _convertFile(self, data:bytes, source_format:str,
+                   destination_format:str, zip=False, refresh=False,
+                   conversion_kw={}, priority=LOW_PRIORITY) -> str:
+    """Returns the converted data as string in base64, for the results which
+    are not sent directly by the application"""
+    return encodebytes(self._convertData(data, source_format,
+                                         destination_format, zip, refresh,
+                                         conversion_kw,
+                                         priority=priority)).decode()
+
+  def getJobStatus(self, job_id:str) -> dict:
+    """Returns a dictionary with the status of the job as 'status': queued,
+    running, done, failed or unknown. A failed job also has an 'error'.
+    """
+    return self.job_queue.getStatus(job_id)
+
+  def fetchJobResult(self, job_id:str) -> str:
+    """Returns the converted file of a done job, as string in base64.
+    The result is removed, so it can be fetched only once."""
+    return self.job_queue.fetch(job_id)
+
+  def _getConversionHandlerClass(self, source_format, destination_format,
+                                 conversion_kw):
+    """Returns the handler class to use for the conversion"""
     # XXX Force the use of wkhtmltopdf handler if converting from html to pdf
     #     with conversion parameters.
     #     This is a hack that quickly enables the use of wkhtmltopdf without
@@ -138,20 +491,82 @@ class Manager(object):
     if (conversion_kw and
         source_format in ("html", "text/html") and
         destination_format in ("pdf", "application/pdf")):
-      handler_class = WkhtmltopdfHandler
+      return WkhtmltopdfHandler
+    return self.handler_registry.getHandlerClass(source_format,
+                                                 destination_format)
+
+  @admitted
+  def convertFileAndGetMetadataItemList(self, file:str, source_format:str,
+                                        destination_format:str, zip=False,
+                                        refresh=False,
+                                        conversion_kw={}) -> dict:
+    """Returns a dictionary with the converted file in the given format as
+    'conversion' and the metadata of the original file as 'metadata'.
+    The handlers which support it load the document only once.
+    Keywords arguments are the same as convertFile.
+    """
+    kw = self.kw.copy()
+    kw.update(zip=zip, refresh=refresh)
+    data = self._decodeFile(file)
+    handler_class = self._getConversionHandlerClass(source_format,
+                                                    destination_format,
+                                                    conversion_kw)
+    metadata_handler_class = self.handler_registry.getHandlerClass(
+      source_format, None)
+    handler = handler_class(self._path_tmp_dir, data, source_format, **kw)
+    if handler_class is metadata_handler_class and \
+        hasattr(handler, 'convertAndGetMetadata'):
+      decode_data, metadata_dict = handler.convertAndGetMetadata(
+        destination_format, **conversion_kw)
     else:
-      handler_class = getHandlerClass(source_format,
-                                    destination_format,
-                                    self.mimetype_registry,
-                                    self.handler_dict)
-    handler = handler_class(self._path_tmp_dir,
-                            a2b_base64(file),
-                            source_format,
-                            **kw)
-    decode_data = handler.convert(destination_format, **conversion_kw)
-    return encodebytes(decode_data).decode()
-
-  def updateFileMetadata(self, file:str, source_format:str, metadata_dict:dict) -> str:
+      metadata_dict = metadata_handler_class(self._path_tmp_dir,
+                                             data,
+                                             source_format,
+                                             **self.kw).getMetadata()
+      decode_data = handler.convert(destination_format, **conversion_kw)
+    return dict(conversion=encodebytes(decode_data).decode(),
+                metadata=metadata_dict)
+
+  @admitted
+  def convertFileMulti(self, file:str, source_format:str,
+                       destination_format_list:list, zip=False,
+                       refresh=False) -> dict:
+    """Returns a dictionary with the file converted in each given format.
+    The handlers which support it load the document only once.
+    Keywords arguments:
+      file -- File as string in base64
+      source_format -- Format of original file as string
+      destination_format_list -- List of target formats as string
+      zip -- Boolean Attribute. If true, returns the files in the form of
+      zip archives
+    """
+    kw = self.kw.copy()
+    kw.update(zip=zip, refresh=refresh)
+    data = self._decodeFile(file)
+    handler_class_list = [self.handler_registry.getHandlerClass(
+                            source_format, destination_format)
+                          for destination_format in destination_format_list]
+    if len(set(handler_class_list)) == 1 and \
+        hasattr(handler_class_list[0], 'convertMulti'):
+      handler = handler_class_list[0](self._path_tmp_dir,
+                                      data,
+                                      source_format,
+                                      **kw)
+      decode_data_dict = handler.convertMulti(destination_format_list)
+    else:
+      decode_data_dict = {}
+      for index, destination_format in enumerate(destination_format_list):
+        handler = handler_class_list[index](self._path_tmp_dir,
+                                            data,
+                                            source_format,
+                                            **kw)
+        decode_data_dict[destination_format] = handler.convert(destination_format)
+    return {destination_format: encodebytes(decode_data).decode()
+            for destination_format, decode_data in decode_data_dict.items()}
+
+  @admitted
+  def updateFileMetadata(self, file:str, source_format:str, metadata_dict:dict,
+                         priority=LOW_PRIORITY) -> str:
     """Receives the string of document and a dict with metadatas. The metadata
     is added in document.
     e.g
@@ -159,13 +574,10 @@ class Manager(object):
       {"title":"abc","description":...})
     return encodebytes(document_with_metadata)
     """
-    self._check_file_type(file)
-    handler_class = getHandlerClass(source_format,
-                               None,
-                               self.mimetype_registry,
-                               self.handler_dict)
+    data = self._decodeFile(file)
+    handler_class = self.handler_registry.getHandlerClass(source_format, None)
     handler = handler_class(self._path_tmp_dir,
-                            a2b_base64(file),
+                            data,
                             source_format,
                             **self.kw)
     metadata_dict = {key.capitalize(): value \
@@ -173,7 +585,8 @@ class Manager(object):
     decode_data = handler.setMetadata(metadata_dict)
     return encodebytes(decode_data).decode()
 
-  def getFileMetadataItemList(self, file:str, source_format:str, base_document=False) -> dict[str, str]:
+  def getFileMetadataItemList(self, file:str, source_format:str, base_document=False,
+                              priority=LOW_PRIORITY) -> dict[str, str]:
     """Receives the string of document as encodebytes and returns a dict with
     metadatas.
     e.g.
@@ -186,20 +599,80 @@ class Manager(object):
     return {'Title': 'abc','Description': 'comments', 'Data': string_ODF}
 
     Note that all keys of the dictionary have the first word in uppercase.
+
+    priority is 'high' for interactive requests, which are processed before
+    the 'low' ones.
     """
-    self._check_file_type(file)
-    handler_class = getHandlerClass(source_format,
-                                    None,
-                                    self.mimetype_registry,
-                                    self.handler_dict)
+    data = self._decodeFile(file)
+    if self.conversion_cache is not None:
+      cache_key = self.conversion_cache.getKey(data,
+                                               'getFileMetadataItemList',
+                                               source_format, base_document)
+      metadata_dict = self.conversion_cache.get(cache_key)
+      if metadata_dict is not None:
+        return metadata_dict
+    metadata_dict = self._getMetadata(data, source_format, base_document,
+                                      priority)
+    if self.conversion_cache is not None:
+      self.conversion_cache.set(cache_key, metadata_dict)
+    return metadata_dict
+
+  @admitted
+  def _getMetadata(self, data, source_format:str, base_document,
+                   priority=LOW_PRIORITY):
+    """Returns the metadata of the data not found in the cache, once the
+    request is admitted"""
+    handler_class = self.handler_registry.getHandlerClass(source_format, None)
     handler = handler_class(self._path_tmp_dir,
-                            a2b_base64(file),
+                            data,
                             source_format,
                             **self.kw)
     metadata_dict = handler.getMetadata(base_document)
     metadata_dict['Data'] = encodebytes(metadata_dict.get('Data', b'')).decode()
     return metadata_dict
 
+  def getConversionCacheStatistics(self) -> dict:
+    """Returns the counters of the conversion cache: hit_count, miss_count,
+    eviction_count, entry_count and size in bytes.
+    Returns an empty dictionary if the cache is disabled."""
+    if self.conversion_cache is None:
+      return {}
+    return self.conversion_cache.getStatistics()
+
+  def getAdmissionStatistics(self) -> dict:
+    """Returns the state of the admission control by handler name:
+    capacity, active_count (requests being processed), queue_size (requests
+    waiting), admitted_count and rejected_count.
+    Returns an empty dictionary if admission control is disabled."""
+    return {handler_class.__module__.split('.')[-2]:
+              admission_controller.getStatistics()
+            for handler_class, admission_controller
+            in list(self._admission_controller_dict.items())}
+
+  def getHandlerStatistics(self) -> dict:
+    """Returns the concurrency limit of the handlers running external tools
+    by handler name: capacity, active_count, waiting_count, acquired_count,
+    and total_wait and max_wait in seconds."""
+    return {name: limit.getStatistics()
+            for name, limit in concurrency_limit_dict.items()}
+
+  def getConversionMatrix(self, version:str=None) -> dict:
+    """Returns all the conversions allowed by the enabled handlers:
+
+    {'version': '0a4d55a8d778e5022fab701977c5d840bbc486d0',
+     'conversion_dict': {
+       'application/msword': [['application/pdf', 'PDF - Portable Document Format'],
+                              ...],
+       ...}}
+
+    The version changes only with the allowed conversions. If it is the
+    version given, the conversion_dict is not returned.
+    """
+    conversion_matrix = self.handler_registry.getConversionMatrix()
+    if version is not None and version == conversion_matrix['version']:
+      return dict(version=version)
+    return conversion_matrix
+
   def getAllowedExtensionList(self, request_dict={}):
     """BBB: extension should not be used, use MIMEType with getAllowedConversionFormatList
 
@@ -245,27 +718,11 @@ class Manager(object):
 
     /!\ the returned list may have the same mimetype twice with different title.
     """
-    handler_dict = {}  # handler_dict["ooo"] = ["text/*", "application/*"]
-    for entry in self.mimetype_registry:
-      split_entry = entry.split()
-      if fnmatch(source_mimetype, split_entry[0]):
-        if split_entry[2] in handler_dict:
-          handler_dict[split_entry[2]].append(split_entry[1])
-        else:
-          handler_dict[split_entry[2]] = [split_entry[1]]
-
-    output_mimetype_set = set()
-    for handler, mimetype_filter_list in handler_dict.items():
-      for output_mimetype in self.handler_dict[handler].getAllowedConversionFormatList(source_mimetype):
-        for mimetype_filter in mimetype_filter_list:
-          if fnmatch(output_mimetype[0], mimetype_filter):
-            output_mimetype_set.add(output_mimetype)
-            break
-
-    return list(output_mimetype_set)
+    return self.handler_registry.getAllowedConversionFormatList(
+      source_mimetype)
 
   def run_convert(self, filename='', data=None, meta=None, extension=None,
-                  orig_format=None):
+                  orig_format=None, priority=LOW_PRIORITY):
     """Method to support the old API. Wrapper getFileMetadataItemList but
     returns a dict.
     This is a Backwards compatibility provided for ERP5 Project, in order to
@@ -276,7 +733,8 @@ class Manager(object):
     try:
       response_dict = {}
       metadata_dict = self.getFileMetadataItemList(data, extension,
-                                                   base_document=True)
+                                                   base_document=True,
+                                                   priority=priority)
       response_dict['meta'] = metadata_dict
       # XXX - Backward compatibility: Previous API expects 'mime' now we
       # use 'MIMEType'
@@ -290,7 +748,7 @@ class Manager(object):
       return (402, {}, e.args[0])
 
   def run_setmetadata(self, filename='', data=None, meta=None,
-                      extension=None, orig_format=None):
+                      extension=None, orig_format=None, priority=LOW_PRIORITY):
     """Wrapper updateFileMetadata but returns a dict.
     This is a Backwards compatibility provided for ERP5 Project, in order to
     keep compatibility with OpenOffice.org Daemon.
@@ -299,14 +757,15 @@ class Manager(object):
       extension = filename.split('.')[-1]
     response_dict = {}
     try:
-      response_dict['data'] = self.updateFileMetadata(data, extension, meta)
+      response_dict['data'] = self.updateFileMetadata(data, extension, meta,
+                                                      priority)
       return (200, response_dict, '')
     except Exception as e:
       logger.error('Error setting metadata', exc_info=True)
       return (402, {}, e.args[0])
 
   def run_getmetadata(self, filename='', data=None, meta=None,
-                      extension=None, orig_format=None):
+                      extension=None, orig_format=None, priority=LOW_PRIORITY):
     """Wrapper for getFileMetadataItemList.
     This is a Backwards compatibility provided for ERP5 Project, in order to
     keep compatibility with OpenOffice.org Daemon.
@@ -315,7 +774,8 @@ class Manager(object):
       extension = filename.split('.')[-1]
     response_dict = {}
     try:
-      response_dict['meta'] = self.getFileMetadataItemList(data, extension)
+      response_dict['meta'] = self.getFileMetadataItemList(
+        data, extension, priority=priority)
       # XXX - Backward compatibility: Previous API expects 'title' now
       # we use 'Title'"
       response_dict['meta']['title'] = response_dict['meta']['Title']
@@ -325,7 +785,7 @@ class Manager(object):
       return (402, {}, e.args[0])
 
   def run_generate(self, filename='', data=None, meta=None, extension=None,
-                   orig_format=''):
+                   orig_format='', priority=LOW_PRIORITY):
     """Wrapper convertFile but returns a dict which includes mimetype.
     This is a Backwards compatibility provided for ERP5 Project, in order
     to keep compatibility with OpenOffice.org Daemon.
@@ -348,10 +808,9 @@ class Manager(object):
                          "spreadsheet",
                          'text') and extension == "xhtml":
         extension = 'html'
-      response_dict['data'] = self.convertFile(data,
-                                               original_extension,
-                                               extension,
-                                               zip)
+      response_dict['data'] = self._convertFile(
+        self._decodeFile(data), original_extension, extension, zip,
+        priority=priority)
       # FIXME: Fast solution to obtain the html or pdf mimetypes
       if zip:
         response_dict['mime'] = "application/zip"
@@ -384,16 +843,20 @@ class Manager(object):
       logger.error('Error in getting target item list from %s', content_type, exc_info=True)
       return (402, {}, e.args[0])
 
+  @admitted
   def _getOOGranulator(self, data:str, source_format="odt"):
     """Returns an instance of the handler OOGranulator after convert the
     data to 'odt'
     data is a str with the actual data encoded in base64
     """
     GRANULATABLE_FORMAT_LIST = ("odt",)
+    data = self._decodeFile(data)
     if source_format not in GRANULATABLE_FORMAT_LIST:
-      data = self.convertFile(data, source_format,
+      data = self._convertData(data, source_format,
                     GRANULATABLE_FORMAT_LIST[0], zip=False)
-    return OOGranulator(a2b_base64(data), GRANULATABLE_FORMAT_LIST[0])
+    elif isinstance(data, FileData):
+      data = data.read()
+    return OOGranulator(data, GRANULATABLE_FORMAT_LIST[0])
 
   def getTableItemList(self, data, source_format="odt"):
     """Returns the list of table IDs in the form of (id, title)."""
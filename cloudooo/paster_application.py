@@ -29,6 +29,7 @@
 ##############################################################################
 
 import gc
+import json
 
 from os import path, mkdir, environ
 from cloudooo.wsgixmlrpcapplication import WSGIXMLRPCApplication
@@ -77,6 +78,22 @@ def application(global_config, **local_config):
   if not path.exists(cloudooo_path_tmp_dir):
     mkdir(cloudooo_path_tmp_dir)
 
+  # directory to keep the results of the asynchronous jobs
+  from .job import JobQueue
+  local_config['job_queue'] = JobQueue(
+    path.join(working_path, 'job'),
+    int(local_config.get('job_worker_count', 1)),
+    int(local_config.get('job_queue_size', 100)),
+    int(local_config.get('job_result_max_age', 3600)))
+
+  # limits of the requests processed and waiting at the same time
+  from .admission import AdmissionController
+  local_config['admission_controller'] = AdmissionController(
+    int(local_config.get('admission_max_active', 0)),
+    int(local_config.get('admission_queue_size', 0)),
+    float(local_config.get('admission_queue_wait', 0)),
+    float(local_config.get('admission_low_priority_share', 0.25)))
+
   util.loadMimetypeList()
 
   mimetype_registry = local_config.get("mimetype_registry", "")
@@ -109,6 +126,32 @@ def application(global_config, **local_config):
       handler_dict[handler] = module.Handler
 
   local_config['handler_dict'] = handler_dict
-  from .manager import Manager
+
+  # directory to keep the results of the conversions, which are removed
+  # when the handlers, or the versions they set while bootstrapping, change
+  conversion_cache_size = int(local_config.get('conversion_cache_size', 0))
+  if conversion_cache_size:
+    from .cache import ConversionCache
+    local_config['conversion_cache'] = ConversionCache(
+      path.join(working_path, 'cache'),
+      conversion_cache_size * 1024 * 1024,
+      int(local_config.get('conversion_cache_max_age', 0)),
+      json.dumps([handler_mapping_list] +
+                 [local_config.get('%s_version' % handler)
+                  for handler in sorted(handler_dict)]))
+
+  from .manager import Manager, HandlerRegistry
+  # compiled once, the selections of the handlers are memoized
+  local_config['handler_registry'] = HandlerRegistry(handler_mapping_list,
+                                                     handler_dict)
   cloudooo_manager = Manager(cloudooo_path_tmp_dir, **local_config)
-  return WSGIXMLRPCApplication(instance=cloudooo_manager)
+  # the handlers are bootstrapped, compute the conversions they allow
+  cloudooo_manager.getConversionMatrix()
+  return WSGIXMLRPCApplication(
+    instance=cloudooo_manager,
+    tmp_dir=cloudooo_path_tmp_dir,
+    compression_threshold=int(local_config.get('compression_threshold',
+                                               1024)),
+    compression_level=int(local_config.get('compression_level', 6)),
+    max_request_size=int(local_config.get('max_request_size', 1024))
+                     * 1024 * 1024)
@@ -0,0 +1,298 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import os
+import time
+import unittest
+from base64 import encodebytes
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+from cloudooo.admission import AdmissionController, ServerBusy, \
+  SERVER_BUSY_FAULT_CODE, HIGH_PRIORITY, LOW_PRIORITY, ConcurrencyLimit
+from cloudooo.cache import ConversionCache
+from cloudooo.manager import Manager
+
+
+class TestAdmissionController(unittest.TestCase):
+
+  def _startWaiting(self, controller, result_list, priority=LOW_PRIORITY,
+                    result='admitted'):
+    """Starts a thread waiting to be admitted"""
+    def run():
+      try:
+        controller.acquire(priority)
+      except ServerBusy as e:
+        result_list.append(e.faultCode)
+      else:
+        result_list.append(result)
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+  def _waitQueueSize(self, controller, size):
+    for _ in range(100):
+      if controller.getStatistics()['queue_size'] == size:
+        return
+      time.sleep(0.01)
+    self.fail("queue size is not %s" % size)
+
+  def testQueueFull(self):
+    """Requests are rejected when the queue is full"""
+    controller = AdmissionController(1, max_queue_size=1)
+    controller.acquire()
+    result_list = []
+    thread = self._startWaiting(controller, result_list)
+    self._waitQueueSize(controller, 1)
+    with self.assertRaises(ServerBusy) as context:
+      controller.acquire()
+    self.assertEqual(context.exception.faultCode, SERVER_BUSY_FAULT_CODE)
+    controller.release()
+    thread.join(1)
+    self.assertEqual(result_list, ['admitted'])
+    statistics = controller.getStatistics()
+    self.assertEqual(statistics['active_count'], 1)
+    self.assertEqual(statistics['queue_size'], 0)
+    self.assertEqual(statistics['admitted_count'], 2)
+    self.assertEqual(statistics['rejected_count'], 1)
+
+  def testQueueWait(self):
+    """Requests are rejected when they wait too long"""
+    controller = AdmissionController(1, max_queue_wait=0.1)
+    controller.acquire()
+    result_list = []
+    self._startWaiting(controller, result_list).join(1)
+    self.assertEqual(result_list, [SERVER_BUSY_FAULT_CODE])
+    self.assertEqual(controller.getStatistics()['queue_size'], 0)
+
+  def testOrder(self):
+    """Waiting requests are admitted in their order of arrival"""
+    controller = AdmissionController(1)
+    controller.acquire()
+    result_list = []
+    thread_list = []
+    for index in range(3):
+      thread_list.append(self._startWaiting(controller, result_list))
+      self._waitQueueSize(controller, index + 1)
+      result_list.append(index)
+    for thread in thread_list:
+      controller.release()
+      thread.join(1)
+    self.assertEqual(result_list, [0, 1, 2, 'admitted', 'admitted',
+                                   'admitted'])
+
+  def testPriority(self):
+    """High priority requests are admitted first, but low priority ones keep
+    their share of the capacity"""
+    controller = AdmissionController(4, low_priority_share=0.25)
+    for _ in range(4):
+      controller.acquire()
+    result_list = []
+    thread_list = []
+    for priority in (LOW_PRIORITY, LOW_PRIORITY, HIGH_PRIORITY,
+                     HIGH_PRIORITY):
+      thread_list.append(self._startWaiting(controller, result_list,
+                                            priority, priority))
+      self._waitQueueSize(controller, len(thread_list))
+    # low priority requests use the whole capacity, high ones go first
+    controller.release()
+    controller.release()
+    for thread in thread_list[2:]:
+      thread.join(1)
+    self.assertEqual(result_list, [HIGH_PRIORITY, HIGH_PRIORITY])
+    # the next slot is kept for the low priority
+    controller.release()
+    controller.release()
+    for thread in thread_list[:2]:
+      thread.join(1)
+    self.assertEqual(result_list[2:], [LOW_PRIORITY, LOW_PRIORITY])
+    statistics = controller.getStatistics()
+    self.assertEqual(statistics['high_active_count'], 2)
+    self.assertEqual(statistics['low_active_count'], 2)
+    self.assertEqual(statistics['low_queue_size'], 0)
+
+  def testPrioritySmallCapacity(self):
+    """When the capacity is too small to be shared, low priority requests
+    keep their share of the admissions"""
+    controller = AdmissionController(1, low_priority_share=0.5)
+    controller.acquire()
+    result_list = []
+    thread_list = []
+    for priority in (LOW_PRIORITY, HIGH_PRIORITY, HIGH_PRIORITY):
+      thread_list.append(self._startWaiting(controller, result_list,
+                                            priority, priority))
+      self._waitQueueSize(controller, len(thread_list))
+    for index in range(len(thread_list)):
+      controller.release(result_list[-1] if result_list else LOW_PRIORITY)
+      for _ in range(100):
+        if len(result_list) > index:
+          break
+        time.sleep(0.01)
+    self.assertEqual(result_list, [HIGH_PRIORITY, LOW_PRIORITY,
+                                   HIGH_PRIORITY])
+
+  def testReentrant(self):
+    """Requests made by an admitted request are admitted immediately"""
+    controller = AdmissionController(1, max_queue_size=1)
+    with controller.admit():
+      with controller.admit():
+        self.assertEqual(controller.getStatistics()['active_count'], 1)
+    self.assertEqual(controller.getStatistics()['active_count'], 0)
+
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+
+  def testLimit(self):
+    """Processes wait when the limit is reached, and the wait is measured"""
+    limit = ConcurrencyLimit(1)
+    event_list = []
+    def run():
+      with limit:
+        event_list.append('started')
+    with limit:
+      thread = Thread(target=run, daemon=True)
+      thread.start()
+      for _ in range(100):
+        if limit.getStatistics()['waiting_count']:
+          break
+        time.sleep(0.01)
+      time.sleep(0.05)
+      self.assertEqual(event_list, [])
+    thread.join(1)
+    self.assertEqual(event_list, ['started'])
+    statistics = limit.getStatistics()
+    self.assertEqual(statistics['active_count'], 0)
+    self.assertEqual(statistics['waiting_count'], 0)
+    self.assertEqual(statistics['acquired_count'], 2)
+    self.assertGreater(statistics['max_wait'], 0.04)
+    self.assertGreaterEqual(statistics['total_wait'], statistics['max_wait'])
+
+
+class SlowHandler(object):
+  """Handler converting one document at a time, once the event is set"""
+
+  event = Event()
+  converted_list = []
+
+  def __init__(self, base_folder_url, data, source_format, **kw):
+    self.data = data
+
+  @staticmethod
+  def getCapacity():
+    return 1
+
+  def convert(self, destination_format, **kw):
+    self.event.wait(5)
+    self.converted_list.append(self.data)
+    return self.data
+
+
+class TestManagerAdmission(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = mkdtemp()
+    SlowHandler.event.clear()
+    del SlowHandler.converted_list[:]
+    self.manager = Manager(self.tmp_dir,
+                           mimetype_registry=['* * slow'],
+                           handler_dict=dict(slow=SlowHandler),
+                           admission_controller=AdmissionController(
+                             0, max_queue_size=2))
+
+  def tearDown(self):
+    SlowHandler.event.set()
+    rmtree(self.tmp_dir)
+
+  def _startConversion(self, data, result_list, priority=LOW_PRIORITY):
+    def run():
+      try:
+        self.manager.convertFile(encodebytes(data).decode(), 'txt', 'pdf',
+                                 priority=priority)
+      except ServerBusy as e:
+        result_list.append(e.faultCode)
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+  def _waitStatistics(self, **kw):
+    for _ in range(100):
+      statistic_dict, = self.manager.getAdmissionStatistics().values()
+      if all(statistic_dict[key] == value for key, value in kw.items()):
+        return
+      time.sleep(0.01)
+    self.fail("statistics are not %r" % kw)
+
+  def testHandlerCapacity(self):
+    """Requests are admitted according to the capacity of their handler, the
+    others wait by priority or are rejected"""
+    result_list = []
+    thread_list = [self._startConversion(b'first', result_list)]
+    self._waitStatistics(capacity=1, active_count=1)
+    thread_list.append(self._startConversion(b'low', result_list))
+    self._waitStatistics(queue_size=1)
+    thread_list.append(self._startConversion(b'high', result_list,
+                                             HIGH_PRIORITY))
+    self._waitStatistics(queue_size=2)
+    thread_list.append(self._startConversion(b'rejected', result_list))
+    thread_list[-1].join(1)
+    self.assertEqual(result_list, [SERVER_BUSY_FAULT_CODE])
+    SlowHandler.event.set()
+    for thread in thread_list:
+      thread.join(5)
+    self.assertEqual(SlowHandler.converted_list, [b'first', b'high', b'low'])
+
+  def testCacheHit(self):
+    """Results found in the cache are returned without being admitted"""
+    self.manager.conversion_cache = ConversionCache(
+      os.path.join(self.tmp_dir, 'cache'), 1024)
+    SlowHandler.event.set()
+    cached_data = encodebytes(b'cached').decode()
+    self.assertEqual(self.manager.convertFile(cached_data, 'txt', 'pdf'),
+                     cached_data)
+    SlowHandler.event.clear()
+    result_list = []
+    thread_list = [self._startConversion(b'first', result_list)]
+    self._waitStatistics(active_count=1)
+    thread_list.append(self._startConversion(b'second', result_list))
+    thread_list.append(self._startConversion(b'third', result_list))
+    self._waitStatistics(queue_size=2)
+    self.assertEqual(self.manager.convertFile(cached_data, 'txt', 'pdf'),
+                     cached_data)
+    self.assertEqual(result_list, [])
+    SlowHandler.event.set()
+    for thread in thread_list:
+      thread.join(5)
+    self.assertEqual(SlowHandler.converted_list,
+                     [b'cached', b'first', b'second', b'third'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,122 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import os
+import time
+import unittest
+from tempfile import mkdtemp
+from shutil import rmtree
+from cloudooo.cache import ConversionCache
+from cloudooo.file import FileData
+
+
+class TestConversionCache(unittest.TestCase):
+  """Test the on disk cache of the conversions"""
+
+  def setUp(self):
+    self.path = mkdtemp()
+    self.addCleanup(rmtree, self.path)
+
+  def testGetKey(self):
+    """Test the key depends on the data and on the parameters"""
+    key = ConversionCache.getKey(b'data', 'odt', 'pdf', False, False, {})
+    self.assertEqual(key,
+      ConversionCache.getKey(b'data', 'odt', 'pdf', False, False, {}))
+    self.assertNotEqual(key,
+      ConversionCache.getKey(b'other', 'odt', 'pdf', False, False, {}))
+    self.assertNotEqual(key,
+      ConversionCache.getKey(b'data', 'odt', 'pdf', True, False, {}))
+    self.assertNotEqual(key,
+      ConversionCache.getKey(b'data', 'odt', 'pdf', False, False, {'a': 1}))
+
+  def testGetSet(self):
+    """Test hit and miss counters"""
+    cache = ConversionCache(self.path, 1024)
+    self.assertEqual(cache.get('key'), None)
+    cache.set('key', {'Title': 'cloudooo'})
+    self.assertEqual(cache.get('key'), {'Title': 'cloudooo'})
+    statistics = cache.getStatistics()
+    self.assertEqual(statistics['hit_count'], 1)
+    self.assertEqual(statistics['miss_count'], 1)
+    self.assertEqual(statistics['entry_count'], 1)
+
+  def testLeastRecentlyUsedEviction(self):
+    """Test the least recently used entry is removed when the cache is full"""
+    cache = ConversionCache(self.path, 25)
+    cache.set('a', 'x' * 8)
+    cache.set('b', 'x' * 8)
+    cache.get('a')
+    cache.set('c', 'x' * 8)
+    self.assertEqual(cache.get('b'), None)
+    self.assertEqual(cache.get('a'), 'x' * 8)
+    self.assertEqual(cache.get('c'), 'x' * 8)
+    self.assertEqual(cache.getStatistics()['eviction_count'], 1)
+    self.assertEqual(sorted(os.listdir(self.path)), ['a', 'c'])
+
+  def testAgeEviction(self):
+    """Test expired entries are not returned"""
+    cache = ConversionCache(self.path, 1024, 60)
+    cache.set('key', 'value')
+    cache._entry_dict['key'] = (5, time.time() - 120)
+    self.assertEqual(cache.get('key'), None)
+    self.assertEqual(cache.getStatistics()['eviction_count'], 1)
+    self.assertEqual(os.listdir(self.path), [])
+
+  def testReload(self):
+    """Test entries are kept after a restart"""
+    ConversionCache(self.path, 1024).set('key', 'value')
+    self.assertEqual(ConversionCache(self.path, 1024).get('key'), 'value')
+
+  def testVersion(self):
+    """Test entries are removed when the version changes"""
+    ConversionCache(self.path, 1024, version='1').set('key', 'value')
+    self.assertEqual(
+      ConversionCache(self.path, 1024, version='1').get('key'), 'value')
+    cache = ConversionCache(self.path, 1024, version='2')
+    self.assertEqual(cache.get('key'), None)
+    self.assertEqual(cache.getStatistics()['entry_count'], 0)
+
+  def testGetSetData(self):
+    """Test the data is stored as it is, files are not read in memory"""
+    output_path = mkdtemp()
+    self.addCleanup(rmtree, output_path)
+    data_path = os.path.join(output_path, 'data')
+    with open(data_path, 'wb') as f:
+      f.write(b'converted')
+    cache = ConversionCache(self.path, 1024)
+    self.assertEqual(cache.getData('key', output_path), None)
+    cache.setData('key', FileData(data_path))
+    cache.setData('other', b'other')
+    os.remove(data_path)
+    data = cache.getData('key', output_path)
+    self.assertEqual(data.read(), b'converted')
+    data.remove()
+    self.assertEqual(cache.getData('other', output_path).read(), b'other')
+    self.assertEqual(cache.getStatistics()['size'], 14)
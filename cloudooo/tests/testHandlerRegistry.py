@@ -0,0 +1,125 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import unittest
+from cloudooo.util import loadMimetypeList, reloadMimetypeList
+from cloudooo.manager import HandlerRegistry, HandlerNotFound
+from cloudooo.handler.ooo.mimemapper import mimemapper
+
+
+class FakeHandler(object):
+
+  call_count = 0
+
+  @classmethod
+  def getAllowedConversionFormatList(cls, source_mimetype):
+    cls.call_count += 1
+    return [('application/pdf', 'PDF'), ('image/png', 'PNG')]
+
+
+class PdfHandler(FakeHandler):
+  pass
+
+
+class ImageHandler(FakeHandler):
+  pass
+
+
+class TestHandlerRegistry(unittest.TestCase):
+
+  def setUp(self):
+    loadMimetypeList()
+    PdfHandler.call_count = ImageHandler.call_count = 0
+    self.registry = HandlerRegistry(
+      ["application/pdf application/pdf pdf",
+       "application/pdf image/* image",
+       "image/* * image"],
+      dict(pdf=PdfHandler, image=ImageHandler))
+
+  def testGetHandlerClass(self):
+    """Test the handlers are selected in the order of the registry"""
+    getHandlerClass = self.registry.getHandlerClass
+    self.assertEqual(getHandlerClass('pdf', 'pdf'), PdfHandler)
+    self.assertEqual(getHandlerClass('pdf', 'png'), ImageHandler)
+    self.assertEqual(getHandlerClass('pdf', None), PdfHandler)
+    self.assertEqual(getHandlerClass('png', 'pdf'), ImageHandler)
+    self.assertRaises(HandlerNotFound, getHandlerClass, 'pdf', 'odt')
+    # the memo is forgotten when the mimetypes are reloaded
+    self.registry._handler_class_memo.cache_clear()
+    getHandlerClass('pdf', 'pdf')
+    self.assertEqual(self.registry._handler_class_memo.cache_info().currsize, 1)
+    reloadMimetypeList()
+    getHandlerClass('pdf', 'png')
+    self.assertEqual(self.registry._handler_class_memo.cache_info().currsize, 1)
+
+  def testGetAllowedConversionFormatList(self):
+    """Test the allowed formats are filtered by the registry and memoized
+    until the catalog of the mimemapper changes"""
+    getAllowedConversionFormatList = \
+      self.registry.getAllowedConversionFormatList
+    self.assertEqual(sorted(getAllowedConversionFormatList('application/pdf')),
+                     [('application/pdf', 'PDF'), ('image/png', 'PNG')])
+    self.assertEqual(sorted(getAllowedConversionFormatList('image/png')),
+                     [('application/pdf', 'PDF'), ('image/png', 'PNG')])
+    self.assertEqual(getAllowedConversionFormatList('text/plain'), [])
+    getAllowedConversionFormatList('application/pdf')
+    self.assertEqual((PdfHandler.call_count, ImageHandler.call_count), (1, 2))
+    mimemapper._buildIndexes()
+    getAllowedConversionFormatList('application/pdf')
+    self.assertEqual((PdfHandler.call_count, ImageHandler.call_count), (2, 3))
+
+  def testMemoSize(self):
+    """Test the memoized results are bounded, the mimetypes and formats are
+    given by the clients"""
+    registry = HandlerRegistry(["image/* * image"],
+                               dict(image=ImageHandler), memo_size=10)
+    for index in range(100):
+      registry.getAllowedConversionFormatList('image/x-%s' % index)
+      self.assertRaises(HandlerNotFound, registry.getHandlerClass,
+                        'unknown%s' % index, 'png')
+      registry.getHandlerClass('png', 'unknown%s' % index)
+    self.assertEqual(registry._allowed_format_memo.cache_info().currsize, 10)
+    self.assertEqual(registry._handler_class_memo.cache_info().currsize, 10)
+
+  def testGetConversionMatrix(self):
+    """Test the matrix is computed once for each catalog, and its version
+    changes only with its content"""
+    conversion_matrix = self.registry.getConversionMatrix()
+    conversion_dict = conversion_matrix['conversion_dict']
+    self.assertEqual(conversion_dict['application/pdf'],
+                     [('application/pdf', 'PDF'), ('image/png', 'PNG')])
+    self.assertIn('image/jpeg', conversion_dict)
+    self.assertNotIn('text/plain', conversion_dict)
+    self.assertIs(self.registry.getConversionMatrix(), conversion_matrix)
+    mimemapper._buildIndexes()
+    new_conversion_matrix = self.registry.getConversionMatrix()
+    self.assertIsNot(new_conversion_matrix, conversion_matrix)
+    self.assertEqual(new_conversion_matrix['version'],
+                     conversion_matrix['version'])
@@ -0,0 +1,117 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+import os
+import time
+import unittest
+from tempfile import mkdtemp
+from shutil import rmtree
+from threading import Event
+from cloudooo.file import FileData
+from cloudooo.job import JobQueue, JobQueueFull
+
+
+class TestJobQueue(unittest.TestCase):
+  """Test the queue of the asynchronous jobs"""
+
+  def setUp(self):
+    self.path = mkdtemp()
+    self.addCleanup(rmtree, self.path)
+
+  def _waitJob(self, job_queue, job_id):
+    for _ in range(100):
+      status = job_queue.getStatus(job_id)['status']
+      if status not in ('queued', 'running'):
+        return status
+      time.sleep(0.05)
+
+  def testSubmitAndFetch(self):
+    """Test the result is kept on disk until it is fetched"""
+    job_queue = JobQueue(self.path)
+    job_id = job_queue.submit(lambda x, y: x + y, 'a', y='b')
+    self.assertEqual(self._waitJob(job_queue, job_id), 'done')
+    self.assertEqual(os.listdir(self.path), [job_id + '.json'])
+    self.assertEqual(job_queue.fetch(job_id), 'ab')
+    self.assertEqual(os.listdir(self.path), [])
+    self.assertEqual(job_queue.getStatus(job_id), {'status': 'unknown'})
+    self.assertRaises(ValueError, job_queue.fetch, job_id)
+
+  def testSubmitData(self):
+    """Test the data of the job is kept on disk until the job ends"""
+    event = Event()
+    def read(data, suffix):
+      event.wait()
+      return data.read().decode() + suffix
+    job_queue = JobQueue(self.path)
+    data_path = os.path.join(self.path, 'data')
+    with open(data_path, 'wb') as f:
+      f.write(b'a')
+    file_job_id = job_queue.submitData(read, FileData(data_path), 'b')
+    bytes_job_id = job_queue.submitData(read, b'c', suffix='d')
+    self.assertEqual(sorted(os.listdir(self.path)),
+                     sorted([file_job_id + '.input', bytes_job_id + '.input']))
+    event.set()
+    self.assertEqual(self._waitJob(job_queue, file_job_id), 'done')
+    self.assertEqual(self._waitJob(job_queue, bytes_job_id), 'done')
+    self.assertEqual(job_queue.fetch(file_job_id), 'ab')
+    self.assertEqual(job_queue.fetch(bytes_job_id), 'cd')
+    self.assertEqual(os.listdir(self.path), [])
+
+  def testFailedJob(self):
+    """Test the error of a failed job is returned"""
+    def fail():
+      raise ValueError('broken')
+    job_queue = JobQueue(self.path)
+    job_id = job_queue.submit(fail)
+    self.assertEqual(self._waitJob(job_queue, job_id), 'failed')
+    self.assertEqual(job_queue.getStatus(job_id)['error'], 'broken')
+    self.assertRaises(Exception, job_queue.fetch, job_id)
+    self.assertEqual(job_queue.getStatus(job_id), {'status': 'unknown'})
+
+  def testQueueFull(self):
+    """Test jobs are refused when the queue is full"""
+    event = Event()
+    job_queue = JobQueue(self.path, worker_count=1, max_size=1)
+    running_job_id = job_queue.submit(event.wait)
+    while job_queue.getStatus(running_job_id)['status'] != 'running':
+      time.sleep(0.01)
+    job_queue.submit(event.wait)
+    self.assertRaises(JobQueueFull, job_queue.submit, event.wait)
+    event.set()
+
+  def testExpiredResult(self):
+    """Test results not fetched are removed after max_age"""
+    job_queue = JobQueue(self.path, max_age=0)
+    job_id = job_queue.submit(str, 1)
+    while job_queue._job_dict[job_id][0] != 'done':
+      time.sleep(0.01)
+    time.sleep(0.01)
+    self.assertEqual(job_queue.getStatus(job_id), {'status': 'unknown'})
+    self.assertEqual(os.listdir(self.path), [])
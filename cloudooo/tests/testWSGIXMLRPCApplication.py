@@ -0,0 +1,254 @@
+##############################################################################
+#
+# Copyright (c) 2009-2010 Nexedi SA and Contributors. All Rights Reserved.
+#
+# WARNING: This program as such is intended to be used by professional
+# programmers who take the whole responsibility of assessing all potential
+# consequences resulting from its eventual inadequacies and bugs
+# End users who are looking for a ready-to-use solution with commercial
+# guarantees and support are strongly adviced to contract a Free Software
+# Service Company
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+#
+##############################################################################
+
+
+
+import os
+import unittest
+import zlib
+from io import BytesIO
+from base64 import encodebytes, decodebytes
+from tempfile import mkdtemp, mkstemp
+from shutil import rmtree
+from xmlrpc.client import dumps, loads
+from cloudooo.file import FileData
+from cloudooo.manager import HandlerNotFound
+from cloudooo.wsgixmlrpcapplication import WSGIXMLRPCApplication, \
+  FILE_THRESHOLD
+
+
+class Instance:
+  """Keeps the argument of the last request"""
+
+  def echo(self, data):
+    self.data = data
+    if isinstance(data, FileData):
+      self.path = data.path
+      self.content = data.read()
+    return True
+
+  def getString(self, size):
+    return 'x' * size
+
+  def getFile(self, tmp_dir, content):
+    fd, path = mkstemp(dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as f:
+      f.write(content.encode())
+    return FileData(path)
+
+  def _convertBody(self, data, source_format, destination_format, zip,
+                   refresh):
+    if source_format == 'unknown':
+      raise HandlerNotFound('No Handler found for %r=>%r' % (
+        source_format, destination_format))
+    if source_format == 'broken':
+      raise ValueError('The document is broken')
+    if isinstance(data, FileData):
+      data = data.read()
+    return data.upper()
+
+
+class TestWSGIXMLRPCApplication(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = mkdtemp()
+    self.instance = Instance()
+    self.application = WSGIXMLRPCApplication(instance=self.instance,
+                                             tmp_dir=self.tmp_dir)
+
+  def tearDown(self):
+    rmtree(self.tmp_dir)
+
+  def _call(self, body, path='/RPC2', query='', **header_dict):
+    response_dict = {}
+    def start_response(status, header_list):
+      response_dict['status'] = status
+      response_dict['header_dict'] = dict(header_list)
+    environ = {'REQUEST_METHOD': 'POST',
+               'PATH_INFO': path,
+               'QUERY_STRING': query,
+               'CONTENT_LENGTH': str(len(body)),
+               'wsgi.input': BytesIO(body)}
+    for name, value in header_dict.items():
+      environ['HTTP_' + name.upper()] = value
+    iterable = self.application(environ, start_response)
+    try:
+      body = b''.join(iterable)
+    finally:
+      # like a WSGI server
+      if hasattr(iterable, 'close'):
+        iterable.close()
+    return response_dict['status'], response_dict['header_dict'], body
+
+  def _echo(self, data):
+    status, _, body = self._call(dumps((data,), 'echo').encode())
+    self.assertEqual(status, '200 OK')
+    self.assertEqual(loads(body)[0], (True,))
+
+  def testSmallString(self):
+    """Small strings are given as str"""
+    data = encodebytes(b'document').decode()
+    self._echo(data)
+    self.assertEqual(self.instance.data, data)
+
+  def testLargeDocument(self):
+    """Large base64 strings are decoded into a file, which is removed once
+    the request is answered"""
+    document = os.urandom(FILE_THRESHOLD)
+    self._echo(encodebytes(document).decode())
+    self.assertIsInstance(self.instance.data, FileData)
+    self.assertEqual(self.instance.content, document)
+    self.assertFalse(os.path.exists(self.instance.path))
+    self.assertEqual(os.listdir(self.tmp_dir), [])
+
+  def testLargeText(self):
+    """Large strings which are not base64 are given as str"""
+    for data in ('A' * FILE_THRESHOLD + ' text',
+                 'A' * FILE_THRESHOLD * 2 + ' hello world',
+                 'abc\n' * (FILE_THRESHOLD // 2) + 'end of text.',
+                 'ABCD\n' * FILE_THRESHOLD + 'AB=CD',
+                 'ABCD' * FILE_THRESHOLD + 'ABC'):
+      self._echo(data)
+      self.assertEqual(self.instance.data, data)
+      self.assertEqual(os.listdir(self.tmp_dir), [])
+
+  def testFileResponse(self):
+    """A FileData returned by a method is sent encoded in base64"""
+    for size in (0, 100, 57 * 1024, 57 * 1024 * 2 + 5):
+      content = os.urandom(size // 2).hex() + 'x' * (size % 2)
+      body = dumps((self.tmp_dir, content), 'getFile').encode()
+      status, header_dict, body = self._call(body)
+      self.assertEqual(status, '200 OK')
+      self.assertEqual(int(header_dict['Content-Length']), len(body))
+      self.assertEqual(decodebytes(loads(body)[0][0].encode()),
+                       content.encode())
+      self.assertEqual(os.listdir(self.tmp_dir), [])
+
+  def testFileResponseNotSent(self):
+    """The file of a response is removed when the response is closed
+    before being sent, e.g. when the client disconnected"""
+    body = dumps((self.tmp_dir, 'content'), 'getFile').encode()
+    for accept_encoding in ('identity', 'gzip'):
+      environ = {'REQUEST_METHOD': 'POST',
+                 'PATH_INFO': '/RPC2',
+                 'CONTENT_LENGTH': str(len(body)),
+                 'HTTP_ACCEPT_ENCODING': accept_encoding,
+                 'wsgi.input': BytesIO(body)}
+      self.application.compression_threshold = 0
+      self.application(environ, lambda status, header_list: None).close()
+      self.assertEqual(os.listdir(self.tmp_dir), [])
+
+  def testCompressedRequest(self):
+    """Requests compressed with gzip or deflate are decompressed"""
+    data = encodebytes(os.urandom(FILE_THRESHOLD)).decode()
+    for encoding, wbits in (('gzip', 31), ('deflate', 15)):
+      compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+      body = dumps((data,), 'echo').encode()
+      body = compressor.compress(body) + compressor.flush()
+      status, _, _ = self._call(body, content_encoding=encoding)
+      self.assertEqual(status, '200 OK')
+      self.assertIsInstance(self.instance.data, FileData)
+      self.assertEqual(self.instance.content, decodebytes(data.encode()))
+    status, _, _ = self._call(body, content_encoding='br')
+    self.assertEqual(status, '415 Unsupported Media Type')
+
+  def testRequestTooLarge(self):
+    """Requests larger than max_request_size once decompressed are rejected,
+    without being decompressed in memory"""
+    self.application.max_request_size = FILE_THRESHOLD
+    data = 'A' * (FILE_THRESHOLD * 64)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    body = dumps((data,), 'echo').encode()
+    body = compressor.compress(body) + compressor.flush()
+    self.assertLess(len(body), FILE_THRESHOLD)
+    for path in ('/RPC2', '/convert'):
+      status, _, _ = self._call(body, path, 'from=txt&to=pdf',
+                                content_encoding='gzip')
+      self.assertEqual(status, '413 Request Entity Too Large')
+    status, _, _ = self._call(dumps((data,), 'echo').encode())
+    self.assertEqual(status, '413 Request Entity Too Large')
+    self.assertEqual(os.listdir(self.tmp_dir), [])
+    # smaller requests are accepted
+    self.application.max_request_size = FILE_THRESHOLD * 128
+    status, _, _ = self._call(body, content_encoding='gzip')
+    self.assertEqual(status, '200 OK')
+    status, _, body = self._call(body, '/convert', 'from=txt&to=pdf',
+                                 content_encoding='gzip')
+    self.assertEqual(status, '200 OK')
+    self.assertEqual(len(body), len(dumps((data,), 'echo')))
+
+  def testCompressedResponse(self):
+    """Responses are compressed when the client accepts it"""
+    content = 'x' * 200000
+    body = dumps((self.tmp_dir, content), 'getFile').encode()
+    for encoding in ('gzip', 'deflate'):
+      status, header_dict, response = self._call(body,
+                                                 accept_encoding=encoding)
+      self.assertEqual(status, '200 OK')
+      self.assertEqual(header_dict['Content-Encoding'], encoding)
+      self.assertNotIn('Content-Length', header_dict)
+      response = zlib.decompress(response, 47)
+      self.assertEqual(decodebytes(loads(response)[0][0].encode()),
+                       content.encode())
+    status, header_dict, response = self._call(body,
+                                               accept_encoding='gzip;q=0')
+    self.assertNotIn('Content-Encoding', header_dict)
+    self.assertEqual(int(header_dict['Content-Length']), len(response))
+    # small responses are not compressed
+    status, header_dict, _ = self._call(dumps(('',), 'echo').encode(),
+                                        accept_encoding='gzip')
+    self.assertNotIn('Content-Encoding', header_dict)
+    status, header_dict, response = self._call(
+      dumps((2000,), 'getString').encode(), accept_encoding='deflate')
+    self.assertEqual(header_dict['Content-Encoding'], 'deflate')
+    self.assertEqual(int(header_dict['Content-Length']), len(response))
+    self.assertEqual(loads(zlib.decompress(response))[0], ('x' * 2000,))
+
+  def testConvert(self):
+    """The binary interface answers the raw converted document"""
+    status, header_dict, body = self._call(b'document', '/convert',
+                                           'from=txt&to=pdf')
+    self.assertEqual(status, '200 OK')
+    self.assertEqual(header_dict['Content-Type'], 'application/pdf')
+    self.assertEqual(body, b'DOCUMENT')
+    status, _, _ = self._call(b'document', '/convert', 'to=pdf')
+    self.assertEqual(status, '400 Bad request')
+    # unsupported conversions are errors of the client
+    status, _, body = self._call(b'document', '/convert',
+                                 'from=unknown&to=pdf')
+    self.assertEqual(status, '400 Bad request')
+    self.assertIn(b'No Handler found', body)
+    status, _, body = self._call(b'document', '/convert',
+                                 'from=broken&to=pdf')
+    self.assertEqual(status, '500 Server error')
+    self.assertEqual(body, b'The document is broken')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -34,6 +34,7 @@ import logging
 import mimetypes
 import pkg_resources
 import os
+from threading import Lock
 from zipfile import ZipFile, ZIP_DEFLATED
 
 logger = logging.getLogger('Cloudooo')
@@ -54,10 +55,37 @@ PYTHON_ENVIRONMENT = [
 ]
 
 
+# incremented each time the mimetypes are loaded
+_mimetype_list_version = 0
+_mimetype_list_lock = Lock()
+
+
 def loadMimetypeList():
+  """Load the mimetypes of the system and the ones of cloudooo, only the
+  first time it is called"""
+  if not _mimetype_list_version:
+    with _mimetype_list_lock:
+      if not _mimetype_list_version:
+        _loadMimetypeList()
+
+
+def reloadMimetypeList():
+  """Load again the mimetypes, e.g. after the mime.types files changed"""
+  with _mimetype_list_lock:
+    _loadMimetypeList()
+
+
+def _loadMimetypeList():
+  global _mimetype_list_version
   mime_types_url = pkg_resources.resource_filename(__name__,
                                                    "mime.types")
   mimetypes.init(files=[mime_types_url, ])
+  _mimetype_list_version += 1
+
+
+def getMimetypeListVersion():
+  """Returns a number which changes each time the mimetypes are loaded"""
+  return _mimetype_list_version
 
 
 def configureLogger(level=None, debug_mode=False):
@@ -13,29 +13,280 @@
 #   limitations under the License.
 
 import logging
+import os
+import re
+import zlib
+from binascii import a2b_base64
+from itertools import chain
+from base64 import encodebytes
+from mimetypes import guess_type
+from tempfile import mkstemp
+from urllib.parse import parse_qs
+from xmlrpc.client import Unmarshaller, ExpatParser, Fault, dumps
 from xmlrpc.server import SimpleXMLRPCDispatcher
+from cloudooo.admission import ServerBusy
+from cloudooo.file import FileData, FILE_THRESHOLD
+from cloudooo.manager import HandlerNotFound
 
 logger = logging.getLogger(__name__)
 
+# Size of the chunks read from the request body
+CHUNK_SIZE = 1 << 16
+# Size of the chunks of the files of the responses, encodebytes makes one
+# line of 76 characters for each 57 bytes
+FILE_CHUNK_SIZE = 57 * 1024
+
+# Content codings of the requests and responses, with the window bits of zlib
+CONTENT_ENCODING_DICT = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+# Envelope of the responses whose value is a file encoded in base64
+RESPONSE_HEAD, RESPONSE_TAIL = \
+    dumps(('@',), methodresponse=1).encode().split(b'@')
+RESPONSE_TAIL += b'\n'
+_base64_match = re.compile(r'[A-Za-z0-9+/=\r\n]*\Z').match
+
+
+class RequestTooLarge(Exception):
+    """The body of the request is larger than max_request_size"""
+
+
+class FileUnmarshaller(Unmarshaller):
+    """Unmarshaller decoding the strings larger than FILE_THRESHOLD from
+    base64 into files as they are parsed. They are given to the methods as
+    FileData, so that the documents are never kept in memory.
+
+    The raw string is also kept in a file until its end, so that it is
+    given unchanged as str if it is not base64.
+    """
+
+    def __init__(self, tmp_dir=None):
+        Unmarshaller.__init__(self)
+        self.tmp_dir = tmp_dir
+        self.path_list = []
+        self._tag = None
+        self._size = 0
+        self._in_memory = False
+        self._file = None
+        self._raw_file = None
+        self._remainder = ''
+        self._padded = False
+
+    def start(self, tag, attrs):
+        Unmarshaller.start(self, tag, attrs)
+        self._tag = tag
+        self._size = 0
+        self._in_memory = False
+
+    def _openFile(self, mode, **kw):
+        fd, path = mkstemp(dir=self.tmp_dir)
+        self.path_list.append(path)
+        return os.fdopen(fd, mode, **kw), path
+
+    def _write(self, text):
+        """Keeps text in the raw file and decodes it to the file, keeping the
+        characters which do not make a complete base64 quantum for the next
+        call. Returns False if text can not be part of a base64 string."""
+        if not _base64_match(text):
+            return False
+        stripped_text = ''.join(text.split())
+        if self._padded and not self._remainder and stripped_text:
+            return False
+        decoded_text = self._remainder + stripped_text
+        padding = decoded_text.find('=')
+        if padding != -1:
+            if decoded_text[padding:] not in ('=', '=='):
+                return False
+            self._padded = True
+        self._raw_file.write(text)
+        end = len(decoded_text) - len(decoded_text) % 4
+        self._file.write(a2b_base64(decoded_text[:end]))
+        self._remainder = decoded_text[end:]
+        return True
+
+    def _closeFile(self):
+        """Closes the files of the string, removes the raw one and returns the
+        path of the decoded one"""
+        self._raw_file.close()
+        self._file.close()
+        self._file = self._raw_file = None
+        self._remainder = ''
+        self._padded = False
+        self.path_list.remove(self._raw_path)
+        os.remove(self._raw_path)
+        return self._path
+
+    def _keepInMemory(self, text=''):
+        """The string is not base64, keep it as it was received"""
+        self._raw_file.seek(0)
+        self._data = [self._raw_file.read(), text]
+        path = self._closeFile()
+        self.path_list.remove(path)
+        os.remove(path)
+        self._in_memory = True
+
+    def data(self, text):
+        if self._file is None:
+            self._data.append(text)
+            self._size += len(text)
+            if self._size < FILE_THRESHOLD or self._in_memory or \
+                    self._tag not in ('string', 'value'):
+                return
+            text = ''.join(self._data)
+            if not _base64_match(text):
+                self._in_memory = True
+                return
+            self._file, self._path = self._openFile('wb')
+            # newline='' keeps the line endings unchanged
+            self._raw_file, self._raw_path = self._openFile(
+                'w+', encoding='ascii', newline='')
+            self._data = []
+        if not self._write(text):
+            self._keepInMemory(text)
+
+    def end(self, tag):
+        self._tag = None
+        if self._file is not None:
+            if self._remainder:
+                # incomplete base64 quantum
+                self._keepInMemory()
+            else:
+                self.append(FileData(self._closeFile()))
+                self._value = 0
+                return
+        return Unmarshaller.end(self, tag)
+
+    def removeFiles(self):
+        """Removes the files of the decoded strings"""
+        if self._file is not None:
+            self._closeFile()
+        for path in self.path_list:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
 class ErrorLoggingXMLRPCDispatcher(SimpleXMLRPCDispatcher):
     """A XMLRPC Dispatcher which logs errors
     """
+    # Folder of the files created by FileUnmarshaller
+    tmp_dir = None
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        """Dispatches an XML-RPC method like SimpleXMLRPCDispatcher, but data
+        can also be an iterable of chunks of the request, which are parsed
+        as they are read with FileUnmarshaller. In this case, a FileData
+        returned by the method is returned as is, to be encoded in base64
+        while it is sent.
+        """
+        if isinstance(data, bytes):
+            return super()._marshaled_dispatch(data, dispatch_method, path)
+        unmarshaller = FileUnmarshaller(self.tmp_dir)
+        try:
+            try:
+                parser = ExpatParser(unmarshaller)
+                for chunk in data:
+                    parser.feed(chunk)
+                parser.close()
+                params = unmarshaller.close()
+                method = unmarshaller.getmethodname()
+                if dispatch_method is not None:
+                    response = dispatch_method(method, params)
+                else:
+                    response = self._dispatch(method, params)
+                if isinstance(response, FileData):
+                    return response
+                response = dumps((response,), methodresponse=1,
+                                 allow_none=self.allow_none,
+                                 encoding=self.encoding)
+            except RequestTooLarge:
+                raise
+            except Fault as fault:
+                response = dumps(fault, allow_none=self.allow_none,
+                                 encoding=self.encoding)
+            except BaseException as exc:
+                response = dumps(
+                    Fault(1, "%s:%s" % (type(exc), exc)),
+                    encoding=self.encoding, allow_none=self.allow_none,
+                    )
+            return response.encode(self.encoding, 'xmlcharrefreplace')
+        finally:
+            unmarshaller.removeFiles()
+
     def _dispatch(self, method, params):
         try:
             return super()._dispatch(method, params)
+        except ServerBusy:
+            raise
         except:
             logger.exception("Error calling %s", method)
             raise
 
 
+class FileResponse:
+    """Iterable over the content of a FileData by chunks, encoded by encode
+    and compressed by compressor. The file is removed when the server closes
+    the response, even if it was not iterated."""
+
+    def __init__(self, file_data, encode=None, head=b'', tail=b'',
+                 compressor=None):
+        self.file_data = file_data
+        self.encode = encode
+        self.head = head
+        self.tail = tail
+        self.compressor = compressor
+        self._chunk_iterator = None
+
+    def __iter__(self):
+        self._chunk_iterator = self.file_data.iterChunks(FILE_CHUNK_SIZE)
+        return self._iterChunks(self._chunk_iterator)
+
+    def _iterChunks(self, chunk_iterator):
+        encode = self.encode
+        compressor = self.compressor
+        for chunk in chain((self.head,),
+                           map(encode, chunk_iterator) if encode
+                           else chunk_iterator,
+                           (self.tail,)):
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+
+    def close(self):
+        if self._chunk_iterator is not None:
+            self._chunk_iterator.close()
+        self.file_data.remove()
+
+
 class WSGIXMLRPCApplication:
     """Application to handle requests to the XMLRPC service"""
 
-    def __init__(self, instance=None, methods=[]):
-        """Create windmill xmlrpc dispatcher"""
+    def __init__(self, instance=None, methods=[], tmp_dir=None,
+                 compression_threshold=1024, compression_level=6,
+                 max_request_size=0):
+        """Create windmill xmlrpc dispatcher
+
+        The XML-RPC responses of at least compression_threshold bytes are
+        compressed when the client accepts it, compression_level 0 disables
+        it. The requests larger than max_request_size bytes once
+        decompressed are rejected, 0 means no limit.
+        """
+        self.instance = instance
+        self.tmp_dir = tmp_dir
+        self.max_request_size = max_request_size
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
         self.dispatcher = ErrorLoggingXMLRPCDispatcher(
           allow_none=True,
           encoding=None)
+        self.dispatcher.tmp_dir = tmp_dir
         if instance is not None:
             self.dispatcher.register_instance(instance)
         for method in methods:
@@ -45,6 +296,15 @@ class WSGIXMLRPCApplication:
     def handler(self, environ, start_response):
         """XMLRPC service for windmill browser core to communicate with"""
         if environ['REQUEST_METHOD'] == 'POST':
+            content_encoding = environ.get('HTTP_CONTENT_ENCODING',
+                                           'identity').lower()
+            if content_encoding != 'identity' and \
+                    content_encoding not in CONTENT_ENCODING_DICT:
+                start_response("415 Unsupported Media Type",
+                               [('Content-Type', 'text/plain')])
+                return [b'Unsupported Content-Encoding']
+            if environ.get('PATH_INFO') == '/convert':
+                return self.handle_convert(environ, start_response)
             return self.handle_POST(environ, start_response)
         else:
             start_response("400 Bad request", [('Content-Type', 'text/plain')])
@@ -61,10 +321,9 @@ class WSGIXMLRPCApplication:
         """
         try:
             # Get arguments by reading body of request.
-            # We read this in chunks to avoid straining
-
-            length = int(environ['CONTENT_LENGTH'])
-            data = environ['wsgi.input'].read(length)
+            # We read this in chunks to avoid straining, the documents are
+            # decoded into files while the request is parsed.
+            data = self._iterBody(environ)
 
             # In previous versions of SimpleXMLRPCServer, _dispatch
             # could be overridden in this class, instead of in
@@ -74,7 +333,11 @@ class WSGIXMLRPCApplication:
             response = self.dispatcher._marshaled_dispatch(
                     data, getattr(self.dispatcher, '_dispatch', None)
                 )
+            if isinstance(response, FileData):
+                return self._sendFile(environ, response, start_response)
             response += b'\n'
+        except RequestTooLarge:
+            return self._rejectTooLarge(start_response)
         except:  # This should only happen if the module is buggy
             # internal error, report as HTTP server error
             logger.exception("Error serving request")
@@ -83,10 +346,186 @@ class WSGIXMLRPCApplication:
             return []
         else:
             # got a valid XML RPC response
-            start_response("200 OK", [('Content-Type', 'text/xml'),
-                                      ('Content-Length', str(len(response)),),
-                                      ('Access-Control-Allow-Origin', '*')])
+            header_list = [('Content-Type', 'text/xml'),
+                           ('Access-Control-Allow-Origin', '*')]
+            encoding = self._getResponseEncoding(environ, len(response))
+            if encoding:
+                compressor = self._getCompressor(encoding)
+                response = compressor.compress(response) + compressor.flush()
+                header_list += [('Content-Encoding', encoding),
+                                ('Vary', 'Accept-Encoding')]
+            header_list.append(('Content-Length', str(len(response))))
+            start_response("200 OK", header_list)
             return [response]
 
+    def _rejectTooLarge(self, start_response):
+        start_response("413 Request Entity Too Large",
+                       [('Content-Type', 'text/plain')])
+        return [b'Request body larger than %d bytes' % self.max_request_size]
+
+    def _getResponseEncoding(self, environ, length):
+        """Returns the content coding of a response of length bytes, gzip or
+        deflate if the client accepts them, or None"""
+        if not self.compression_level or length < self.compression_threshold:
+            return None
+        accepted_dict = {}
+        for item in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            coding, _, parameter = item.partition(';')
+            name, _, value = parameter.partition('=')
+            try:
+                quality = float(value) if name.strip() == 'q' else 1
+            except ValueError:
+                quality = 0
+            accepted_dict[coding.strip().lower()] = quality
+        for encoding in ('gzip', 'deflate'):
+            if accepted_dict.get(encoding, accepted_dict.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def _getCompressor(self, encoding):
+        return zlib.compressobj(self.compression_level, zlib.DEFLATED,
+                                CONTENT_ENCODING_DICT[encoding])
+
+    def _sendFile(self, environ, file_data, start_response):
+        """Sends the XML-RPC response of a FileData, which is read and encoded
+        in base64 by chunks. When the response is compressed, its length is
+        not known in advance and Content-Length is not sent."""
+        size = len(file_data)
+        line_count, remainder = divmod(size, 57)
+        length = line_count * 77
+        if remainder:
+            length += (remainder + 2) // 3 * 4 + 1
+        length += len(RESPONSE_HEAD) + len(RESPONSE_TAIL)
+        header_list = [('Content-Type', 'text/xml'),
+                       ('Access-Control-Allow-Origin', '*')]
+        encoding = self._getResponseEncoding(environ, length)
+        if encoding:
+            compressor = self._getCompressor(encoding)
+            header_list += [('Content-Encoding', encoding),
+                            ('Vary', 'Accept-Encoding')]
+        else:
+            compressor = None
+            header_list.append(('Content-Length', str(length)))
+        start_response("200 OK", header_list)
+        return FileResponse(file_data, encodebytes, RESPONSE_HEAD,
+                            RESPONSE_TAIL, compressor)
+
+    def _iterBody(self, environ):
+        """Yields the body of the request by chunks, decompressed according
+        to its Content-Encoding. Raises RequestTooLarge when the body is
+        larger than max_request_size once decompressed."""
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        max_request_size = self.max_request_size
+        if max_request_size and length > max_request_size:
+            raise RequestTooLarge(length)
+        wbits = CONTENT_ENCODING_DICT.get(
+            environ.get('HTTP_CONTENT_ENCODING', '').lower())
+        if wbits is None:
+            while length > 0:
+                chunk = environ['wsgi.input'].read(min(length, CHUNK_SIZE))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+            return
+        decompressor = zlib.decompressobj(wbits)
+        size = 0
+        while length > 0 and not decompressor.eof:
+            chunk = environ['wsgi.input'].read(min(length, CHUNK_SIZE))
+            if not chunk:
+                break
+            length -= len(chunk)
+            # the size of the decompressed chunks is bounded, whatever the
+            # compression ratio is
+            while chunk:
+                chunk = decompressor.decompress(chunk, CHUNK_SIZE)
+                size += len(chunk)
+                if max_request_size and size > max_request_size:
+                    raise RequestTooLarge(size)
+                yield chunk
+                chunk = decompressor.unconsumed_tail
+        chunk = decompressor.flush()
+        if max_request_size and size + len(chunk) > max_request_size:
+            raise RequestTooLarge(size + len(chunk))
+        yield chunk
+
+    def _readBody(self, environ):
+        """Returns the body of the request, as FileData when it is larger
+        than FILE_THRESHOLD once decompressed"""
+        chunk_list = []
+        size = 0
+        chunk_iterator = self._iterBody(environ)
+        for chunk in chunk_iterator:
+            chunk_list.append(chunk)
+            size += len(chunk)
+            if size >= FILE_THRESHOLD:
+                break
+        else:
+            return b''.join(chunk_list)
+        fd, path = mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chain(chunk_list, chunk_iterator):
+                    f.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return FileData(path)
+
+    def handle_convert(self, environ, start_response):
+        """Handles POST /convert?from=<format>&to=<format>
+
+        The body of the request is the raw document and the response is the
+        raw converted document, which avoids the base64 encoding of XML-RPC.
+        The optional zip and refresh parameters are the ones of convertFile.
+        """
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        source_format = query.get('from', [''])[0]
+        destination_format = query.get('to', [''])[0]
+        if self.instance is None or not (source_format and destination_format):
+            start_response("400 Bad request", [('Content-Type', 'text/plain')])
+            return [b'"from" and "to" parameters are required']
+        zip, refresh = [query.get(name, ['false'])[0].lower() in ('1', 'true')
+                        for name in ('zip', 'refresh')]
+        data = None
+        try:
+            data = self._readBody(environ)
+            response = self.instance._convertBody(data, source_format,
+                                                  destination_format, zip,
+                                                  refresh)
+        except ServerBusy as e:
+            start_response("503 Service Unavailable",
+                           [('Content-Type', 'text/plain'),
+                            ('Retry-After', '1')])
+            return [e.faultString.encode('utf-8')]
+        except RequestTooLarge:
+            return self._rejectTooLarge(start_response)
+        except HandlerNotFound as e:
+            # the conversion is not supported
+            start_response("400 Bad request", [('Content-Type',
+                                                'text/plain')])
+            return [str(e).encode('utf-8')]
+        except Exception as e:
+            logger.exception("Error converting from %s to %s",
+                             source_format, destination_format)
+            start_response("500 Server error", [('Content-Type',
+                                                 'text/plain')])
+            return [str(e).encode('utf-8')]
+        finally:
+            if isinstance(data, FileData):
+                os.remove(data.path)
+        if zip:
+            content_type = 'application/zip'
+        else:
+            content_type = guess_type('document.' + destination_format,
+                                      strict=False)[0]
+        start_response("200 OK", [('Content-Type',
+                                   content_type or 'application/octet-stream'),
+                                  ('Content-Length', str(len(response)),),
+                                  ('Access-Control-Allow-Origin', '*')])
+        if isinstance(response, FileData):
+            return FileResponse(response)
+        return [response]
+
     def __call__(self, environ, start_response):
       return self.handler(environ, start_response)